@@ -1,6 +1,15 @@
 from django.contrib import admin
 
-from apps.accounting.models import Account, AccountType, JournalEntry, Transaction
+from apps.accounting.models import (
+    Account,
+    AccountBalanceSnapshot,
+    AccountType,
+    FiscalPeriod,
+    FiscalPeriodBalance,
+    JournalEntry,
+    JournalOutbox,
+    Transaction,
+)
 
 
 # Register your models here.
@@ -53,3 +62,44 @@ class JournalEntryAdmin(admin.ModelAdmin):
     )
     search_fields = ("description", "reference")
     list_filter = ("created_on",)
+
+
+@admin.register(AccountBalanceSnapshot)
+class AccountBalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("id", "account", "period", "debit", "credit")
+    list_filter = ("period",)
+
+
+@admin.register(JournalOutbox)
+class JournalOutboxAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "reference",
+        "date",
+        "status",
+        "attempts",
+        "available_at",
+        "journal",
+    )
+    search_fields = ("reference", "description")
+    list_filter = ("status",)
+
+
+@admin.register(FiscalPeriod)
+class FiscalPeriodAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "start_date", "end_date", "status", "closed_on")
+    list_filter = ("status",)
+
+
+@admin.register(FiscalPeriodBalance)
+class FiscalPeriodBalanceAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "period",
+        "account",
+        "closing_debit",
+        "closing_credit",
+        "carried_debit",
+        "carried_credit",
+    )
+    list_filter = ("period",)
@@ -0,0 +1,385 @@
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounting.models import Account, AccountType, JournalEntry, Transaction
+from apps.accounting.services.journals import (
+    create_journal_entries_bulk,
+    create_journal_entry,
+    reverse_journal_entries_bulk,
+    select_journals_for_reversal,
+)
+from apps.accounting.services.report_cache import bump_ledger_version
+from apps.accounting.services.snapshots import rebuild_balance_snapshots
+
+User = get_user_model()
+
+# (name, normal balance, share of generated accounts)
+ACCOUNT_TYPES = [
+    ("Asset", "debit", 0.3),
+    ("Liability", "credit", 0.15),
+    ("Equity", "credit", 0.05),
+    ("Income", "credit", 0.2),
+    ("Expense", "debit", 0.3),
+]
+CASH_FLOW_SECTIONS = ["Operating", "Investing", "Financing"]
+
+
+class QueryCounter:
+    """
+    Counts queries through an execute wrapper, the test client resets
+    connection.queries at the start of every request.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark accounting reports and posting against a synthetic ledger "
+        "built in a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accounts", type=int, default=500)
+        parser.add_argument("--journals", type=int, default=100000)
+        parser.add_argument(
+            "--lines",
+            type=int,
+            default=10,
+            help="Transactions per journal (rounded down to an even number)",
+        )
+        parser.add_argument(
+            "--days", type=int, default=730, help="Days of history to spread over"
+        )
+        parser.add_argument(
+            "--posting-entries",
+            type=int,
+            default=1000,
+            help="Entries posted by the posting benchmarks",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Timed runs per endpoint after the cold run",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the test database, and reuse its ledger on the next run",
+        )
+        parser.add_argument(
+            "--output",
+            help="JSON results file (default: accounting-benchmark-<timestamp>.json)",
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        output = (
+            options["output"]
+            or f"accounting-benchmark-{timezone.now():%Y%m%d-%H%M%S}.json"
+        )
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            report = {
+                "started_at": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "config": {
+                    key: options[key]
+                    for key in (
+                        "accounts",
+                        "journals",
+                        "lines",
+                        "days",
+                        "posting_entries",
+                        "repeat",
+                        "seed",
+                    )
+                },
+            }
+            report["generation"] = self.generate_ledger(options)
+            report["results"] = self.run_benchmarks(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Benchmark results written to {output}"))
+
+    def generate_ledger(self, options):
+        self.user, _ = User.objects.get_or_create(username="benchmark")
+
+        existing = JournalEntry.objects.filter(reference__startswith="BENCH-GEN-")
+        if existing.count() >= options["journals"]:
+            self.stdout.write("Reusing the existing synthetic ledger.")
+            self.accounts = list(Account.objects.select_related("account_type"))
+            return {"reused": True}
+
+        self.stdout.write(
+            f"Generating {options['journals']} journals across "
+            f"{options['accounts']} accounts..."
+        )
+        start = time.perf_counter()
+
+        accounts = []
+        for name, normal_balance, share in ACCOUNT_TYPES:
+            account_type, _ = AccountType.objects.get_or_create(
+                name=name, defaults={"normal_balance": normal_balance}
+            )
+            for _ in range(max(1, int(options["accounts"] * share))):
+                index = len(accounts)
+                accounts.append(
+                    Account(
+                        account_code=f"B{index:05d}",
+                        name=f"Benchmark {name} {index}",
+                        account_type=account_type,
+                        normal_balance=normal_balance,
+                        cash_flow_section=random.choice(CASH_FLOW_SECTIONS),
+                    )
+                )
+        Account.objects.bulk_create(accounts, batch_size=options["batch_size"])
+        self.accounts = list(Account.objects.select_related("account_type"))
+        account_ids = [account.id for account in self.accounts]
+
+        today = timezone.now().date()
+        pairs = max(1, options["lines"] // 2)
+        transactions = 0
+        for offset in range(0, options["journals"], options["batch_size"]):
+            count = min(options["batch_size"], options["journals"] - offset)
+            journals = JournalEntry.objects.bulk_create(
+                [
+                    JournalEntry(
+                        date=today - timedelta(days=random.randint(0, options["days"])),
+                        description=f"Benchmark journal {offset + i}",
+                        reference=f"BENCH-GEN-{offset + i}",
+                        created_by=self.user,
+                    )
+                    for i in range(count)
+                ]
+            )
+
+            lines = []
+            for journal in journals:
+                for _ in range(pairs):
+                    debit, credit = random.sample(account_ids, 2)
+                    amount = Decimal(random.randint(100, 1000000)) / 100
+                    lines.append(
+                        Transaction(
+                            journal=journal,
+                            account_id=debit,
+                            amount=amount,
+                            is_debit=True,
+                            date=journal.date,
+                        )
+                    )
+                    lines.append(
+                        Transaction(
+                            journal=journal,
+                            account_id=credit,
+                            amount=amount,
+                            is_debit=False,
+                            date=journal.date,
+                        )
+                    )
+            Transaction.objects.bulk_create(lines, batch_size=options["batch_size"])
+            transactions += len(lines)
+            self.stdout.write(f"  {offset + count} journals")
+
+        snapshots = rebuild_balance_snapshots(batch_size=options["batch_size"])
+        bump_ledger_version()
+
+        return {
+            "reused": False,
+            "seconds": round(time.perf_counter() - start, 2),
+            "accounts": len(accounts),
+            "journals": options["journals"],
+            "transactions": transactions,
+            "snapshots": snapshots,
+        }
+
+    def measure(self, name, func, repeat=0, clear_cache=True):
+        """
+        Runs ``func`` once, tracking queries and peak memory, then ``repeat``
+        more times for timing only. ``func`` returns a dict merged into the
+        result. Cached reports are invalidated before each run, by bumping
+        the ledger version rather than clearing the whole cache, unless
+        ``clear_cache`` is False.
+        """
+        if clear_cache:
+            bump_ledger_version()
+        counter = QueryCounter()
+        tracemalloc.start()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            outcome = func()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(repeat):
+            if clear_cache:
+                bump_ledger_version()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+        result = {
+            "name": name,
+            "wall_ms": round(elapsed * 1000, 2),
+            "queries": counter.count,
+            "peak_memory_kb": round(peak / 1024, 1),
+            **outcome,
+        }
+        if timings:
+            result["repeat_median_ms"] = round(statistics.median(timings) * 1000, 2)
+            result["repeat_min_ms"] = round(min(timings) * 1000, 2)
+
+        self.stdout.write(
+            f"{name:<45} {result['wall_ms']:>10} ms {result['queries']:>6} queries "
+            f"{result['peak_memory_kb']:>10} KB"
+        )
+        return result
+
+    def request(self, client, url, params):
+        def run():
+            response = client.get(url, params)
+            if response.streaming:
+                content = b"".join(response.streaming_content)
+            else:
+                content = response.content
+            return {"status": response.status_code, "bytes": len(content)}
+
+        return run
+
+    def run_benchmarks(self, options):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        today = timezone.now().date()
+        start_date = str(today - timedelta(days=options["days"]))
+        end_date = str(today)
+        busiest = (
+            Transaction.objects.values("account_id")
+            .order_by()
+            .annotate(count=Count("id"))
+            .order_by("-count")
+            .first()
+        )
+        ledger_url = reverse("account-general-ledger", args=[busiest["account_id"]])
+        range_params = {"start_date": start_date, "end_date": end_date}
+
+        # (name, url, params, served from the report cache)
+        endpoints = [
+            ("trial_balance", reverse("trial-balance"), {"as_of_date": end_date}, True),
+            ("balance_sheet", reverse("balance-sheet"), {"as_of_date": end_date}, True),
+            ("income_statement", reverse("income-statement"), range_params, True),
+            ("cash_flow_stream", reverse("cashflow"), range_params, True),
+            (
+                "cash_flow_page",
+                reverse("cashflow"),
+                dict(range_params, page_size=100),
+                True,
+            ),
+            (
+                "general_ledger_page",
+                ledger_url,
+                dict(range_params, page_size=100),
+                False,
+            ),
+            (
+                "general_ledger_csv",
+                ledger_url,
+                dict(range_params, export="csv"),
+                False,
+            ),
+        ]
+
+        results = []
+        for name, url, params, cached in endpoints:
+            run = self.request(client, url, params)
+            results.append(self.measure(name, run, repeat=options["repeat"]))
+            if cached:
+                # The last run left the report cache warm
+                results.append(
+                    self.measure(f"{name}_cached", run, clear_cache=False)
+                )
+
+        results.extend(self.run_posting_benchmarks(options))
+        return results
+
+    def run_posting_benchmarks(self, options):
+        today = timezone.now().date()
+        count = options["posting_entries"]
+
+        def entry(index):
+            debit, credit = random.sample(self.accounts, 2)
+            amount = Decimal(random.randint(100, 1000000)) / 100
+            return {
+                "description": f"Benchmark posting {index}",
+                "reference": f"BENCH-POST-{index}",
+                "user": self.user,
+                "date": today,
+                "transactions": [
+                    {"account": debit, "amount": amount, "is_debit": True},
+                    {"account": credit, "amount": amount, "is_debit": False},
+                ],
+            }
+
+        singles = min(count, 100)
+
+        def post_single():
+            for index in range(singles):
+                data = entry(index)
+                create_journal_entry(
+                    data["description"],
+                    data["reference"],
+                    data["user"],
+                    data["transactions"],
+                    date=data["date"],
+                )
+            return {"entries": singles}
+
+        def post_bulk():
+            create_journal_entries_bulk([entry(singles + i) for i in range(count)])
+            return {"entries": count}
+
+        def reverse_bulk():
+            summary = reverse_journal_entries_bulk(
+                select_journals_for_reversal(reference_prefix="BENCH-POST-"), self.user
+            )
+            return {"entries": summary["journals"]}
+
+        return [
+            self.measure(f"create_journal_entry x{singles}", post_single),
+            self.measure(f"create_journal_entries_bulk x{count}", post_bulk),
+            self.measure("reverse_journal_entries_bulk", reverse_bulk),
+        ]
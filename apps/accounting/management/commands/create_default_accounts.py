@@ -80,6 +80,16 @@ class Command(BaseCommand):
                         "name": "Bank",
                         "cash_flow_section": "Operating",
                     },
+                    {
+                        "account_code": "1020",
+                        "name": "M-Pesa",
+                        "cash_flow_section": "Operating",
+                    },
+                    {
+                        "account_code": "1030",
+                        "name": "Other Receipts",
+                        "cash_flow_section": "Operating",
+                    },
                     {
                         "account_code": "1100",
                         "name": "Cash",
@@ -90,6 +100,11 @@ class Command(BaseCommand):
                         "name": "Accounts Receivable",
                         "cash_flow_section": "Operating",
                     },
+                    {
+                        "account_code": "1300",
+                        "name": "Inventory",
+                        "cash_flow_section": "Operating",
+                    },
                 ],
             },
             "Liability": {
@@ -110,6 +125,11 @@ class Command(BaseCommand):
                         "name": "Owner’s Capital",
                         "cash_flow_section": "Financing",
                     },
+                    {
+                        "account_code": "3100",
+                        "name": "Retained Earnings",
+                        "cash_flow_section": "Financing",
+                    },
                 ],
             },
             "Income": {
@@ -135,6 +155,11 @@ class Command(BaseCommand):
                         "name": "Donor Contributions",
                         "cash_flow_section": "Financing",
                     },
+                    {
+                        "account_code": "4400",
+                        "name": "Miscellaneous Income",
+                        "cash_flow_section": "Operating",
+                    },
                 ],
             },
             "Expense": {
@@ -155,6 +180,16 @@ class Command(BaseCommand):
                         "name": "Salaries & Wages",
                         "cash_flow_section": "Operating",
                     },
+                    {
+                        "account_code": "5300",
+                        "name": "Cost of Goods Sold",
+                        "cash_flow_section": "Operating",
+                    },
+                    {
+                        "account_code": "5350",
+                        "name": "Inventory Adjustment",
+                        "cash_flow_section": "Operating",
+                    },
                     {
                         "account_code": "5400",
                         "name": "Office Supplies",
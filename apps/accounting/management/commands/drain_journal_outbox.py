@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.accounting.services.outbox import drain_journal_outbox
+
+
+class Command(BaseCommand):
+    help = "Post journal entries queued in the journal outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of queued entries posted per transaction",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=5,
+            help="Attempts before an entry is marked dead",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and poll for new entries",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls when --loop is set",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = drain_journal_outbox(
+                batch_size=options["batch_size"],
+                max_attempts=options["max_attempts"],
+            )
+            if stats["posted"] or stats["failed"] or not options["loop"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Posted {stats['posted']} journal entries, "
+                        f"{stats['failed']} failed."
+                    )
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
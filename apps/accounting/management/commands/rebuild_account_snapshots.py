@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounting.services.snapshots import rebuild_balance_snapshots
+
+
+class Command(BaseCommand):
+    help = "Rebuild monthly account balance snapshots from posted transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of snapshot rows inserted per query",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding account balance snapshots...")
+        count = rebuild_balance_snapshots(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {count} account balance snapshots.")
+        )
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:08
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_snapshots(apps, schema_editor):
+    Transaction = apps.get_model("accounting", "Transaction")
+    AccountBalanceSnapshot = apps.get_model("accounting", "AccountBalanceSnapshot")
+
+    rows = (
+        Transaction.objects.annotate(period=TruncMonth("journal__date"))
+        .values("account_id", "period")
+        .annotate(
+            debit=Sum("amount", filter=Q(is_debit=True)),
+            credit=Sum("amount", filter=Q(is_debit=False)),
+        )
+        .order_by()
+    )
+    AccountBalanceSnapshot.objects.bulk_create(
+        [
+            AccountBalanceSnapshot(
+                account_id=row["account_id"],
+                period=row["period"],
+                debit=row["debit"] or Decimal("0"),
+                credit=row["credit"] or Decimal("0"),
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('period', models.DateField()),
+                ('debit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('credit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='accounting.account')),
+            ],
+            options={
+                'unique_together': {('account', 'period')},
+            },
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
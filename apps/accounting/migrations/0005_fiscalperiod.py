@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:20
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_journaloutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FiscalPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100)),
+                ('start_date', models.DateField(unique=True)),
+                ('end_date', models.DateField(unique=True)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('closed', 'Closed')], default='open', max_length=10)),
+                ('closed_on', models.DateTimeField(blank=True, null=True)),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FiscalPeriodBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('closing_debit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('closing_credit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('carried_debit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('carried_credit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_balances', to='accounting.account')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='accounting.fiscalperiod')),
+            ],
+            options={
+                'unique_together': {('period', 'account')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:27
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_journal_dates(apps, schema_editor):
+    JournalEntry = apps.get_model("accounting", "JournalEntry")
+    Transaction = apps.get_model("accounting", "Transaction")
+
+    Transaction.objects.update(
+        date=Subquery(
+            JournalEntry.objects.filter(pk=OuterRef("journal_id")).values("date")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0006_ledgerversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='date',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(copy_journal_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='transaction',
+            name='date',
+            field=models.DateField(),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'date', 'is_debit'], name='accounting__account_7c0dff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date', 'account'], name='accounting__date_1241e4_idx'),
+        ),
+    ]
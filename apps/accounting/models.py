@@ -1,4 +1,7 @@
+from decimal import Decimal
+
 from django.db import models
+from django.utils import timezone
 
 from apps.core.models import AbsoluteBaseModel
 
@@ -76,7 +79,148 @@ class Transaction(AbsoluteBaseModel):
     account = models.ForeignKey(Account, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     is_debit = models.BooleanField()  # True if debit, False if credit
+    # Copy of journal.date so ledger queries can filter without the join
+    date = models.DateField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account", "date", "is_debit"]),
+            models.Index(fields=["date", "account"]),
+        ]
 
     def __str__(self):
         type_ = "Dr" if self.is_debit else "Cr"
         return f"{type_} {self.amount} to {self.account}"
+
+
+class AccountBalanceSnapshot(AbsoluteBaseModel):
+    """Monthly debit/credit totals per account, kept in step with postings."""
+
+    account = models.ForeignKey(
+        Account, related_name="balance_snapshots", on_delete=models.CASCADE
+    )
+    period = models.DateField()  # first day of the month
+    debit = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0"))
+    credit = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0")
+    )
+
+    class Meta:
+        unique_together = ("account", "period")
+
+    def __str__(self):
+        return f"{self.account} - {self.period:%b %Y}"
+
+
+class LedgerVersion(AbsoluteBaseModel):
+    """
+    Single-row counter bumped whenever posted balances change, cached
+    financial statements are keyed on it.
+    """
+
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Ledger version {self.version}"
+
+
+class FiscalPeriod(AbsoluteBaseModel):
+    OPEN = "open"
+    CLOSED = "closed"
+
+    STATUS_CHOICES = [
+        (OPEN, "Open"),
+        (CLOSED, "Closed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    start_date = models.DateField(unique=True)
+    end_date = models.DateField(unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=OPEN)
+    closed_on = models.DateTimeField(null=True, blank=True)
+    closed_by = models.ForeignKey(
+        "users.User", on_delete=models.SET_NULL, null=True, blank=True
+    )
+
+    class Meta:
+        ordering = ["start_date"]
+
+    def __str__(self):
+        return f"{self.name} ({self.start_date} - {self.end_date})"
+
+
+class FiscalPeriodBalance(AbsoluteBaseModel):
+    """
+    Per-account totals stored when a fiscal period is closed.
+
+    closing_* are the cumulative totals at the end of the period. carried_*
+    open the next period: the same figures for balance sheet accounts, zero
+    for income and expense accounts, whose totals move into retained earnings.
+    """
+
+    period = models.ForeignKey(
+        FiscalPeriod, related_name="balances", on_delete=models.CASCADE
+    )
+    account = models.ForeignKey(
+        Account, related_name="period_balances", on_delete=models.CASCADE
+    )
+    closing_debit = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0")
+    )
+    closing_credit = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0")
+    )
+    carried_debit = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0")
+    )
+    carried_credit = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0")
+    )
+
+    class Meta:
+        unique_together = ("period", "account")
+
+    def __str__(self):
+        return f"{self.account} - {self.period.name}"
+
+
+class JournalOutbox(AbsoluteBaseModel):
+    """
+    Journal entries queued by signal receivers, posted later in batches by
+    the `drain_journal_outbox` command.
+    """
+
+    PENDING = "pending"
+    FAILED = "failed"
+    POSTED = "posted"
+    DEAD = "dead"
+
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (FAILED, "Failed"),
+        (POSTED, "Posted"),
+        (DEAD, "Dead"),
+    ]
+
+    date = models.DateField()
+    description = models.TextField()
+    reference = models.CharField(max_length=100, null=True, blank=True)
+    created_by = models.ForeignKey("users.User", on_delete=models.SET_NULL, null=True)
+    # [{"account": <account id>, "amount": "100.00", "is_debit": true}, ...]
+    lines = models.JSONField()
+    # Optional {"model": "app_label.Model", "pk": 1, "field": "journal_entry"}
+    # pointing at the row that should reference the posted journal
+    link = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    journal = models.ForeignKey(
+        JournalEntry, on_delete=models.SET_NULL, null=True, blank=True
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "available_at"])]
+
+    def __str__(self):
+        return f"{self.reference} ({self.status})"
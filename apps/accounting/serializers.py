@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import AccountType, Account, JournalEntry, Transaction
+from .models import AccountType, Account, FiscalPeriod, JournalEntry, Transaction
+from .services.journals import create_journal_entry
 
 
 class AccountTypeSerializer(serializers.ModelSerializer):
@@ -103,7 +104,6 @@ class JournalEntrySerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         transactions_data = validated_data.pop("transactions")
-        journal_entry = JournalEntry.objects.create(**validated_data)
 
         total_debit = 0
         total_credit = 0
@@ -119,7 +119,48 @@ class JournalEntrySerializer(serializers.ModelSerializer):
         if total_debit != total_credit:
             raise serializers.ValidationError("Debits and credits must be equal")
 
-        for tx in transactions_data:
-            Transaction.objects.create(journal=journal_entry, **tx)
+        try:
+            return create_journal_entry(
+                description=validated_data["description"],
+                reference=validated_data.get("reference"),
+                user=validated_data.get("created_by"),
+                transactions=transactions_data,
+                date=validated_data["date"],
+            )
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
 
-        return journal_entry
+class FiscalPeriodSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FiscalPeriod
+        fields = [
+            "id",
+            "name",
+            "start_date",
+            "end_date",
+            "status",
+            "closed_on",
+            "closed_by",
+        ]
+        read_only_fields = ["status", "closed_on", "closed_by"]
+
+    def validate(self, attrs):
+        start_date = attrs.get("start_date", getattr(self.instance, "start_date", None))
+        end_date = attrs.get("end_date", getattr(self.instance, "end_date", None))
+        if start_date > end_date:
+            raise serializers.ValidationError("start_date must be before end_date")
+
+        if self.instance and self.instance.status == FiscalPeriod.CLOSED:
+            raise serializers.ValidationError("A closed fiscal period cannot be edited")
+
+        overlapping = FiscalPeriod.objects.filter(
+            start_date__lte=end_date, end_date__gte=start_date
+        )
+        if self.instance:
+            overlapping = overlapping.exclude(pk=self.instance.pk)
+        if overlapping.exists():
+            raise serializers.ValidationError(
+                "Fiscal period overlaps an existing period"
+            )
+        return attrs
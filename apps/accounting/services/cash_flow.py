@@ -0,0 +1,148 @@
+import base64
+from datetime import date, timedelta
+from itertools import groupby
+
+from django.db.models import Case, IntegerField, Q, Sum, Value, When
+
+from apps.accounting.models import Account, Transaction
+from apps.accounting.services.ledger import ZERO, get_account_totals
+
+SECTIONS = ["Operating", "Investing", "Financing"]
+
+
+def get_opening_cash_balance(start_date):
+    """Net debit balance of all asset accounts before ``start_date``."""
+    cash_accounts = Account.objects.filter(account_type__name="Asset")
+    totals = get_account_totals(
+        as_of_date=start_date - timedelta(days=1), accounts=cash_accounts
+    )
+    return sum((debit - credit for debit, credit in totals.values()), ZERO)
+
+
+def _cash_transactions(start_date, end_date):
+    return Transaction.objects.filter(
+        account__account_type__name="Asset",  # Only cash accounts
+        account__cash_flow_section__in=SECTIONS,
+        date__range=(start_date, end_date),
+    )
+
+
+def get_section_totals(start_date, end_date):
+    """
+    Returns {section: (inflows, outflows)} for every section, computed with
+    one grouped query.
+    """
+    totals = {section: (ZERO, ZERO) for section in SECTIONS}
+    rows = (
+        _cash_transactions(start_date, end_date)
+        .values("account__cash_flow_section")
+        .annotate(
+            inflows=Sum("amount", filter=Q(is_debit=True)),
+            outflows=Sum("amount", filter=Q(is_debit=False)),
+        )
+        .order_by()
+    )
+    for row in rows:
+        totals[row["account__cash_flow_section"]] = (
+            row["inflows"] or ZERO,
+            row["outflows"] or ZERO,
+        )
+    return totals
+
+
+def encode_cursor(section, journal_date, journal_id):
+    raw = f"{section}|{journal_date.isoformat()}|{journal_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns (section, date, journal_id), raises ValueError on a bad cursor."""
+    try:
+        section, journal_date, journal_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        if section not in SECTIONS:
+            raise ValueError(section)
+        return section, date.fromisoformat(journal_date), int(journal_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def iter_cash_flow_journals(start_date, end_date, after=None):
+    """
+    Yields (section, journal) pairs ordered by section, journal date and id.
+
+    Transactions are read in a single ordered query and streamed from the
+    database cursor, so memory use does not grow with the date range.
+    ``after`` is a decoded cursor, only journals sorting after it are
+    returned.
+    """
+    section_order = Case(
+        *[
+            When(account__cash_flow_section=section, then=Value(index))
+            for index, section in enumerate(SECTIONS)
+        ],
+        output_field=IntegerField(),
+    )
+    transactions = _cash_transactions(start_date, end_date).annotate(
+        section_order=section_order
+    )
+
+    if after:
+        section, journal_date, journal_id = after
+        index = SECTIONS.index(section)
+        transactions = transactions.filter(
+            Q(section_order__gt=index)
+            | Q(section_order=index, date__gt=journal_date)
+            | Q(
+                section_order=index,
+                date=journal_date,
+                journal_id__gt=journal_id,
+            )
+        )
+
+    rows = (
+        transactions.order_by("section_order", "date", "journal_id", "id")
+        .values_list(
+            "account__cash_flow_section",
+            "journal_id",
+            "date",
+            "journal__description",
+            "journal__reference",
+            "account__account_code",
+            "account__name",
+            "amount",
+            "is_debit",
+        )
+        .iterator(chunk_size=2000)
+    )
+
+    for (section, journal_id), lines in groupby(rows, key=lambda row: row[:2]):
+        journal = None
+        for (
+            _,
+            _,
+            journal_date,
+            description,
+            reference,
+            account_code,
+            account_name,
+            amount,
+            is_debit,
+        ) in lines:
+            if journal is None:
+                journal = {
+                    "journal_id": journal_id,
+                    "date": journal_date,
+                    "description": description,
+                    "reference": reference,
+                    "transactions": [],
+                }
+            journal["transactions"].append(
+                {
+                    "account": f"{account_code} - {account_name}",
+                    "amount": str(amount),
+                    "type": "inflow" if is_debit else "outflow",
+                }
+            )
+        yield section, journal
@@ -0,0 +1,137 @@
+import time
+from dataclasses import dataclass
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from apps.accounting.models import Account
+
+
+@dataclass(frozen=True)
+class DefaultAccount:
+    name: str
+    account_code: str
+
+
+# Role -> the chart-of-accounts entry posting code should use for it.
+# Names match the ones seeded by `create_default_accounts`.
+DEFAULT_ACCOUNTS = {
+    "bank": DefaultAccount("Bank", "1000"),
+    "mpesa": DefaultAccount("M-Pesa", "1020"),
+    "other_receipts": DefaultAccount("Other Receipts", "1030"),
+    "cash": DefaultAccount("Cash", "1100"),
+    "receivable": DefaultAccount("Accounts Receivable", "1200"),
+    "inventory": DefaultAccount("Inventory", "1300"),
+    "payable": DefaultAccount("Accounts Payable", "2000"),
+    "retained_earnings": DefaultAccount("Retained Earnings", "3100"),
+    "tuition_revenue": DefaultAccount("Tuition Revenue", "4100"),
+    "misc_income": DefaultAccount("Miscellaneous Income", "4400"),
+    "salaries": DefaultAccount("Salaries & Wages", "5200"),
+    "cost_of_goods_sold": DefaultAccount("Cost of Goods Sold", "5300"),
+    "inventory_adjustment": DefaultAccount("Inventory Adjustment", "5350"),
+    "vendor_payments": DefaultAccount("Vendor Payments", "5700"),
+}
+
+# Payment method (as stored on payments, lower-cased) -> account role
+PAYMENT_METHOD_ROLES = {
+    "cash": "cash",
+    "bank": "bank",
+    "bank transfer": "bank",
+    "cheque": "bank",
+    "mpesa": "mpesa",
+    "m-pesa": "mpesa",
+}
+
+# Token in the Django cache naming the current registry. Processes keep
+# the accounts themselves in memory and only compare this token, so a
+# lookup does not unpickle the accounts. With a per-process cache such as
+# the default LocMemCache a change made in one worker reaches the others
+# only after DEFAULT_ACCOUNTS_CACHE_TIMEOUT, so deployments running several
+# workers should configure a shared cache (Redis, Memcached).
+DEFAULT_ACCOUNTS_VERSION_KEY = "accounting:default-accounts-version"
+
+# Short enough that a change missed by the signals (raw SQL, another
+# deployment sharing the database) is picked up within minutes
+DEFAULT_ACCOUNTS_CACHE_TIMEOUT = getattr(
+    settings, "ACCOUNTING_DEFAULT_ACCOUNTS_CACHE_TIMEOUT", 5 * 60
+)
+
+# (version token, monotonic load time, role -> Account) of this process
+_registry = (None, 0.0, {})
+
+
+def _registry_version():
+    version = cache.get(DEFAULT_ACCOUNTS_VERSION_KEY)
+    if version is None:
+        cache.add(DEFAULT_ACCOUNTS_VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(DEFAULT_ACCOUNTS_VERSION_KEY)
+    return version
+
+
+def _load():
+    """Resolves every role in one query, preferring accounts flagged is_default."""
+    by_name = {}
+    accounts = (
+        Account.objects.select_related("account_type")
+        .annotate(lower_name=Lower("name"))
+        .filter(lower_name__in=[d.name.lower() for d in DEFAULT_ACCOUNTS.values()])
+        .order_by("-is_default", "account_code")
+    )
+    for account in accounts:
+        by_name.setdefault(account.lower_name, account)
+
+    return {
+        role: by_name[default.name.lower()]
+        for role, default in DEFAULT_ACCOUNTS.items()
+        if default.name.lower() in by_name
+    }
+
+
+def get_default_account(role: str) -> Account:
+    """
+    Returns the account configured for ``role``.
+
+    Accounts are loaded in one query and kept in memory until an Account
+    is saved or deleted (which changes the version token in the Django
+    cache) or DEFAULT_ACCOUNTS_CACHE_TIMEOUT passes. Raises
+    Account.DoesNotExist if the chart of accounts has no matching entry.
+    """
+    global _registry
+
+    if role not in DEFAULT_ACCOUNTS:
+        raise KeyError(f"Unknown default account role: {role}")
+
+    version = _registry_version()
+    loaded_version, loaded_at, accounts = _registry
+    if (
+        loaded_version != version
+        or time.monotonic() - loaded_at > DEFAULT_ACCOUNTS_CACHE_TIMEOUT
+    ):
+        accounts = _load()
+        _registry = (version, time.monotonic(), accounts)
+
+    try:
+        return accounts[role]
+    except KeyError:
+        default = DEFAULT_ACCOUNTS[role]
+        raise Account.DoesNotExist(
+            f"No '{default.name}' ({default.account_code}) account found for role '{role}'"
+        )
+
+
+def get_payment_account(payment_method: str, fallback: str = "cash") -> Account:
+    """Returns the asset account that receives (or pays out) ``payment_method``."""
+    role = PAYMENT_METHOD_ROLES.get((payment_method or "").strip().lower(), fallback)
+    return get_default_account(role)
+
+
+def clear_default_accounts_cache():
+    # Replaced again on commit so another process cannot keep the accounts
+    # it loaded from before this transaction under the new token
+    cache.set(DEFAULT_ACCOUNTS_VERSION_KEY, uuid4().hex, timeout=None)
+    transaction.on_commit(
+        lambda: cache.set(DEFAULT_ACCOUNTS_VERSION_KEY, uuid4().hex, timeout=None)
+    )
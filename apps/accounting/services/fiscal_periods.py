@@ -0,0 +1,145 @@
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.accounting.models import (
+    Account,
+    FiscalPeriod,
+    FiscalPeriodBalance,
+    JournalOutbox,
+)
+from apps.accounting.services.default_accounts import get_default_account
+from apps.accounting.services.ledger import ZERO, get_account_totals
+from apps.accounting.services.report_cache import bump_ledger_version
+
+# Account types whose totals are rolled into retained earnings on close
+INCOME_STATEMENT_TYPES = ("Income", "Expense")
+
+
+def get_closed_through():
+    """Returns the end date of the last closed fiscal period, or None."""
+    return FiscalPeriod.objects.filter(status=FiscalPeriod.CLOSED).aggregate(
+        closed_through=Max("end_date")
+    )["closed_through"]
+
+
+# Key of the PostgreSQL advisory lock ordering postings against closes
+FISCAL_CLOSE_LOCK_KEY = 7_300_118
+
+
+def lock_fiscal_close(exclusive=False):
+    """
+    Takes the lock that orders postings against fiscal period closes and
+    holds it until the surrounding transaction ends. Postings take it
+    shared, so they do not wait for each other. A close takes it exclusively,
+    so it waits for in-flight postings to commit before reading its totals,
+    and no posting can pass the closed-period check until the close commits.
+
+    PostgreSQL uses a transaction-level advisory lock. Other backends lock
+    the fiscal period rows instead, which also serializes postings.
+    """
+    if connection.vendor == "postgresql":
+        function = (
+            "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT {function}(%s)", [FISCAL_CLOSE_LOCK_KEY])
+    else:
+        list(FiscalPeriod.objects.select_for_update().values_list("pk", flat=True))
+
+
+def ensure_dates_open(dates):
+    """
+    Raises ValueError if any of ``dates`` falls in a closed fiscal period.
+    Must be called inside the transaction that writes the postings, the
+    close lock it takes is held until that transaction commits.
+    """
+    dates = [d for d in dates if d]
+    if not dates:
+        return
+
+    lock_fiscal_close()
+    closed_through = get_closed_through()
+    if closed_through and min(dates) <= closed_through:
+        raise ValueError(
+            f"Cannot post on {min(dates)}: fiscal periods are closed "
+            f"through {closed_through}"
+        )
+
+
+@transaction.atomic
+def close_fiscal_period(period, user):
+    """
+    Closes ``period`` and stores its per-account balances.
+
+    Closing totals are the cumulative debits and credits at the period end.
+    They are carried forward as opening balances for the next period, except
+    income and expense totals which are moved into the retained earnings
+    account. Earlier periods must be closed first. Returns the period.
+
+    Postings and outbox entries dated inside the period are held off by
+    lock_fiscal_close for the whole close, and the close is refused while
+    queued outbox entries dated inside it are still waiting to be posted,
+    so none can be missing from the carried balances.
+    """
+    lock_fiscal_close(exclusive=True)
+    period = FiscalPeriod.objects.select_for_update().get(pk=period.pk)
+    if period.status == FiscalPeriod.CLOSED:
+        raise ValueError(f"Fiscal period {period.name} is already closed")
+
+    if FiscalPeriod.objects.filter(
+        status=FiscalPeriod.OPEN, start_date__lt=period.start_date
+    ).exists():
+        raise ValueError("Earlier fiscal periods must be closed first")
+
+    unposted = JournalOutbox.objects.filter(
+        status__in=[JournalOutbox.PENDING, JournalOutbox.FAILED],
+        date__lte=period.end_date,
+    ).count()
+    if unposted:
+        raise ValueError(
+            f"{unposted} queued journal entries dated on or before "
+            f"{period.end_date} have not been posted yet, drain the journal "
+            "outbox before closing"
+        )
+
+    retained_earnings = get_default_account("retained_earnings")
+
+    totals = get_account_totals(as_of_date=period.end_date)
+    accounts = Account.all_objects.select_related("account_type").in_bulk(
+        totals.keys()
+    )
+
+    balances = {}
+    rolled_debit = rolled_credit = ZERO
+    for account_id, (debit, credit) in totals.items():
+        balance = FiscalPeriodBalance(
+            period=period,
+            account_id=account_id,
+            closing_debit=debit,
+            closing_credit=credit,
+        )
+        if accounts[account_id].account_type.name in INCOME_STATEMENT_TYPES:
+            rolled_debit += debit
+            rolled_credit += credit
+        else:
+            balance.carried_debit = debit
+            balance.carried_credit = credit
+        balances[account_id] = balance
+
+    retained = balances.setdefault(
+        retained_earnings.id,
+        FiscalPeriodBalance(period=period, account=retained_earnings),
+    )
+    retained.carried_debit += rolled_debit
+    retained.carried_credit += rolled_credit
+
+    FiscalPeriodBalance.objects.bulk_create(balances.values())
+    # Cumulative totals now start from the carried balances
+    bump_ledger_version()
+
+    period.status = FiscalPeriod.CLOSED
+    period.closed_on = timezone.now()
+    period.closed_by = user
+    period.save()
+    return period
@@ -0,0 +1,135 @@
+import base64
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Case,
+    DecimalField,
+    F,
+    Q,
+    Sum,
+    Value,
+    When,
+    Window,
+)
+
+from apps.accounting.models import Transaction
+from apps.accounting.services.ledger import ZERO, account_balance, get_account_totals
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+CENT = Decimal("0.01")
+
+
+def get_opening_balance(account, start_date):
+    """Balance of ``account`` at the close of the day before ``start_date``."""
+    totals = get_account_totals(
+        as_of_date=start_date - timedelta(days=1), accounts=[account]
+    )
+    return account_balance(account, *totals.get(account.id, (ZERO, ZERO)))
+
+
+def get_period_totals(account, start_date, end_date):
+    """Returns (debit, credit) posted to ``account`` within the range."""
+    totals = get_account_totals(
+        start_date=start_date, end_date=end_date, accounts=[account]
+    )
+    return totals.get(account.id, (ZERO, ZERO))
+
+
+def encode_cursor(journal_date, transaction_id):
+    raw = f"{journal_date.isoformat()}|{transaction_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns (date, transaction_id), raises ValueError on a bad cursor."""
+    try:
+        journal_date, transaction_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        return date.fromisoformat(journal_date), int(transaction_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def get_cursor_balance(account, journal_date, transaction_id):
+    """
+    Running balance of ``account`` just after transaction ``transaction_id``
+    on ``journal_date``: the opening balance of that day plus the day's
+    postings up to and including it, in (date, id) order.
+    """
+    day = Transaction.objects.filter(
+        account=account, date=journal_date, id__lte=transaction_id
+    ).aggregate(
+        debit=Sum("amount", filter=Q(is_debit=True), default=ZERO),
+        credit=Sum("amount", filter=Q(is_debit=False), default=ZERO),
+    )
+    return get_opening_balance(account, journal_date) + account_balance(
+        account, day["debit"], day["credit"]
+    )
+
+
+def general_ledger_lines(
+    account, start_date, end_date, opening_balance, after=None, limit=None
+):
+    """
+    Yields the account's transactions in the range ordered by (journal date,
+    id), each annotated with ``balance``, the running balance after it.
+
+    The running balance is a cumulative window sum computed by the database.
+    ``after`` is a decoded cursor: only rows sorting after it are returned
+    and the balance at the cursor, recomputed by get_cursor_balance rather
+    than taken from the client, replaces ``opening_balance``, so a deep page
+    costs the same as the first. ``limit`` caps the number of rows returned.
+    """
+    if account.account_type.normal_balance == "debit":
+        signed = Case(
+            When(is_debit=True, then=F("amount")),
+            default=-F("amount"),
+            output_field=AMOUNT_FIELD,
+        )
+    else:
+        signed = Case(
+            When(is_debit=False, then=F("amount")),
+            default=-F("amount"),
+            output_field=AMOUNT_FIELD,
+        )
+
+    transactions = Transaction.objects.filter(
+        account=account, date__range=(start_date, end_date)
+    )
+    if after:
+        after_date, after_id = after
+        opening_balance = get_cursor_balance(account, after_date, after_id)
+        transactions = transactions.filter(
+            Q(date__gt=after_date) | Q(date=after_date, id__gt=after_id)
+        )
+
+    lines = (
+        transactions.annotate(
+            balance=Window(
+                Sum(signed),
+                order_by=[F("date").asc(), F("id").asc()],
+                output_field=AMOUNT_FIELD,
+            )
+            + Value(opening_balance, output_field=AMOUNT_FIELD),
+        )
+        .order_by("date", "id")
+        .values(
+            "id",
+            "journal_id",
+            "date",
+            "journal__reference",
+            "journal__description",
+            "amount",
+            "is_debit",
+            "balance",
+        )
+    )
+    if limit is not None:
+        lines = lines[:limit]
+
+    for line in lines.iterator(chunk_size=2000):
+        # SQLite returns computed decimals unrounded, match the column scale
+        line["balance"] = line["balance"].quantize(CENT)
+        yield line
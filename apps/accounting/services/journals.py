@@ -1,8 +1,21 @@
+from collections import defaultdict
+
 from apps.accounting.models import JournalEntry, Transaction
+from apps.accounting.services.fiscal_periods import (
+    ensure_dates_open,
+    get_closed_through,
+    lock_fiscal_close,
+)
+from apps.accounting.services.ledger import ZERO
+from apps.accounting.services.report_cache import bump_ledger_version
+from apps.accounting.services.snapshots import record_snapshot_movements
+from django.db import connection, transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
 from django.utils import timezone
 
 
-def create_journal_entry(description, reference, user, transactions):
+def create_journal_entry(description, reference, user, transactions, date=None):
     """
     Creates a balanced journal entry.
 
@@ -16,40 +29,115 @@ def create_journal_entry(description, reference, user, transactions):
                 "amount": Decimal,
                 "is_debit": True/False
             }
+        - date: posting date, defaults to today
     """
+    return create_journal_entries_bulk(
+        [
+            {
+                "description": description,
+                "reference": reference,
+                "user": user,
+                "transactions": transactions,
+                "date": date,
+            }
+        ]
+    )[0]
 
-    journal = JournalEntry.objects.create(
-        date=timezone.now().date(),
-        description=description,
-        reference=reference,
-        created_by=user,
-    )
 
-    total_debit = 0
-    total_credit = 0
+def validate_entry(index, entry):
+    """
+    Raises ValueError when ``entry`` has no transactions or its debits and
+    credits do not match. ``index`` identifies the entry in the message.
+    """
+    transactions = entry["transactions"]
+    if not transactions:
+        raise ValueError(f"Journal entry #{index} has no transactions")
 
-    for tx in transactions:
-        Transaction.objects.create(
+    total_debit = sum(tx["amount"] for tx in transactions if tx["is_debit"])
+    total_credit = sum(tx["amount"] for tx in transactions if not tx["is_debit"])
+
+    if total_debit != total_credit:
+        raise ValueError(
+            f"Unbalanced journal entry #{index} ({entry.get('reference')}): "
+            "Debits and Credits must match"
+        )
+
+
+@transaction.atomic
+def create_journal_entries_bulk(entries, batch_size=500):
+    """
+    Creates many balanced journal entries with bulk inserts.
+
+    Params:
+        - entries: list of dicts with the same keys as create_journal_entry's
+          arguments: description, reference, user, transactions and
+          optionally date
+        - batch_size: rows per INSERT statement
+
+    Every entry is validated before anything is written, so one unbalanced
+    entry, or one dated in a closed fiscal period, rejects the whole batch.
+    Returns the JournalEntry instances in the same order as ``entries``.
+    """
+    for index, entry in enumerate(entries):
+        validate_entry(index, entry)
+
+    if not entries:
+        return []
+
+    today = timezone.now().date()
+    ensure_dates_open(entry.get("date") or today for entry in entries)
+
+    journals = [
+        JournalEntry(
+            date=entry.get("date") or today,
+            description=entry["description"],
+            reference=entry.get("reference"),
+            created_by=entry.get("user"),
+        )
+        for entry in entries
+    ]
+
+    if connection.features.can_return_rows_from_bulk_insert:
+        JournalEntry.objects.bulk_create(journals, batch_size=batch_size)
+    else:
+        for journal in journals:
+            journal.save()
+
+    lines = [
+        Transaction(
             journal=journal,
             account=tx["account"],
             amount=tx["amount"],
             is_debit=tx["is_debit"],
+            date=journal.date,
         )
-        if tx["is_debit"]:
-            total_debit += tx["amount"]
-        else:
-            total_credit += tx["amount"]
+        for journal, entry in zip(journals, entries)
+        for tx in entry["transactions"]
+    ]
+    Transaction.objects.bulk_create(lines, batch_size=batch_size)
 
-    if total_debit != total_credit:
-        raise ValueError("Unbalanced journal entry: Debits and Credits must match")
+    record_snapshot_movements(
+        (line.account_id, line.date, line.amount, line.is_debit)
+        for line in lines
+    )
+    bump_ledger_version()
 
-    return journal
+    return journals
 
 
+@transaction.atomic
 def reverse_journal_entry(entry, user):
     if entry.reversed_entry:
         raise ValueError("This journal has already been reversed.")
 
+    lock_fiscal_close()
+    closed_through = get_closed_through()
+    if closed_through and entry.date <= closed_through:
+        raise ValueError(
+            f"Cannot reverse a journal dated {entry.date}: fiscal periods are "
+            f"closed through {closed_through}"
+        )
+
     reversed_entry = JournalEntry.objects.create(
         date=timezone.now().date(),
         description=f"REVERSAL: {entry.description}",
@@ -57,14 +145,140 @@ def reverse_journal_entry(entry, user):
         created_by=user,
     )
 
+    lines = []
     for tx in entry.transactions.all():
         Transaction.objects.create(
             journal=reversed_entry,
-            account=tx.account,
+            account_id=tx.account_id,
             amount=tx.amount,
             is_debit=not tx.is_debit,
+            date=reversed_entry.date,
         )
+        lines.append((tx.account_id, reversed_entry.date, tx.amount, not tx.is_debit))
+
+    record_snapshot_movements(lines)
+    bump_ledger_version()
 
     entry.reversed_entry = reversed_entry
     entry.save()
     return reversed_entry
+
+
+def select_journals_for_reversal(
+    reference_prefix=None, start_date=None, end_date=None, cohort=None, semester=None
+):
+    """
+    Returns the journal entries a batch reversal would touch.
+
+    Params:
+        - reference_prefix: e.g. "INVOICE-"
+        - start_date / end_date: journal date range (inclusive)
+        - cohort / semester: limit to invoice journals (INVOICE-<id>) raised
+          for students in the cohort and/or for the semester
+
+    At least one criterion is required. Entries that were already reversed,
+    and entries that are themselves reversals, are excluded.
+    """
+    from apps.student_finance.models import StudentFeeInvoice
+
+    if not any([reference_prefix, start_date, end_date, cohort, semester]):
+        raise ValueError("At least one selection criterion is required")
+
+    journals = JournalEntry.objects.filter(
+        reversed_entry__isnull=True, journalentry__isnull=True
+    )
+    if reference_prefix:
+        journals = journals.filter(reference__startswith=reference_prefix)
+    if start_date:
+        journals = journals.filter(date__gte=start_date)
+    if end_date:
+        journals = journals.filter(date__lte=end_date)
+
+    if cohort or semester:
+        invoices = StudentFeeInvoice.objects.all()
+        if cohort:
+            invoices = invoices.filter(student__cohort=cohort)
+        if semester:
+            invoices = invoices.filter(semester=semester)
+        journals = journals.filter(
+            reference__in=invoices.annotate(
+                journal_reference=Concat(
+                    Value("INVOICE-"), Cast("id", output_field=CharField())
+                )
+            ).values("journal_reference")
+        )
+    return journals
+
+
+@transaction.atomic
+def reverse_journal_entries_bulk(journals, user, dry_run=False, batch_size=500):
+    """
+    Reverses every journal entry in the ``journals`` queryset at once.
+
+    Reversing entries and their transactions are written with bulk inserts
+    and the originals are linked through ``reversed_entry``, all in one
+    transaction. With ``dry_run`` nothing is written. Returns a summary
+    dict of what was (or would be) reversed.
+    """
+    journals = list(journals.select_for_update(of=("self",)).order_by("date", "id"))
+
+    summary = {
+        "dry_run": dry_run,
+        "journals": len(journals),
+        "transactions": 0,
+        "total_amount": ZERO,
+        "first_date": journals[0].date if journals else None,
+        "last_date": journals[-1].date if journals else None,
+        "reversal_ids": [],
+    }
+    if not journals:
+        return summary
+
+    lock_fiscal_close()
+    closed_through = get_closed_through()
+    if closed_through and journals[0].date <= closed_through:
+        raise ValueError(
+            f"Cannot reverse journals dated {journals[0].date}: fiscal periods "
+            f"are closed through {closed_through}"
+        )
+
+    lines = defaultdict(list)
+    for tx in Transaction.objects.filter(
+        journal_id__in=[journal.id for journal in journals]
+    ).select_related("account"):
+        lines[tx.journal_id].append(tx)
+        summary["transactions"] += 1
+        if tx.is_debit:
+            summary["total_amount"] += tx.amount
+
+    if dry_run:
+        return summary
+
+    today = timezone.now().date()
+    reversals = create_journal_entries_bulk(
+        [
+            {
+                "description": f"REVERSAL: {journal.description}",
+                "reference": f"REV-{journal.reference}",
+                "user": user,
+                "date": today,
+                "transactions": [
+                    {
+                        "account": tx.account,
+                        "amount": tx.amount,
+                        "is_debit": not tx.is_debit,
+                    }
+                    for tx in lines[journal.id]
+                ],
+            }
+            for journal in journals
+        ],
+        batch_size=batch_size,
+    )
+
+    for journal, reversal in zip(journals, reversals):
+        journal.reversed_entry = reversal
+    JournalEntry.objects.bulk_update(journals, ["reversed_entry"], batch_size=batch_size)
+
+    summary["reversal_ids"] = [reversal.id for reversal in reversals]
+    return summary
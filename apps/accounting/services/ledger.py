@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Q, Subquery, Sum
+
+from apps.accounting.models import (
+    AccountBalanceSnapshot,
+    FiscalPeriod,
+    FiscalPeriodBalance,
+    Transaction,
+)
+from apps.accounting.services.snapshots import month_start, next_month
+
+ZERO = Decimal("0.00")
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def _merge(totals, rows):
+    for row in rows:
+        debit, credit = totals.get(row["account_id"], (ZERO, ZERO))
+        totals[row["account_id"]] = (
+            debit + (row["debit"] or ZERO),
+            credit + (row["credit"] or ZERO),
+        )
+    return totals
+
+
+def _carried_balances(end, accounts):
+    """
+    Returns (start, totals) where totals are the balances carried out of the
+    last fiscal period closed before ``end`` and start is the day after it.
+    """
+    closed = FiscalPeriod.objects.filter(status=FiscalPeriod.CLOSED)
+    if end:
+        closed = closed.filter(end_date__lt=end)
+
+    balances = FiscalPeriodBalance.objects.filter(
+        period_id=Subquery(closed.order_by("-end_date").values("id")[:1])
+    )
+    if accounts is not None:
+        balances = balances.filter(account__in=accounts)
+
+    start = None
+    totals = {}
+    for row in balances.values(
+        "account_id", "carried_debit", "carried_credit", "period__end_date"
+    ):
+        start = row["period__end_date"] + timedelta(days=1)
+        totals[row["account_id"]] = (row["carried_debit"], row["carried_credit"])
+    return start, totals
+
+
+def get_account_totals(
+    start_date=None, end_date=None, as_of_date=None, accounts=None, carry_forward=True
+):
+    """
+    Returns debit and credit totals for every account.
+
+    Params:
+        - start_date / end_date: restrict to journals dated within the range
+        - as_of_date: restrict to journals dated on or before this date
+        - accounts: optional iterable of accounts (or ids) to limit the result
+        - carry_forward: when False, cumulative totals cover the whole ledger
+          instead, e.g. all-time income and expense movement
+
+    Cumulative totals (no start_date) begin from the balances carried out of
+    the last fiscal period closed before the window ends. Whole months inside
+    the window are read from AccountBalanceSnapshot, only the partial months
+    at either edge are summed from Transaction, so the cost is three queries
+    regardless of how much history exists.
+
+    Returns a dict of {account_id: (total_debit, total_credit)}. Accounts with
+    no postings in the window are omitted, callers should default to ZERO.
+    """
+    start = end = None
+    if start_date and end_date:
+        start, end = _to_date(start_date), _to_date(end_date)
+    elif as_of_date:
+        end = _to_date(as_of_date)
+
+    totals = {}
+    if start is None and carry_forward:
+        start, totals = _carried_balances(end, accounts)
+
+    # [full_from, full_to) is the run of whole months covered by the window
+    full_from = start if start is None or start.day == 1 else next_month(start)
+    full_to = None if end is None else month_start(end + timedelta(days=1))
+
+    snapshots = AccountBalanceSnapshot.objects.all()
+    txs = Transaction.objects.all()
+    if accounts is not None:
+        snapshots = snapshots.filter(account__in=accounts)
+        txs = txs.filter(account__in=accounts)
+
+    if full_from and full_to and full_from >= full_to:
+        # The window sits inside a single month
+        snapshots = snapshots.none()
+        txs = txs.filter(date__range=[start, end])
+    else:
+        if full_from:
+            snapshots = snapshots.filter(period__gte=full_from)
+        if full_to:
+            snapshots = snapshots.filter(period__lt=full_to)
+
+        edges = Q(pk__in=[])
+        if start and start < full_from:
+            edges |= Q(date__gte=start, date__lt=full_from)
+        if end and full_to <= end:
+            edges |= Q(date__gte=full_to, date__lte=end)
+        txs = txs.filter(edges)
+
+    totals = _merge(
+        totals,
+        snapshots.values("account_id")
+        .annotate(debit=Sum("debit"), credit=Sum("credit"))
+        .order_by(),
+    )
+    return _merge(
+        totals,
+        txs.values("account_id")
+        .annotate(
+            debit=Sum("amount", filter=Q(is_debit=True)),
+            credit=Sum("amount", filter=Q(is_debit=False)),
+        )
+        .order_by(),
+    )
+
+
+def account_balance(account, debit, credit):
+    """Signs debit/credit totals according to the account's normal balance."""
+    if account.account_type.normal_balance == "debit":
+        return debit - credit
+    return credit - debit
@@ -0,0 +1,183 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounting.models import Account, JournalOutbox
+from apps.accounting.services.fiscal_periods import ensure_dates_open
+from apps.accounting.services.journals import (
+    create_journal_entries_bulk,
+    validate_entry,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _outbox_row(description, reference, user, transactions, date=None, link=None):
+    return JournalOutbox(
+        date=date or timezone.now().date(),
+        description=description,
+        reference=reference,
+        created_by=user,
+        lines=[
+            {
+                "account": tx["account"].id,
+                "amount": str(tx["amount"]),
+                "is_debit": tx["is_debit"],
+            }
+            for tx in transactions
+        ],
+        link=link,
+    )
+
+
+def enqueue_journal_entry(
+    description, reference, user, transactions, date=None, link=None
+):
+    """
+    Queues a journal entry for deferred posting.
+
+    Takes the same arguments as create_journal_entry plus an optional
+    ``link`` ({"model": "payroll.SalaryPayment", "pk": 1, "field":
+    "journal_entry"}) to update once the journal exists. The row is written
+    in the caller's transaction, so it commits or rolls back with the
+    business record that produced it. Raises ValueError if ``date`` falls
+    in a closed fiscal period, the row could never be posted.
+    """
+    entry = {"reference": reference, "transactions": transactions}
+    validate_entry(0, entry)
+    row = _outbox_row(description, reference, user, transactions, date, link)
+    ensure_dates_open([row.date])
+    row.save()
+    return row
+
+
+def enqueue_journal_entries_bulk(entries):
+    """Bulk version of enqueue_journal_entry, entries use the same keys."""
+    for index, entry in enumerate(entries):
+        validate_entry(index, entry)
+    rows = [
+        _outbox_row(
+            entry["description"],
+            entry.get("reference"),
+            entry.get("user"),
+            entry["transactions"],
+            entry.get("date"),
+            entry.get("link"),
+        )
+        for entry in entries
+    ]
+    ensure_dates_open(row.date for row in rows)
+    return JournalOutbox.objects.bulk_create(rows)
+
+
+def _to_entry(row, accounts):
+    return {
+        "description": row.description,
+        "reference": row.reference,
+        "user": row.created_by,
+        "date": row.date,
+        "transactions": [
+            {
+                "account": accounts[line["account"]],
+                "amount": Decimal(line["amount"]),
+                "is_debit": line["is_debit"],
+            }
+            for line in row.lines
+        ],
+    }
+
+
+def _apply_link(row, journal):
+    if not row.link:
+        return
+    model = apps.get_model(row.link["model"])
+    model.objects.filter(pk=row.link["pk"]).update(**{row.link["field"]: journal})
+
+
+def _post_rows(rows, max_attempts):
+    account_ids = {line["account"] for row in rows for line in row.lines}
+    accounts = Account.all_objects.in_bulk(account_ids)
+
+    entries = {}
+    errors = {}
+    for row in rows:
+        try:
+            entries[row.id] = _to_entry(row, accounts)
+        except KeyError as e:
+            errors[row.id] = f"Account {e} does not exist"
+
+    journals = {}
+    try:
+        # Optimistic path, the whole batch in one set of bulk inserts
+        with transaction.atomic():
+            posted = create_journal_entries_bulk(list(entries.values()))
+            journals = dict(zip(entries.keys(), posted))
+    except Exception:
+        # Isolate the poison message(s) by posting one row at a time
+        for row_id, entry in entries.items():
+            try:
+                with transaction.atomic():
+                    journals[row_id] = create_journal_entries_bulk([entry])[0]
+            except Exception as e:
+                errors[row_id] = str(e)
+
+    now = timezone.now()
+    for row in rows:
+        row.updated_on = now
+        if row.id in journals:
+            row.status = JournalOutbox.POSTED
+            row.journal = journals[row.id]
+            row.last_error = None
+            _apply_link(row, row.journal)
+            continue
+
+        row.attempts += 1
+        row.last_error = errors.get(row.id)
+        if row.attempts >= max_attempts:
+            row.status = JournalOutbox.DEAD
+            logger.error(
+                f"[JournalOutbox:{row.id}] Giving up on {row.reference}: {row.last_error}"
+            )
+        else:
+            row.status = JournalOutbox.FAILED
+            row.available_at = now + timedelta(minutes=2**row.attempts)
+
+    JournalOutbox.objects.bulk_update(
+        rows,
+        ["status", "journal", "attempts", "last_error", "available_at", "updated_on"],
+    )
+    return len(journals), len(rows) - len(journals)
+
+
+def drain_journal_outbox(batch_size=200, max_attempts=5):
+    """
+    Posts queued journal entries in batches until nothing is due.
+
+    Each batch is claimed with SELECT ... FOR UPDATE SKIP LOCKED where the
+    database supports it, so several workers can drain concurrently. Rows
+    that fail are retried with exponential backoff and marked dead after
+    ``max_attempts``. Returns {"posted": n, "failed": n}.
+    """
+    stats = {"posted": 0, "failed": 0}
+    while True:
+        with transaction.atomic():
+            rows = list(
+                JournalOutbox.objects.select_for_update(skip_locked=True, of=("self",))
+                .select_related("created_by")
+                .filter(
+                    status__in=[JournalOutbox.PENDING, JournalOutbox.FAILED],
+                    available_at__lte=timezone.now(),
+                )
+                .order_by("id")[:batch_size]
+            )
+            if not rows:
+                return stats
+
+            posted, failed = _post_rows(rows, max_attempts)
+
+        stats["posted"] += posted
+        stats["failed"] += failed
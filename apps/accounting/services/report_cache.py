@@ -0,0 +1,108 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from apps.accounting.models import LedgerVersion
+
+REPORT_CACHE_TIMEOUT = getattr(settings, "ACCOUNTING_REPORT_CACHE_TIMEOUT", 60 * 60)
+
+REPORTS = ("trial_balance", "balance_sheet", "income_statement", "cash_flow")
+
+LEDGER_VERSION_PK = 1
+
+
+def get_ledger_version():
+    return (
+        LedgerVersion.objects.filter(pk=LEDGER_VERSION_PK)
+        .values_list("version", flat=True)
+        .first()
+        or 0
+    )
+
+
+def bump_ledger_version():
+    """
+    Invalidates every cached report. Call inside the transaction that
+    changes posted balances so the new version commits with it.
+    """
+    updated = LedgerVersion.objects.filter(pk=LEDGER_VERSION_PK).update(
+        version=F("version") + 1
+    )
+    if not updated:
+        LedgerVersion.objects.get_or_create(
+            pk=LEDGER_VERSION_PK, defaults={"version": 1}
+        )
+
+
+def _cache_key(report, params, version):
+    params = json.dumps(params, sort_keys=True, cls=DjangoJSONEncoder)
+    digest = hashlib.md5(params.encode()).hexdigest()
+    return f"accounting:report:{report}:{version}:{digest}"
+
+
+def _stats_key(report, outcome):
+    return f"accounting:report-stats:{report}:{outcome}"
+
+
+def _all_stats_keys():
+    return [
+        _stats_key(report, outcome)
+        for report in REPORTS
+        for outcome in ("hits", "misses")
+    ]
+
+
+def _count(report, outcome):
+    key = _stats_key(report, outcome)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(key, 1, timeout=None)
+
+
+def get_cached_report(report, params, build):
+    """
+    Returns the cached ``report`` for ``params`` at the current ledger
+    version, calling ``build()`` and caching its result on a miss.
+
+    Params:
+        - report: one of REPORTS
+        - params: dict of the resolved report parameters
+        - build: callable returning the report data
+    """
+    key = _cache_key(report, params, get_ledger_version())
+    data = cache.get(key)
+    if data is not None:
+        _count(report, "hits")
+        return data
+
+    _count(report, "misses")
+    data = build()
+    cache.set(key, data, timeout=REPORT_CACHE_TIMEOUT)
+    return data
+
+
+def get_cache_stats():
+    """Hit/miss counts per report, plus the current ledger version."""
+    counts = cache.get_many(_all_stats_keys())
+    reports = {}
+    for report in REPORTS:
+        hits = counts.get(_stats_key(report, "hits"), 0)
+        misses = counts.get(_stats_key(report, "misses"), 0)
+        total = hits + misses
+        reports[report] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total * 100, 2) if total else 0,
+        }
+    return {"ledger_version": get_ledger_version(), "reports": reports}
+
+
+def reset_cache_stats():
+    cache.delete_many(_all_stats_keys())
@@ -0,0 +1,98 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from apps.accounting.models import AccountBalanceSnapshot, Transaction
+
+
+def month_start(value):
+    return value.replace(day=1)
+
+
+def next_month(value):
+    if value.month == 12:
+        return value.replace(year=value.year + 1, month=1, day=1)
+    return value.replace(month=value.month + 1, day=1)
+
+
+def record_snapshot_movements(lines):
+    """
+    Adds posted lines to the monthly AccountBalanceSnapshot rows.
+
+    Params:
+        - lines: iterable of (account_id, date, amount, is_debit)
+
+    Must run inside the transaction that writes the lines. Missing rows are
+    inserted first, then every affected row is locked in one query and
+    written back with a single bulk update.
+    """
+    movements = defaultdict(lambda: [Decimal("0.00"), Decimal("0.00")])
+    for account_id, entry_date, amount, is_debit in lines:
+        totals = movements[(account_id, month_start(entry_date))]
+        totals[0 if is_debit else 1] += amount
+
+    if not movements:
+        return
+
+    AccountBalanceSnapshot.objects.bulk_create(
+        [
+            AccountBalanceSnapshot(account_id=account_id, period=period)
+            for account_id, period in movements
+        ],
+        ignore_conflicts=True,
+    )
+
+    # Locked in primary key order so concurrent postings cannot deadlock
+    snapshots = (
+        AccountBalanceSnapshot.objects.select_for_update()
+        .filter(
+            account_id__in={account_id for account_id, _ in movements},
+            period__in={period for _, period in movements},
+        )
+        .order_by("pk")
+    )
+    now = timezone.now()
+    changed = []
+    for snapshot in snapshots:
+        totals = movements.get((snapshot.account_id, snapshot.period))
+        if totals is None:
+            continue
+        snapshot.debit += totals[0]
+        snapshot.credit += totals[1]
+        snapshot.updated_on = now
+        changed.append(snapshot)
+
+    AccountBalanceSnapshot.objects.bulk_update(
+        changed, ["debit", "credit", "updated_on"], batch_size=500
+    )
+
+
+@transaction.atomic
+def rebuild_balance_snapshots(batch_size=1000):
+    """Recomputes every snapshot from the Transaction table. Returns row count."""
+    rows = (
+        Transaction.objects.annotate(period=TruncMonth("date"))
+        .values("account_id", "period")
+        .annotate(
+            debit=Sum("amount", filter=Q(is_debit=True)),
+            credit=Sum("amount", filter=Q(is_debit=False)),
+        )
+        .order_by()
+    )
+
+    AccountBalanceSnapshot.objects.all().delete()
+    snapshots = [
+        AccountBalanceSnapshot(
+            account_id=row["account_id"],
+            period=row["period"],
+            debit=row["debit"] or Decimal("0.00"),
+            credit=row["credit"] or Decimal("0.00"),
+        )
+        for row in rows
+    ]
+    AccountBalanceSnapshot.objects.bulk_create(snapshots, batch_size=batch_size)
+    return len(snapshots)
@@ -1,18 +1,39 @@
 import logging
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from apps.finance.models import LibraryFinePayment
 from apps.inventory.models import InventoryItem
 from apps.payroll.models import SalaryPayment
 from apps.procurement.models import GoodsReceived, VendorPayment
-from apps.accounting.services.journals import create_journal_entry
-from apps.accounting.models import Account
+from apps.accounting.services.outbox import enqueue_journal_entry
+from apps.accounting.services.report_cache import bump_ledger_version
+from apps.accounting.services.default_accounts import (
+    clear_default_accounts_cache,
+    get_default_account,
+    get_payment_account,
+)
+from apps.accounting.models import Account, AccountType, JournalOutbox
 from apps.student_finance.models import StudentFeeInvoice, StudentFeePayment
 
 
 logger = logging.getLogger(__name__)
 
 
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def invalidate_default_accounts(sender, **kwargs):
+    clear_default_accounts_cache()
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+@receiver(post_save, sender=AccountType)
+@receiver(post_delete, sender=AccountType)
+def invalidate_cached_reports(sender, **kwargs):
+    # Reports list accounts by name and type, not only by balance
+    bump_ledger_version()
+
+
 @receiver(post_save, sender=GoodsReceived)
 def create_goods_received_journal(sender, instance, created, **kwargs):
     if not created:
@@ -21,10 +42,10 @@ def create_goods_received_journal(sender, instance, created, **kwargs):
     po = instance.purchase_order
     total = sum(item.quantity * item.unit_price for item in po.items.all())
 
-    inventory = Account.objects.get(name="Inventory", is_default=True)
-    payable = Account.objects.get(name="Accounts Payable", is_default=True)
+    inventory = get_default_account("inventory")
+    payable = get_default_account("payable")
 
-    create_journal_entry(
+    enqueue_journal_entry(
         description=f"Goods received for PO-{po.id}",
         reference=f"PO-{po.id}",
         user=po.created_by,
@@ -49,18 +70,12 @@ def create_fee_payment_journal(sender, instance, created, **kwargs):
     if not created:
         return
 
-    tuition = Account.objects.get(name="Tuition Revenue")
-
-    if instance.payment_method == "Cash":
-        receiving_account = Account.objects.get(name="Cash")
-    elif instance.payment_method == "Bank":
-        receiving_account = Account.objects.get(name="Bank")
-    else:
-        receiving_account = Account.objects.get(
-            name="Other Receipts"
-        )  # Fallback or M-Pesa
+    tuition = get_default_account("tuition_revenue")
+    receiving_account = get_payment_account(
+        instance.payment_method, fallback="other_receipts"
+    )
     full_name = instance.student.user.first_name + " " + instance.student.user.last_name
-    create_journal_entry(
+    enqueue_journal_entry(
         description=f"Fee payment by {full_name} via {instance.payment_method}",
         reference=f"FEEPAY-{instance.id}",
         user=instance.created_by,  # Ensure this is present
@@ -88,12 +103,12 @@ def create_invoice_journal_entry(sender, instance, created, **kwargs):
         return
 
     try:
-        receivable = Account.objects.get(name="Accounts Receivable", is_default=True)
-        tuition = Account.objects.get(name="Tuition Revenue")
+        receivable = get_default_account("receivable")
+        tuition = get_default_account("tuition_revenue")
         full_name = (
             instance.student.user.first_name + " " + instance.student.user.last_name
         )
-        create_journal_entry(
+        enqueue_journal_entry(
             description=f"Invoicing for {full_name}",
             reference=f"INVOICE-{instance.id}",
             user=instance.created_by,
@@ -111,10 +126,10 @@ def create_book_fine_journal(sender, instance, created, **kwargs):
     if not created:
         return
 
-    bank = Account.objects.get(name="Bank", is_default=True)
-    fines = Account.objects.get(name="Miscellaneous Income")
+    bank = get_default_account("bank")
+    fines = get_default_account("misc_income")
 
-    create_journal_entry(
+    enqueue_journal_entry(
         description=f"Lost book fine paid by {instance.student.full_name}",
         reference=f"BOOKFINE-{instance.id}",
         user=instance.created_by,
@@ -148,24 +163,10 @@ def create_salary_payment_journal(sender, instance, created, **kwargs):
         return
 
     try:
-        # Get Salaries & Wages expense account by NAME
-        salaries_wages_acc = Account.objects.get(name__iexact="Salaries & Wages")
-
-        # Map payment method to account NAME
-        payment_account_map = {
-            "bank": lambda: Account.objects.get(code="1000"),  # Bank account by code
-            "cash": lambda: Account.objects.get(
-                name__iexact="Cash"
-            ),  # Cash account by name
-            "mpesa": lambda: Account.objects.get(code="1020"),  # M-Pesa account by code
-            "cheque": lambda: Account.objects.get(code="1000"),  # Cheque paid from bank
-        }
-
-        # Default to Cash if method not in map
-        account_getter = payment_account_map.get(
-            instance.payment_method, lambda: Account.objects.get(name__iexact="Cash")
-        )
-        cash_account = account_getter()
+        salaries_wages_acc = get_default_account("salaries")
+
+        # Cheques are paid from the bank, unknown methods default to Cash
+        cash_account = get_payment_account(instance.payment_method)
 
         logger.info(
             f"[SalaryPayment:{instance.id}] Accounts found: {salaries_wages_acc.name}, {cash_account.name}"
@@ -175,11 +176,20 @@ def create_salary_payment_journal(sender, instance, created, **kwargs):
         logger.error(f"[SalaryPayment:{instance.id}] Required accounts not found: {e}")
         return
 
+    reference = f"SAL-PAY-{instance.id}"
+    if (
+        JournalOutbox.objects.filter(reference=reference)
+        .exclude(status=JournalOutbox.DEAD)
+        .exists()
+    ):
+        # Already queued by an earlier save, the drain links it
+        return
+
     try:
-        # Create the journal entry
-        journal_entry = create_journal_entry(
+        # Queue the journal entry, the outbox links it to the payment once posted
+        queued = enqueue_journal_entry(
             description=f"Salary Payment - {instance.payslip.staff.user.first_name} {instance.payslip.staff.user.last_name} ({instance.payslip.payroll_period_start.strftime('%b %Y')})",
-            reference=f"SAL-PAY-{instance.id}",
+            reference=reference,
             user=instance.processed_by,
             transactions=[
                 {
@@ -193,13 +203,15 @@ def create_salary_payment_journal(sender, instance, created, **kwargs):
                     "is_debit": False,
                 },
             ],
+            link={
+                "model": "payroll.SalaryPayment",
+                "pk": instance.pk,
+                "field": "journal_entry",
+            },
         )
-
-        # Link payment to journal entry (ForeignKey allows multiple payments to same journal)
-        SalaryPayment.objects.filter(pk=instance.pk).update(journal_entry=journal_entry)
         logger.info(
-            f"[SalaryPayment:{instance.id}] Journal entry created successfully: {journal_entry.id}"
+            f"[SalaryPayment:{instance.id}] Journal entry queued: {queued.id}"
         )
 
     except Exception as e:
-        logger.error(f"[SalaryPayment:{instance.id}] Error creating journal entry: {e}")
+        logger.error(f"[SalaryPayment:{instance.id}] Error queueing journal entry: {e}")
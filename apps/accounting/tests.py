@@ -1,3 +1,472 @@
+import base64
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q, Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from apps.accounting.models import (
+    AccountBalanceSnapshot,
+    FiscalPeriod,
+    JournalEntry,
+    JournalOutbox,
+    Transaction,
+)
+from apps.accounting.services.default_accounts import get_default_account
+from apps.accounting.services.fiscal_periods import close_fiscal_period
+from apps.accounting.services.journals import (
+    create_journal_entry,
+    reverse_journal_entry,
+)
+from apps.accounting.services.ledger import ZERO, get_account_totals
+from apps.accounting.services.outbox import (
+    drain_journal_outbox,
+    enqueue_journal_entry,
+)
+from apps.accounting.services.report_cache import get_ledger_version
+from apps.accounting.services.snapshots import rebuild_balance_snapshots
+from apps.users.models import User
+
+
+def ledger_totals(**date_filter):
+    """get_account_totals summed straight from Transaction."""
+    totals = (
+        Transaction.objects.filter(**date_filter)
+        .values("account_id")
+        .annotate(
+            debit=Sum("amount", filter=Q(is_debit=True), default=0),
+            credit=Sum("amount", filter=Q(is_debit=False), default=0),
+        )
+    )
+    return {row["account_id"]: (row["debit"], row["credit"]) for row in totals}
+
+
+class AccountTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cache.clear()
+        call_command("create_default_accounts", stdout=StringIO())
+        cls.user = User.objects.create(username="accountant")
+        cls.cash = get_default_account("cash")
+        cls.tuition = get_default_account("tuition_revenue")
+        cls.salaries = get_default_account("salaries")
+
+        # Postings on both sides of each month boundary
+        cls.journals = [
+            create_journal_entry(
+                "Test posting",
+                f"TEST-{index}",
+                cls.user,
+                [
+                    {"account": debit, "amount": Decimal(amount), "is_debit": True},
+                    {"account": credit, "amount": Decimal(amount), "is_debit": False},
+                ],
+                date=day,
+            )
+            for index, (day, debit, credit, amount) in enumerate(
+                [
+                    (date(2025, 1, 31), cls.cash, cls.tuition, "1000"),
+                    (date(2025, 2, 1), cls.cash, cls.tuition, "250"),
+                    (date(2025, 2, 15), cls.salaries, cls.cash, "400"),
+                    (date(2025, 2, 28), cls.cash, cls.tuition, "75"),
+                    (date(2025, 3, 1), cls.salaries, cls.cash, "60"),
+                    (date(2025, 3, 31), cls.cash, cls.tuition, "300"),
+                    (date(2025, 4, 1), cls.cash, cls.tuition, "20"),
+                ]
+            )
+        ]
+
+    def assertTotalsMatchTransactions(self):
+        today = timezone.localdate()
+        for as_of in [
+            date(2025, 1, 30),
+            date(2025, 1, 31),
+            date(2025, 2, 1),
+            date(2025, 2, 28),
+            date(2025, 3, 1),
+            date(2025, 3, 15),
+            date(2025, 4, 1),
+            today,
+        ]:
+            with self.subTest(as_of=as_of):
+                self.assertEqual(
+                    get_account_totals(as_of_date=as_of),
+                    ledger_totals(date__lte=as_of),
+                )
+        for start, end in [
+            (date(2025, 1, 31), date(2025, 3, 1)),
+            (date(2025, 2, 1), date(2025, 2, 28)),
+            (date(2025, 2, 2), date(2025, 3, 31)),
+            (date(2025, 2, 15), date(2025, 2, 15)),
+            (date(2025, 3, 1), today),
+        ]:
+            with self.subTest(start=start, end=end):
+                self.assertEqual(
+                    get_account_totals(start_date=start, end_date=end),
+                    ledger_totals(date__range=[start, end]),
+                )
+        self.assertEqual(get_account_totals(), ledger_totals())
+
+    def test_totals_match_transactions_across_month_boundaries(self):
+        self.assertTotalsMatchTransactions()
+
+    def test_totals_match_transactions_after_a_reversal(self):
+        reverse_journal_entry(self.journals[2], self.user)
+
+        self.assertTotalsMatchTransactions()
+
+    def test_totals_match_transactions_after_rebuilding_snapshots(self):
+        reverse_journal_entry(self.journals[4], self.user)
+        # Drifted snapshots are replaced from the Transaction table
+        AccountBalanceSnapshot.objects.filter(account=self.cash).update(
+            debit=Decimal("1.00")
+        )
+
+        rebuild_balance_snapshots()
+
+        self.assertTotalsMatchTransactions()
+
+
+class GeneralLedgerPagingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cache.clear()
+        call_command("create_default_accounts", stdout=StringIO())
+        cls.user = User.objects.create(username="accountant")
+        cls.cash = get_default_account("cash")
+        tuition = get_default_account("tuition_revenue")
+        for index, (day, amount) in enumerate(
+            [
+                (date(2024, 12, 31), "500"),
+                (date(2025, 1, 31), "100"),
+                (date(2025, 2, 1), "200"),
+                (date(2025, 2, 1), "40"),
+                (date(2025, 3, 15), "7"),
+            ]
+        ):
+            create_journal_entry(
+                "Test posting",
+                f"TEST-{index}",
+                cls.user,
+                [
+                    {"account": cls.cash, "amount": Decimal(amount), "is_debit": True},
+                    {"account": tuition, "amount": Decimal(amount), "is_debit": False},
+                ],
+                date=day,
+            )
+        cls.url = reverse("account-general-ledger", args=[cls.cash.id])
+        cls.params = {"start_date": "2025-01-01", "end_date": "2025-12-31"}
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_pages_continue_the_running_balance(self):
+        single = self.client.get(self.url, self.params).data["results"]
+
+        paged = []
+        params = {**self.params, "page_size": 1}
+        while True:
+            response = self.client.get(self.url, params)
+            paged.extend(response.data["results"])
+            if not response.data["next_cursor"]:
+                break
+            params["cursor"] = response.data["next_cursor"]
+
+        self.assertEqual(paged, single)
+        self.assertEqual(
+            [line["balance"] for line in paged],
+            ["600.00", "800.00", "840.00", "847.00"],
+        )
+
+    def test_cursor_cannot_carry_a_balance(self):
+        transaction_id = Transaction.objects.get(
+            account=self.cash, journal__reference="TEST-1"
+        ).id
+        forged = base64.urlsafe_b64encode(
+            f"2025-01-31|{transaction_id}|1000000".encode()
+        ).decode()
+        outside = base64.urlsafe_b64encode(
+            f"2024-12-31|{transaction_id}".encode()
+        ).decode()
+
+        for cursor in [forged, outside]:
+            response = self.client.get(self.url, {**self.params, "cursor": cursor})
+            self.assertEqual(response.status_code, 400)
+
+
+class FiscalCloseTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Default accounts are cached across test databases
+        cache.clear()
+        call_command("create_default_accounts", stdout=StringIO())
+        cls.user = User.objects.create(username="accountant")
+        cls.cash = get_default_account("cash")
+        cls.tuition = get_default_account("tuition_revenue")
+        cls.salaries = get_default_account("salaries")
+        cls.retained = get_default_account("retained_earnings")
+
+        for day, amount in [(date(2025, 1, 15), "1000"), (date(2025, 5, 3), "250")]:
+            cls.post(day, cls.cash, cls.tuition, amount)
+        cls.post(date(2025, 3, 31), cls.salaries, cls.cash, "400")
+        for day, amount in [(date(2025, 7, 1), "600"), (date(2025, 8, 20), "75")]:
+            cls.post(day, cls.cash, cls.tuition, amount)
+
+        cls.first_half = FiscalPeriod.objects.create(
+            name="H1 2025", start_date=date(2025, 1, 1), end_date=date(2025, 6, 30)
+        )
+
+    @classmethod
+    def post(cls, day, debit_account, credit_account, amount):
+        create_journal_entry(
+            "Test posting",
+            f"TEST-{day}-{debit_account.id}",
+            cls.user,
+            [
+                {
+                    "account": debit_account,
+                    "amount": Decimal(amount),
+                    "is_debit": True,
+                },
+                {
+                    "account": credit_account,
+                    "amount": Decimal(amount),
+                    "is_debit": False,
+                },
+            ],
+            date=day,
+        )
+
+    def test_cumulative_totals_start_from_carried_balances(self):
+        before = get_account_totals(as_of_date=date(2025, 12, 31))
+
+        close_fiscal_period(self.first_half, self.user)
+        after = get_account_totals(as_of_date=date(2025, 12, 31))
+
+        # Balance sheet accounts carry their closing totals forward
+        self.assertEqual(after[self.cash.id], before[self.cash.id])
+        # Income and expense restart from the second half's movement
+        self.assertEqual(after[self.tuition.id], (Decimal("0"), Decimal("675")))
+        self.assertEqual(after.get(self.salaries.id, (ZERO, ZERO)), (ZERO, ZERO))
+        # ... with the first half's net income moved into retained earnings
+        self.assertEqual(after[self.retained.id], (Decimal("400"), Decimal("1250")))
+
+    def test_totals_without_carry_forward_cover_the_whole_ledger(self):
+        close_fiscal_period(self.first_half, self.user)
+
+        self.assertEqual(get_account_totals(carry_forward=False), ledger_totals())
+        self.assertEqual(
+            get_account_totals(as_of_date=date(2025, 5, 31), carry_forward=False),
+            ledger_totals(date__lte=date(2025, 5, 31)),
+        )
+
+    def test_ranged_totals_ignore_the_close(self):
+        close_fiscal_period(self.first_half, self.user)
+
+        self.assertEqual(
+            get_account_totals(start_date=date(2025, 3, 1), end_date=date(2025, 7, 31)),
+            ledger_totals(date__range=[date(2025, 3, 1), date(2025, 7, 31)]),
+        )
+
+    def test_closed_periods_reject_postings(self):
+        close_fiscal_period(self.first_half, self.user)
+
+        with self.assertRaises(ValueError):
+            self.post(date(2025, 6, 30), self.cash, self.tuition, "10")
+        with self.assertRaises(ValueError):
+            close_fiscal_period(self.first_half, self.user)
+        self.post(date(2025, 7, 1), self.cash, self.tuition, "10")
+
+    def enqueue(self, day, amount):
+        return enqueue_journal_entry(
+            "Queued posting",
+            f"QUEUED-{day}",
+            self.user,
+            [
+                {"account": self.cash, "amount": Decimal(amount), "is_debit": True},
+                {
+                    "account": self.tuition,
+                    "amount": Decimal(amount),
+                    "is_debit": False,
+                },
+            ],
+            date=day,
+        )
+
+    def test_close_waits_for_queued_entries_in_the_period(self):
+        queued = self.enqueue(date(2025, 6, 10), "90")
+        # Queued after the period, does not hold up the close
+        self.enqueue(date(2025, 7, 2), "5")
+
+        with self.assertRaisesMessage(ValueError, "1 queued journal entries"):
+            close_fiscal_period(self.first_half, self.user)
+        JournalOutbox.objects.filter(pk=queued.pk).update(status=JournalOutbox.FAILED)
+        with self.assertRaises(ValueError):
+            close_fiscal_period(self.first_half, self.user)
+
+        drain_journal_outbox()
+        close_fiscal_period(self.first_half, self.user)
+
+        closing = self.first_half.balances.get(account=self.tuition)
+        self.assertEqual(closing.closing_credit, Decimal("1340"))
+        with self.assertRaises(ValueError):
+            self.enqueue(date(2025, 6, 30), "1")
+
+
+class JournalOutboxDrainTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cache.clear()
+        call_command("create_default_accounts", stdout=StringIO())
+        cls.user = User.objects.create(username="accountant")
+        cls.cash = get_default_account("cash")
+        cls.tuition = get_default_account("tuition_revenue")
+
+    def enqueue(self, reference, amount="100"):
+        return enqueue_journal_entry(
+            "Queued posting",
+            reference,
+            self.user,
+            [
+                {"account": self.cash, "amount": Decimal(amount), "is_debit": True},
+                {
+                    "account": self.tuition,
+                    "amount": Decimal(amount),
+                    "is_debit": False,
+                },
+            ],
+        )
+
+    def enqueue_unbalanced(self, reference, **fields):
+        # enqueue_journal_entry validates, so write the row directly
+        return JournalOutbox.objects.create(
+            date=timezone.localdate(),
+            description="Unbalanced posting",
+            reference=reference,
+            created_by=self.user,
+            lines=[
+                {"account": self.cash.id, "amount": "100", "is_debit": True},
+                {"account": self.tuition.id, "amount": "90", "is_debit": False},
+            ],
+            **fields,
+        )
+
+    def test_batch_is_posted_with_one_insert(self):
+        rows = [self.enqueue(f"OK-{index}") for index in range(3)]
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = drain_journal_outbox()
+
+        self.assertEqual(stats, {"posted": 3, "failed": 0})
+        journal_inserts = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith(f'INSERT INTO "{JournalEntry._meta.db_table}"')
+        ]
+        self.assertEqual(len(journal_inserts), 1)
+        for row in rows:
+            row.refresh_from_db()
+            self.assertEqual(row.status, JournalOutbox.POSTED)
+            self.assertEqual(row.journal.reference, row.reference)
+        self.assertEqual(drain_journal_outbox(), {"posted": 0, "failed": 0})
+
+    def test_failing_row_is_retried_with_backoff(self):
+        self.enqueue("OK-1")
+        bad = self.enqueue_unbalanced("BAD-1")
+        self.enqueue("OK-2")
+
+        started = timezone.now()
+        self.assertEqual(drain_journal_outbox(), {"posted": 2, "failed": 1})
+
+        # The good rows still post one at a time after the batch fails
+        self.assertEqual(
+            set(JournalEntry.objects.values_list("reference", flat=True)),
+            {"OK-1", "OK-2"},
+        )
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, JournalOutbox.FAILED)
+        self.assertEqual(bad.attempts, 1)
+        self.assertIn("Debits and Credits must match", bad.last_error)
+        self.assertGreaterEqual(bad.available_at, started + timedelta(minutes=2))
+        # Not due again until the backoff passes
+        self.assertEqual(drain_journal_outbox(), {"posted": 0, "failed": 0})
+
+        JournalOutbox.objects.filter(pk=bad.pk).update(available_at=started)
+        started = timezone.now()
+        self.assertEqual(drain_journal_outbox(), {"posted": 0, "failed": 1})
+        bad.refresh_from_db()
+        self.assertEqual(bad.attempts, 2)
+        self.assertGreaterEqual(bad.available_at, started + timedelta(minutes=4))
+        self.assertLess(bad.available_at, started + timedelta(minutes=5))
+
+    def test_row_is_dead_after_max_attempts(self):
+        bad = self.enqueue_unbalanced("BAD-1", status=JournalOutbox.FAILED, attempts=4)
+
+        with self.assertLogs("apps.accounting.services.outbox", "ERROR"):
+            self.assertEqual(
+                drain_journal_outbox(max_attempts=5), {"posted": 0, "failed": 1}
+            )
+
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, JournalOutbox.DEAD)
+        self.assertEqual(bad.attempts, 5)
+        JournalOutbox.objects.filter(pk=bad.pk).update(available_at=timezone.now())
+        self.assertEqual(drain_journal_outbox(), {"posted": 0, "failed": 0})
+
+
+class LedgerVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cache.clear()
+        call_command("create_default_accounts", stdout=StringIO())
+        cls.user = User.objects.create(username="accountant")
+
+    def test_postings_and_account_changes_bump_the_stored_version(self):
+        version = get_ledger_version()
+        cash = get_default_account("cash")
+        create_journal_entry(
+            "Cash sale",
+            "SALE-1",
+            self.user,
+            [
+                {"account": cash, "amount": Decimal("10"), "is_debit": True},
+                {
+                    "account": get_default_account("misc_income"),
+                    "amount": Decimal("10"),
+                    "is_debit": False,
+                },
+            ],
+        )
+        self.assertEqual(get_ledger_version(), version + 1)
+
+        cash.name = "Petty Cash"
+        cash.save()
+        self.assertEqual(get_ledger_version(), version + 2)
+        # Read from the database, so every process sees the same version
+        cache.clear()
+        self.assertEqual(get_ledger_version(), version + 2)
+
+
+class DefaultAccountsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cache.clear()
+        call_command("create_default_accounts", stdout=StringIO())
+
+    def test_registry_is_kept_in_memory_until_an_account_changes(self):
+        cash = get_default_account("cash")
+        with self.assertNumQueries(0):
+            self.assertEqual(get_default_account("cash"), cash)
 
-# Create your tests here.
+        cash.is_default = True
+        cash.save()
+        with self.assertNumQueries(1):
+            self.assertTrue(get_default_account("cash").is_default)
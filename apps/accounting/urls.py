@@ -8,12 +8,18 @@ from .views import (
     AccountListAPIView,
     ArchivedAccountListView,
     ArchivedAccountTypeListView,
+    BulkReverseJournalEntriesView,
     CashFlowView,
+    CloseFiscalPeriodView,
+    FiscalPeriodDetailView,
+    FiscalPeriodListCreateView,
+    GeneralLedgerView,
     JournalEntryListCreateView,
     TransactionListView,
     TrialBalanceView,
     BalanceSheetView,
     IncomeStatementView,
+    ReportCacheStatsView,
     UnarchiveAccountTypeView,
     UnarchiveAccountView,
 )
@@ -51,10 +57,38 @@ urlpatterns = [
     path(
         "<int:pk>/", AccountDetailAPIView.as_view(), name="view-update-delete-account"
     ),
+    path(
+        "<int:pk>/general-ledger/",
+        GeneralLedgerView.as_view(),
+        name="account-general-ledger",
+    ),
     path(
         "journal-entries/", JournalEntryListCreateView.as_view(), name="journal-entries"
     ),
+    path(
+        "fiscal-periods/", FiscalPeriodListCreateView.as_view(), name="fiscal-periods"
+    ),
+    path(
+        "fiscal-periods/<int:pk>/",
+        FiscalPeriodDetailView.as_view(),
+        name="view-update-fiscal-period",
+    ),
+    path(
+        "fiscal-periods/<int:pk>/close/",
+        CloseFiscalPeriodView.as_view(),
+        name="close-fiscal-period",
+    ),
+    path(
+        "journal-entries/bulk-reverse/",
+        BulkReverseJournalEntriesView.as_view(),
+        name="bulk-reverse-journal-entries",
+    ),
     path("trial-balance/", TrialBalanceView.as_view(), name="trial-balance"),
     path("balance-sheet/", BalanceSheetView.as_view(), name="balance-sheet"),
     path("income-statement/", IncomeStatementView.as_view(), name="income-statement"),
+    path(
+        "reports/cache-stats/",
+        ReportCacheStatsView.as_view(),
+        name="report-cache-stats",
+    ),
 ]
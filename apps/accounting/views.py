@@ -1,20 +1,52 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q
 from decimal import Decimal
 from apps.accounting.filters import TransactionFilter
-from .models import AccountType, Account, JournalEntry, Transaction
+from apps.core.utils import Echo
+from apps.accounting.services.cash_flow import (
+    SECTIONS,
+    decode_cursor,
+    encode_cursor,
+    get_opening_cash_balance,
+    get_section_totals,
+    iter_cash_flow_journals,
+)
+from apps.accounting.services.default_accounts import get_default_account
+from apps.accounting.services.fiscal_periods import close_fiscal_period
+from apps.accounting.services.general_ledger import (
+    decode_cursor as decode_ledger_cursor,
+    encode_cursor as encode_ledger_cursor,
+    general_ledger_lines,
+    get_opening_balance,
+    get_period_totals,
+)
+from apps.accounting.services.journals import (
+    reverse_journal_entries_bulk,
+    select_journals_for_reversal,
+)
+from apps.accounting.services.ledger import ZERO, account_balance, get_account_totals
+from apps.accounting.services.report_cache import (
+    get_cache_stats,
+    get_cached_report,
+    reset_cache_stats,
+)
+from .models import AccountType, Account, FiscalPeriod, JournalEntry, Transaction
 from .serializers import (
     AccountTypeSerializer,
     AccountSerializer,
     CreateAccountSerializer,
     CreateAccountTypeSerializer,
+    FiscalPeriodSerializer,
     JournalEntrySerializer,
     TransactionSerializer,
 )
-from django.db.models import Sum
-from collections import defaultdict
 from datetime import datetime, date
 
 from rest_framework.pagination import PageNumberPagination
@@ -190,6 +222,46 @@ class JournalEntryListCreateView(generics.ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 
+class BulkReverseJournalEntriesView(APIView):
+    """
+    Reverses every journal entry matching the posted criteria.
+
+    Body: reference_prefix, start_date, end_date, cohort, semester (any
+    combination, at least one) and dry_run to preview the summary without
+    writing anything.
+    """
+
+    def post(self, request):
+        data = request.data
+        try:
+            dates = {
+                key: datetime.strptime(data[key], "%Y-%m-%d").date()
+                for key in ("start_date", "end_date")
+                if data.get(key)
+            }
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."}, status=400
+            )
+
+        dry_run = str(data.get("dry_run", False)).lower() in ("true", "1")
+        try:
+            journals = select_journals_for_reversal(
+                reference_prefix=data.get("reference_prefix"),
+                cohort=data.get("cohort"),
+                semester=data.get("semester"),
+                **dates,
+            )
+            summary = reverse_journal_entries_bulk(
+                journals, request.user, dry_run=dry_run
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        summary["total_amount"] = str(summary["total_amount"])
+        return Response(summary, status=status.HTTP_200_OK)
+
+
 class TransactionListView(generics.ListAPIView):
     queryset = Transaction.objects.all().order_by("-created_on")
     serializer_class = TransactionSerializer
@@ -222,6 +294,173 @@ class TransactionListView(generics.ListAPIView):
             return Response(str(exc), status=status.HTTP_400_BAD_REQUEST)
 
 
+class GeneralLedgerView(APIView):
+    """
+    Transactions posted to one account with opening and running balances.
+
+    Results are paged with ``page_size`` and the returned ``next_cursor``
+    (pass it back as ``cursor``). ``export=csv`` streams the whole range as
+    CSV instead.
+    """
+
+    csv_header = [
+        "Date",
+        "Journal",
+        "Reference",
+        "Description",
+        "Debit",
+        "Credit",
+        "Balance",
+    ]
+
+    def serialize_line(self, line):
+        return {
+            "transaction_id": line["id"],
+            "journal_id": line["journal_id"],
+            "date": line["date"],
+            "reference": line["journal__reference"],
+            "description": line["journal__description"],
+            "debit": str(line["amount"]) if line["is_debit"] else "0.00",
+            "credit": "0.00" if line["is_debit"] else str(line["amount"]),
+            "balance": str(line["balance"]),
+        }
+
+    def stream_csv(self, account, start_date, end_date, opening_balance, lines):
+        writer = csv.writer(Echo())
+        yield writer.writerow([f"General Ledger: {account}"])
+        yield writer.writerow(["Period", start_date, end_date])
+        yield writer.writerow(["Opening Balance", "", "", "", "", "", opening_balance])
+        yield writer.writerow(self.csv_header)
+        balance = opening_balance
+        for line in lines:
+            row = self.serialize_line(line)
+            balance = row["balance"]
+            yield writer.writerow(
+                [
+                    row["date"],
+                    row["journal_id"],
+                    row["reference"],
+                    row["description"],
+                    row["debit"],
+                    row["credit"],
+                    balance,
+                ]
+            )
+        yield writer.writerow(["Closing Balance", "", "", "", "", "", balance])
+
+    def get(self, request, pk):
+        account = get_object_or_404(
+            Account.all_objects.select_related("account_type"), pk=pk
+        )
+
+        try:
+            end_date_str = request.query_params.get("end_date")
+            end_date = (
+                datetime.strptime(end_date_str, "%Y-%m-%d").date()
+                if end_date_str
+                else date.today()
+            )
+            start_date_str = request.query_params.get("start_date")
+            start_date = (
+                datetime.strptime(start_date_str, "%Y-%m-%d").date()
+                if start_date_str
+                else end_date.replace(month=1, day=1)
+            )
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."}, status=400
+            )
+
+        opening_balance = get_opening_balance(account, start_date)
+
+        if request.query_params.get("export") == "csv":
+            lines = general_ledger_lines(
+                account, start_date, end_date, opening_balance
+            )
+            response = StreamingHttpResponse(
+                self.stream_csv(account, start_date, end_date, opening_balance, lines),
+                content_type="text/csv",
+            )
+            response["Content-Disposition"] = (
+                f'attachment; filename="general-ledger-{account.account_code}-'
+                f'{start_date}-{end_date}.csv"'
+            )
+            return response
+
+        cursor = request.query_params.get("cursor")
+        try:
+            after = decode_ledger_cursor(cursor) if cursor else None
+            if after and not start_date <= after[0] <= end_date:
+                raise ValueError("Invalid cursor")
+            page_size = min(int(request.query_params.get("page_size", 100)), 1000)
+            if page_size < 1:
+                raise ValueError("page_size must be positive")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        lines = list(
+            general_ledger_lines(
+                account,
+                start_date,
+                end_date,
+                opening_balance,
+                after=after,
+                limit=page_size + 1,
+            )
+        )
+        next_cursor = None
+        if len(lines) > page_size:
+            lines = lines[:page_size]
+            last = lines[-1]
+            next_cursor = encode_ledger_cursor(last["date"], last["id"])
+
+        total_debit, total_credit = get_period_totals(account, start_date, end_date)
+        closing_balance = opening_balance + account_balance(
+            account, total_debit, total_credit
+        )
+
+        return Response(
+            {
+                "account": AccountSerializer(account).data,
+                "start_date": start_date,
+                "end_date": end_date,
+                "opening_balance": str(opening_balance),
+                "total_debit": str(total_debit),
+                "total_credit": str(total_credit),
+                "closing_balance": str(closing_balance),
+                "results": [self.serialize_line(line) for line in lines],
+                "next_cursor": next_cursor,
+            }
+        )
+
+
+# ----------------------
+# FISCAL PERIODS
+# ----------------------
+
+
+class FiscalPeriodListCreateView(generics.ListCreateAPIView):
+    queryset = FiscalPeriod.objects.all().order_by("-start_date")
+    serializer_class = FiscalPeriodSerializer
+
+
+class FiscalPeriodDetailView(generics.RetrieveUpdateAPIView):
+    queryset = FiscalPeriod.objects.all()
+    serializer_class = FiscalPeriodSerializer
+    lookup_field = "pk"
+
+
+class CloseFiscalPeriodView(APIView):
+    def post(self, request, pk):
+        period = get_object_or_404(FiscalPeriod, pk=pk)
+        try:
+            period = close_fiscal_period(period, request.user)
+        except (ValueError, Account.DoesNotExist) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(FiscalPeriodSerializer(period).data, status=status.HTTP_200_OK)
+
+
 # ----------------------
 # TRIAL BALANCE
 # ----------------------
@@ -229,10 +468,6 @@ class TransactionListView(generics.ListAPIView):
 
 class TrialBalanceView(APIView):
     def get(self, request):
-        data = []
-        total_debit = Decimal("0.00")
-        total_credit = Decimal("0.00")
-
         as_of_date_str = request.query_params.get("as_of_date")
         if as_of_date_str:
             try:
@@ -244,24 +479,26 @@ class TrialBalanceView(APIView):
         else:
             as_of_date = date.today()
 
+        response = get_cached_report(
+            "trial_balance",
+            {"as_of_date": as_of_date},
+            lambda: self.build_report(as_of_date),
+        )
+        return Response(response)
+
+    def build_report(self, as_of_date):
+        data = []
+        total_debit = Decimal("0.00")
+        total_credit = Decimal("0.00")
+
         accounts = Account.objects.select_related("account_type")
+        totals = get_account_totals(as_of_date=as_of_date)
 
         for account in accounts:
-            # txs = account.transaction_set.all()
-            # if start_date and end_date:
-            #     txs = txs.filter(journal__date__range=[start_date, end_date])
-            txs = account.transaction_set.filter(journal__date__lte=as_of_date)
-
-            debits = txs.filter(is_debit=True).aggregate(Sum("amount"))[
-                "amount__sum"
-            ] or Decimal("0.00")
-            credits = txs.filter(is_debit=False).aggregate(Sum("amount"))[
-                "amount__sum"
-            ] or Decimal("0.00")
+            debits, credits = totals.get(account.id, (ZERO, ZERO))
 
             # Determine balance direction
-            normal = account.account_type.normal_balance
-            balance = debits - credits if normal == "debit" else credits - debits
+            balance = account_balance(account, debits, credits)
 
             # Totals for footer
             total_debit += debits
@@ -286,8 +523,7 @@ class TrialBalanceView(APIView):
                 "balanced": total_debit == total_credit,
             },
         }
-
-        return Response(response)
+        return response
 
 
 # class TrialBalanceView(APIView):
@@ -324,18 +560,36 @@ class TrialBalanceView(APIView):
 class BalanceSheetView(APIView):
     def get(self, request):
         as_of_date = request.query_params.get("as_of_date")
+        sheet = get_cached_report(
+            "balance_sheet",
+            {"as_of_date": as_of_date},
+            lambda: self.build_report(as_of_date),
+        )
+        return Response(sheet)
+
+    def build_report(self, as_of_date):
         sheet = {"Assets": [], "Liabilities": [], "Equity": []}
         total_income = Decimal("0.00")
         total_expenses = Decimal("0.00")
 
+        retained_earnings = Decimal("0.00")
+
+        totals = get_account_totals(as_of_date=as_of_date)
+        try:
+            retained_earnings_id = get_default_account("retained_earnings").id
+        except Account.DoesNotExist:
+            retained_earnings_id = None
+
         for acc in Account.objects.select_related("account_type"):
-            balance = get_account_balance(acc, as_of_date=as_of_date)
-            balance = Decimal(str(balance or 0))  # Ensure Decimal
+            balance = account_balance(acc, *totals.get(acc.id, (ZERO, ZERO)))
 
             account_type = acc.account_type.name
             account_data = {"name": acc.name, "balance": round(balance, 2)}
 
-            if account_type == "Asset":
+            if acc.id == retained_earnings_id:
+                # Earnings closed out of earlier fiscal periods
+                retained_earnings += balance
+            elif account_type == "Asset":
                 sheet["Assets"].append(account_data)
             elif account_type == "Liability":
                 sheet["Liabilities"].append(account_data)
@@ -349,7 +603,10 @@ class BalanceSheetView(APIView):
         # Add Retained Earnings to Equity
         net_income = total_income - total_expenses
         sheet["Equity"].append(
-            {"name": "Retained Earnings", "balance": round(net_income, 2)}
+            {
+                "name": "Retained Earnings",
+                "balance": round(retained_earnings + net_income, 2),
+            }
         )
 
         # Totals for balance equation check
@@ -362,8 +619,7 @@ class BalanceSheetView(APIView):
             "Liabilities + Equity": round(total_liabilities + total_equity, 2),
             "Balanced": total_assets == (total_liabilities + total_equity),
         }
-
-        return Response(sheet)
+        return sheet
 
 
 # ----------------------
@@ -372,17 +628,36 @@ class BalanceSheetView(APIView):
 
 
 class IncomeStatementView(APIView):
+    """
+    Income and expenses between start_date and end_date, or over the whole
+    ledger when no range is given. Closing a fiscal period does not change
+    the all-time figures.
+    """
+
     def get(self, request):
         from .models import Account
 
         start_date = request.query_params.get("start_date")
         end_date = request.query_params.get("end_date")
 
+        statement = get_cached_report(
+            "income_statement",
+            {"start_date": start_date, "end_date": end_date},
+            lambda: self.build_report(start_date, end_date),
+        )
+        return Response(statement)
+
+    def build_report(self, start_date, end_date):
         income = []
         expenses = []
 
+        # Income and expense totals are not carried across closed periods
+        totals = get_account_totals(
+            start_date=start_date, end_date=end_date, carry_forward=False
+        )
+
         for acc in Account.objects.select_related("account_type"):
-            balance = get_account_balance(acc, start_date, end_date)
+            balance = account_balance(acc, *totals.get(acc.id, (ZERO, ZERO)))
             if acc.account_type.name == "Income":
                 income.append((acc.name, balance))
             elif acc.account_type.name == "Expense":
@@ -396,23 +671,19 @@ class IncomeStatementView(APIView):
         # Calculate profit margin
         profit_margin = (net_profit / total_income * 100) if total_income > 0 else 0
 
-        return Response(
-            {
-                "income": [
-                    {"name": name, "amount": balance} for name, balance in income
-                ],
-                "expenses": [
-                    {"name": name, "amount": balance} for name, balance in expenses
-                ],
-                "totals": {
-                    "total_income": total_income,
-                    "total_expenses": total_expenses,
-                    "net_profit": net_profit,
-                    "profit_margin": round(profit_margin, 2),
-                },
+        return {
+            "income": [{"name": name, "amount": balance} for name, balance in income],
+            "expenses": [
+                {"name": name, "amount": balance} for name, balance in expenses
+            ],
+            "totals": {
+                "total_income": total_income,
+                "total_expenses": total_expenses,
                 "net_profit": net_profit,
-            }
-        )
+                "profit_margin": round(profit_margin, 2),
+            },
+            "net_profit": net_profit,
+        }
 
 
 # Utility
@@ -427,37 +698,98 @@ class IncomeStatementView(APIView):
 
 
 def get_account_balance(account, start_date=None, end_date=None, as_of_date=None):
-    txs = account.transaction_set.all()
-    if start_date and end_date:
-        txs = txs.filter(journal__date__range=[start_date, end_date])
-    elif as_of_date:
-        txs = txs.filter(journal__date__lte=as_of_date)
-
-    debits = txs.filter(is_debit=True).aggregate(Sum("amount"))["amount__sum"] or 0
-    credits = txs.filter(is_debit=False).aggregate(Sum("amount"))["amount__sum"] or 0
-
-    if account.account_type.normal_balance == "debit":
-        return debits - credits
-    else:
-        return credits - debits
+    totals = get_account_totals(
+        start_date=start_date,
+        end_date=end_date,
+        as_of_date=as_of_date,
+        accounts=[account.id],
+    )
+    return account_balance(account, *totals.get(account.id, (ZERO, ZERO)))
 
 
 class CashFlowView(APIView):
-    def get_opening_balance(self, start_date):
-        # Filter only cash accounts
-        cash_accounts = Account.objects.filter(account_type__name="Asset")
-        transactions = Transaction.objects.filter(
-            account__in=cash_accounts, journal__date__lt=start_date
-        )
-        inflow = (
-            transactions.filter(is_debit=True).aggregate(total=Sum("amount"))["total"]
-            or 0
+    """
+    Cash flow statement grouped by section and journal.
+
+    The full statement is streamed as JSON. Passing ``page_size`` (and then
+    the returned ``next_cursor`` as ``cursor``) pages through the journals
+    instead; section totals and the summary always cover the whole range.
+    """
+
+    def get_summary(self, opening_balance, section_totals):
+        gross_inflows = sum((inflows for inflows, _ in section_totals.values()), ZERO)
+        gross_outflows = sum(
+            (outflows for _, outflows in section_totals.values()), ZERO
         )
-        outflow = (
-            transactions.filter(is_debit=False).aggregate(total=Sum("amount"))["total"]
-            or 0
-        )
-        return inflow - outflow
+        net_cash_change = gross_inflows - gross_outflows
+        return {
+            "opening_balance": str(opening_balance),
+            "gross_inflows": str(gross_inflows),
+            "gross_outflows": str(gross_outflows),
+            "net_cash_change": str(net_cash_change),
+            "ending_balance": str(opening_balance + net_cash_change),
+        }
+
+    def get_section_totals_data(self, inflows, outflows):
+        return {
+            "inflows": str(inflows),
+            "outflows": str(outflows),
+            "net_cash_flow": str(inflows - outflows),
+        }
+
+    def stream_statement(self, journals, section_totals, summary):
+        def dumps(value):
+            return json.dumps(value, cls=DjangoJSONEncoder)
+
+        def close_section(section):
+            inflows, outflows = section_totals[section]
+            totals = self.get_section_totals_data(inflows, outflows)
+            return f'], "totals": {dumps(totals)}}}'
+
+        yield "{"
+        current = -1
+        first = True
+        for section, journal in journals:
+            index = SECTIONS.index(section)
+            while current < index:
+                if current >= 0:
+                    yield close_section(SECTIONS[current]) + ", "
+                current += 1
+                yield f'{dumps(SECTIONS[current])}: {{"journals": ['
+                first = True
+            yield ("" if first else ", ") + dumps(journal)
+            first = False
+
+        while current < len(SECTIONS) - 1:
+            if current >= 0:
+                yield close_section(SECTIONS[current]) + ", "
+            current += 1
+            yield f'{dumps(SECTIONS[current])}: {{"journals": ['
+        yield close_section(SECTIONS[current])
+        yield f', "summary": {dumps(summary)}}}'
+
+    def get_page(self, journals, page_size, section_totals, summary):
+        response_data = {
+            section: {
+                "journals": [],
+                "totals": self.get_section_totals_data(*section_totals[section]),
+            }
+            for section in SECTIONS
+        }
+
+        next_cursor = None
+        last = None
+        for count, (section, journal) in enumerate(journals):
+            if count == page_size:
+                next_cursor = encode_cursor(*last)
+                break
+            response_data[section]["journals"].append(journal)
+            last = (section, journal["date"], journal["journal_id"])
+        journals.close()
+
+        response_data["summary"] = summary
+        response_data["next_cursor"] = next_cursor
+        return response_data
 
     def get(self, request):
         # Parse start_date and end_date from query params
@@ -480,92 +812,48 @@ class CashFlowView(APIView):
                 {"error": "Invalid date format. Use YYYY-MM-DD."}, status=400
             )
 
-        # Calculate the opening balance once before all sections
-        opening_balance = self.get_opening_balance(start_date)
-
-        # Define cash flow sections
-        sections = {
-            "Operating": Q(account__cash_flow_section="Operating"),
-            "Investing": Q(account__cash_flow_section="Investing"),
-            "Financing": Q(account__cash_flow_section="Financing"),
-        }
-
-        response_data = {}
-        gross_inflows = Decimal("0.00")
-        gross_outflows = Decimal("0.00")
-
-        for section_name, filter_query in sections.items():
-            transactions = (
-                Transaction.objects.filter(
-                    filter_query,
-                    account__account_type__name="Asset",  # Only cash accounts
-                    journal__date__range=(start_date, end_date),
-                )
-                .select_related("account", "journal")
-                .order_by("journal__date")
-            )
+        cursor = request.query_params.get("cursor")
+        page_size = request.query_params.get("page_size")
+        after = None
+        try:
+            if cursor:
+                after = decode_cursor(cursor)
+            if page_size or cursor:
+                page_size = min(int(page_size or 100), 1000)
+                if page_size < 1:
+                    raise ValueError("page_size must be positive")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        def build_totals():
+            section_totals = get_section_totals(start_date, end_date)
+            opening_balance = get_opening_cash_balance(start_date)
+            return section_totals, self.get_summary(opening_balance, section_totals)
+
+        # Only the range-wide totals are cached; journals are a keyset read
+        # bounded by page_size, so every page shares one cache entry
+        section_totals, summary = get_cached_report(
+            "cash_flow", {"start_date": start_date, "end_date": end_date}, build_totals
+        )
 
-            journal_map = defaultdict(
-                lambda: {
-                    "journal_id": None,
-                    "date": None,
-                    "description": "",
-                    "reference": "",
-                    "transactions": [],
-                }
+        journals = iter_cash_flow_journals(start_date, end_date, after=after)
+        if page_size:
+            return Response(
+                self.get_page(journals, page_size, section_totals, summary)
             )
 
-            section_inflows = Decimal("0.00")
-            section_outflows = Decimal("0.00")
-
-            for tx in transactions:
-                journal = tx.journal
-                key = journal.id
-
-                if journal_map[key]["journal_id"] is None:
-                    journal_map[key].update(
-                        {
-                            "journal_id": journal.id,
-                            "date": journal.date,
-                            "description": journal.description,
-                            "reference": journal.reference,
-                        }
-                    )
-
-                tx_type = "inflow" if tx.is_debit else "outflow"
-                amount = tx.amount
-
-                journal_map[key]["transactions"].append(
-                    {"account": str(tx.account), "amount": str(amount), "type": tx_type}
-                )
-
-                if tx.is_debit:
-                    section_inflows += amount
-                else:
-                    section_outflows += amount
-
-            response_data[section_name] = {
-                "journals": list(journal_map.values()),
-                "totals": {
-                    "inflows": str(section_inflows),
-                    "outflows": str(section_outflows),
-                    "net_cash_flow": str(section_inflows - section_outflows),
-                },
-            }
+        return StreamingHttpResponse(
+            self.stream_statement(journals, section_totals, summary),
+            content_type="application/json",
+        )
 
-            gross_inflows += section_inflows
-            gross_outflows += section_outflows
 
-        # Final summary
-        net_cash_change = gross_inflows - gross_outflows
-        ending_balance = opening_balance + net_cash_change
+class ReportCacheStatsView(APIView):
+    """Hit/miss statistics for cached financial statements, DELETE resets them."""
 
-        response_data["summary"] = {
-            "opening_balance": str(opening_balance),
-            "gross_inflows": str(gross_inflows),
-            "gross_outflows": str(gross_outflows),
-            "net_cash_change": str(net_cash_change),
-            "ending_balance": str(ending_balance),
-        }
+    def get(self, request):
+        return Response(get_cache_stats(), status=status.HTTP_200_OK)
 
-        return Response(response_data)
+    def delete(self, request):
+        reset_cache_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from apps.core.models import RolePermission, UserRole, Module
+from apps.core.models import ReferenceSequence, RolePermission, UserRole, Module
 
 
 # Register your models here.
@@ -17,3 +17,8 @@ class ModuleAdmin(admin.ModelAdmin):
 @admin.register(RolePermission)
 class RolePermissionAdmin(admin.ModelAdmin):
     list_display = ("id", "role", "module", "can_view", "created_on", "updated_on")
+
+
+@admin.register(ReferenceSequence)
+class ReferenceSequenceAdmin(admin.ModelAdmin):
+    list_display = ("id", "series", "day", "last_value", "updated_on")
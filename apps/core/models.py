@@ -85,3 +85,17 @@ class AcademicYear(AbsoluteBaseModel):
 
     def __str__(self):
         return self.name
+
+
+class ReferenceSequence(AbsoluteBaseModel):
+    """Last number handed out for a reference series on a given day."""
+
+    series = models.CharField(max_length=50)
+    day = models.DateField()
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("series", "day")
+
+    def __str__(self):
+        return f"{self.series} {self.day}: {self.last_value}"
@@ -1,4 +1,6 @@
-from django.db.models import Count, Q
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from apps.core.models import ReferenceSequence
 from apps.students.models import Student
 from apps.staff.models import Staff
 from apps.schools.models import Programme, Department
@@ -44,6 +46,16 @@ class ModelCountUtils:
         }
 
 
+class Echo:
+    """
+    File-like object whose write() returns the value, lets csv.writer feed
+    rows straight into a StreamingHttpResponse.
+    """
+
+    def write(self, value):
+        return value
+
+
 def payment_ref_generator(prefix="LIB"):
     """
     Generates a unique payment reference.
@@ -55,6 +67,34 @@ def payment_ref_generator(prefix="LIB"):
     return f"{prefix}-{timestamp}-{random_suffix}"
 
 
+def reserve_references(series, count=1, day=None, width=5):
+    """
+    Allocates ``count`` consecutive references from a per-series, per-day
+    counter and returns them in order.
+
+    Format: YYMMDD + zero-padded sequence number + series
+    Example: 25082400482INV
+
+    The block is claimed with a single UPDATE on the counter row, which
+    holds its lock until the surrounding transaction ends, so concurrent
+    callers never receive the same number and no uniqueness checks are
+    needed.
+    """
+    day = day or timezone.localdate()
+    with transaction.atomic():
+        counter = ReferenceSequence.objects.filter(series=series, day=day)
+        if not counter.update(last_value=F("last_value") + count):
+            ReferenceSequence.objects.get_or_create(series=series, day=day)
+            counter.update(last_value=F("last_value") + count)
+        last_value = counter.values_list("last_value", flat=True).get()
+
+    date_str = day.strftime("%y%m%d")
+    return [
+        f"{date_str}{number:0{width}d}{series}"
+        for number in range(last_value - count + 1, last_value + 1)
+    ]
+
+
 def generate_staff_number(
     department, staff_model, user_model, prefix_length=3, max_attempts=1000
 ):
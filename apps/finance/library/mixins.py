@@ -6,7 +6,7 @@ from django.db import transaction
 from django.shortcuts import get_object_or_404
 
 from apps.library.models import Fine, LibraryFinePayment
-from apps.core.constants import payment_ref_generator
+from apps.core.utils import reserve_references
 
 logger = logging.getLogger(__name__)
 
@@ -38,7 +38,7 @@ class ProcessLibraryPaymentMixin:
         logger.info(f"Fetched fine ID {self.fine.id} for member {self.member.id}")
 
     def __process_payment(self):
-        ref = payment_ref_generator()
+        ref = reserve_references("LIB")[0]
 
         payment = LibraryFinePayment.objects.create(
             member=self.member,
@@ -2,7 +2,8 @@ import logging
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from apps.accounting.models import Account
-from apps.accounting.services.journals import create_journal_entry
+from apps.accounting.services.default_accounts import get_default_account
+from apps.accounting.services.outbox import enqueue_journal_entry
 from apps.inventory.models import StockReceipt, StockIssue, InventoryItem, Category
 from apps.procurement.models import GoodsReceived, PurchaseItem
 from decimal import Decimal
@@ -26,14 +27,14 @@ def create_inventory_item_journal(sender, instance, created, **kwargs):
         return
 
     try:
-        inventory_acc = Account.objects.get(name="Inventory")
-        cash_acc = Account.objects.get(name="Cash")
+        inventory_acc = get_default_account("inventory")
+        cash_acc = get_default_account("cash")
         logger.info(f"[InventoryItem:{instance.id}] Accounts found: Inventory & Cash")
     except Account.DoesNotExist:
         logger.error(f"[InventoryItem:{instance.id}] Required accounts not found.")
         return
 
-    create_journal_entry(
+    enqueue_journal_entry(
         description=f"Manual Inventory Addition: {instance.name}",
         reference=f"INVITEM-{instance.id}",
         user=getattr(instance, "created_by", None),
@@ -51,7 +52,7 @@ def create_inventory_item_journal(sender, instance, created, **kwargs):
         ],
     )
 
-    logger.info(f"[InventoryItem:{instance.id}] Journal entry created successfully.")
+    logger.info(f"[InventoryItem:{instance.id}] Journal entry queued successfully.")
     # print(f"DEBUG: Journal entry created successfully for InventoryItem {instance.id}")
 
 
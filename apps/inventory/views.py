@@ -16,6 +16,7 @@ from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 import logging
 from apps.accounting.models import Account
+from apps.accounting.services.default_accounts import get_default_account
 from apps.inventory.filters import StockIssueFilter
 from apps.inventory.flters import InventoryItemFilter
 from apps.inventory.models import Category, InventoryItem, UnitOfMeasure, StockIssue
@@ -245,18 +246,18 @@ class InventoryItemDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
             return
 
         try:
-            inventory_acc = Account.objects.get(name="Inventory")
+            inventory_acc = get_default_account("inventory")
             # Use appropriate account based on increase or decrease
             if valuation_difference > 0:
                 # Inventory increase - credit Cash or Accounts Payable
-                contra_acc = Account.objects.get(name="Cash")
+                contra_acc = get_default_account("cash")
                 adjustment_type = "Increase"
             else:
                 # Inventory decrease - debit Cost of Goods Sold or Inventory Adjustment
                 try:
-                    contra_acc = Account.objects.get(name="Cost of Goods Sold")
+                    contra_acc = get_default_account("cost_of_goods_sold")
                 except Account.DoesNotExist:
-                    contra_acc = Account.objects.get(name="Inventory Adjustment")
+                    contra_acc = get_default_account("inventory_adjustment")
                 adjustment_type = "Decrease"
 
             logger.info(
@@ -319,9 +320,9 @@ class InventoryItemDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
         # Create journal entry (assuming you have this function)
         try:
-            from apps.accounting.services.journals import create_journal_entry
+            from apps.accounting.services.outbox import enqueue_journal_entry
 
-            create_journal_entry(
+            enqueue_journal_entry(
                 description=description,
                 reference=f"INVADJ-{instance.id}",
                 user=getattr(instance, "updated_by", None),
@@ -329,7 +330,7 @@ class InventoryItemDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
             )
 
             logger.info(
-                f"[InventoryItem:{instance.id}] Adjustment journal entry created: {valuation_difference}"
+                f"[InventoryItem:{instance.id}] Adjustment journal entry queued: {valuation_difference}"
             )
         except Exception as e:
             logger.error(
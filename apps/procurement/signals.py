@@ -7,7 +7,8 @@ from apps.procurement.models import (
     VendorPayment,
     VendorPaymentStatement,
 )
-from apps.accounting.services.journals import create_journal_entry
+from apps.accounting.services.default_accounts import get_default_account
+from apps.accounting.services.outbox import enqueue_journal_entry
 from apps.accounting.models import Account
 
 logger = logging.getLogger(__name__)
@@ -24,23 +25,21 @@ def create_vendor_payment_journal_entry(sender, instance, created, **kwargs):
         return
 
     try:
-        expense_account = Account.objects.get(name__iexact="Vendor Payments")
+        expense_account = get_default_account("vendor_payments")
 
         payment_method = instance.payment_method.strip().lower()
 
-        print("********This part was reached**************")
-
         if payment_method == "cash":
-            cash_account = Account.objects.get(name__iexact="Cash")
+            cash_account = get_default_account("cash")
         else:
-            cash_account = Account.objects.get(name__iexact="Bank")
+            cash_account = get_default_account("bank")
 
         logger.info(f"expense_account {expense_account}")
         logger.info(f"payment_method {payment_method}")
         logger.info(f"cash_account {cash_account}")
         logger.info(f"payment_method {payment_method}")
 
-        create_journal_entry(
+        enqueue_journal_entry(
             description=instance.description,
             reference=f"VP-{instance.id}",
             user=instance.paid_by,
@@ -54,7 +53,7 @@ def create_vendor_payment_journal_entry(sender, instance, created, **kwargs):
             ],
         )
 
-        logger.info(f"Journal entry created for vendor payment {instance.id}")
+        logger.info(f"Journal entry queued for vendor payment {instance.id}")
 
     except Account.DoesNotExist as e:
         logger.error(f"Missing account for vendor payment journal entry: {e}")
@@ -1,9 +1,12 @@
 from django.contrib import admin
 from apps.student_finance.models import (
+    FeeCollectionRollup,
     StudentFeeInvoice,
     StudentFeePayment,
+    StudentFeePaymentInvoice,
     StudentFeeLedger,
     StudentFeeStatement,
+    StudentFeeAccount,
 )
 
 
@@ -36,6 +39,18 @@ class StudentFeePaymentAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(StudentFeePaymentInvoice)
+class StudentFeePaymentInvoiceAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "payment",
+        "invoice",
+        "amount_applied",
+        "is_reversed",
+        "created_on",
+    )
+
+
 @admin.register(StudentFeeLedger)
 class StudentFeeLedgerAdmin(admin.ModelAdmin):
     list_display = (
@@ -61,5 +76,38 @@ class StudentFeeStatementAdmin(admin.ModelAdmin):
         "credit",
         "payment_method",
         "balance",
+        "sequence",
         "created_on",
     )
+
+
+@admin.register(StudentFeeAccount)
+class StudentFeeAccountAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "student",
+        "balance",
+        "last_sequence",
+        "cohort",
+        "programme",
+        "campus",
+        "updated_on",
+    )
+    list_filter = ("cohort", "programme", "campus")
+
+
+@admin.register(FeeCollectionRollup)
+class FeeCollectionRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        "day",
+        "semester",
+        "payment_method",
+        "programme",
+        "campus",
+        "invoiced",
+        "collected",
+        "invoice_count",
+        "payment_count",
+    )
+    list_filter = ("payment_method", "semester", "programme", "campus")
+    date_hierarchy = "day"
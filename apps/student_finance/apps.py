@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StudentFinanceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.student_finance"
+
+    def ready(self):
+        import apps.student_finance.signals
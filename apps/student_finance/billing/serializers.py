@@ -2,7 +2,10 @@ from decimal import Decimal
 from rest_framework import serializers
 from apps.students.models import Student
 from apps.schools.models import ProgrammeCohort, Semester
-from apps.student_finance.models import InvoiceType, StudentFeeStatement
+from apps.student_finance.models import InvoiceType, StudentFeePayment, StudentFeeStatement
+
+PAYMENT_METHOD_CHOICES = StudentFeePayment._meta.get_field("payment_method").choices
+
 
 class SingleFeeInvoiceSerializer(serializers.Serializer):
     registration_number = serializers.CharField()
@@ -18,11 +21,31 @@ class BulkFeeInvoiceSerializer(serializers.Serializer):
 class FeePaymentSerializer(serializers.Serializer):
     registration_number = serializers.CharField()
     amount = serializers.DecimalField(max_digits=10, decimal_places=2)
-    payment_method = serializers.ChoiceField(choices=[("Mpesa","Mpesa"),("Bank Transfer","Bank Transfer"),("Cash","Cash")])
+    payment_method = serializers.ChoiceField(choices=PAYMENT_METHOD_CHOICES)
     semester = serializers.PrimaryKeyRelatedField(queryset=Semester.objects.all(), required=False, allow_null=True)
     reference = serializers.CharField(required=False, allow_blank=True)
 
 
+class PaymentIngestItemSerializer(serializers.Serializer):
+    external_reference = serializers.CharField(max_length=255)
+    registration_number = serializers.CharField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal("0.01"))
+    payment_method = serializers.ChoiceField(choices=PAYMENT_METHOD_CHOICES)
+    payment_date = serializers.DateField(required=False)
+    reference = serializers.CharField(required=False, allow_blank=True)
+
+
+class PaymentIngestSerializer(serializers.Serializer):
+    # Plain id, the semester is only looked up when there is something to post
+    semester = serializers.IntegerField(required=False)
+    payments = PaymentIngestItemSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_payments(self, payments):
+        keys = [payment["external_reference"] for payment in payments]
+        if len(keys) != len(set(keys)):
+            raise serializers.ValidationError("external_reference values must be unique within a batch.")
+        return payments
+
 
 
 
@@ -85,8 +108,8 @@ class StudentFeeStatementsSerializer(serializers.ModelSerializer):
         if not fee_statements:
             return "0.00"
 
-        # Take the last statement balance, or compute manually
-        latest_balance = fee_statements.order_by("-created_on").first().balance
+        # Statements are ordered newest first, take the last statement balance
+        latest_balance = fee_statements[0].balance
         return str(latest_balance or Decimal("0.00"))
         # manual computing
         # def get_balance(self, obj):
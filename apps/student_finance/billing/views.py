@@ -1,13 +1,20 @@
+import json
 import logging
+from itertools import groupby
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
-from django.db import transaction
+from django.db import IntegrityError, transaction
 
 from apps.schools.models import Semester
-from apps.student_finance.mixins.BillingMixin import StudentInvoicingMixin
-from apps.student_finance.models import InvoiceType,StudentFeeInvoice, StudentFeeStatement
-from apps.student_finance.billing.serializers import BulkFeeInvoiceSerializer, BulkInvoiceSerializer, FeePaymentSerializer, SingleFeeInvoiceSerializer, SingleInvoiceSerializer, StudentFeeStatementsSerializer
+from apps.student_finance.mixins.BillingMixin import PaymentProcessor, StudentInvoicingMixin
+from apps.student_finance.models import InvoiceType,StudentFeeInvoice, StudentFeePayment, StudentFeeStatement
+from apps.student_finance.utils.allocations import reverse_payment_allocations
+from apps.student_finance.utils.payment_reference_generator import payment_external_reference
+from apps.student_finance.billing.serializers import BulkFeeInvoiceSerializer, BulkInvoiceSerializer, FeePaymentSerializer, PaymentIngestSerializer, SingleFeeInvoiceSerializer, SingleInvoiceSerializer, StudentFeeStatementsSerializer
 from apps.students.models import Student
 from decimal import Decimal
 
@@ -266,6 +273,170 @@ class FeePaymentView(generics.CreateAPIView, StudentInvoicingMixin):
         return Response(result, status=status.HTTP_201_CREATED)
 
 
+class PaymentIngestView(APIView):
+    """
+    Idempotent payment ingestion for integration partners.
+
+    Takes {"payments": [...], "semester": id} with up to 1000 payments, or
+    one payment object whose external_reference may come from the
+    Idempotency-Key header. External references are stored in the same
+    "<method>:<reference>" form as statement uploads, so a payment already
+    ingested or uploaded is answered from the original row, found with a
+    single probe of the unique index, and is never posted twice.
+    """
+
+    def _replays(self, items):
+        # Stored external_reference -> the partner's external_reference
+        keys = {
+            payment_external_reference(
+                item["payment_method"], item["external_reference"]
+            ): item["external_reference"]
+            for item in items
+        }
+        return {
+            keys[payment["external_reference"]]: {
+                "external_reference": keys[payment["external_reference"]],
+                "status": "replayed",
+                "reference": payment["reference"],
+                "student": payment["student__registration_number"],
+                "amount": str(payment["amount"]),
+                "method": payment["payment_method"],
+            }
+            for payment in StudentFeePayment.objects.filter(
+                external_reference__in=keys
+            ).values(
+                "external_reference",
+                "reference",
+                "student__registration_number",
+                "amount",
+                "payment_method",
+            )
+        }
+
+    def post(self, request):
+        data = request.data
+        if "payments" not in data:
+            payment = {key: data.get(key) for key in data}
+            idempotency_key = request.headers.get("Idempotency-Key")
+            if idempotency_key and not payment.get("external_reference"):
+                payment["external_reference"] = idempotency_key
+            semester = payment.pop("semester", None)
+            data = {"payments": [payment]}
+            if semester is not None:
+                data["semester"] = semester
+
+        serializer = PaymentIngestSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["payments"]
+
+        results = self._replays(items)
+        pending = [item for item in items if item["external_reference"] not in results]
+
+        if pending:
+            semester_id = serializer.validated_data.get("semester")
+            if semester_id:
+                semester = Semester.objects.filter(id=semester_id).first()
+                if not semester:
+                    return Response(
+                        {"error": "Semester not found."},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+            else:
+                semester = Semester.objects.filter(status="Active").first()
+
+            students = {
+                student.registration_number: student
+                for student in Student.objects.select_related("user").filter(
+                    registration_number__in={
+                        item["registration_number"] for item in pending
+                    }
+                )
+            }
+            for item in pending:
+                if item["registration_number"] not in students:
+                    results[item["external_reference"]] = {
+                        "external_reference": item["external_reference"],
+                        "status": "error",
+                        "error": f"Student not found with given registration number {item['registration_number']}",
+                    }
+            pending = [
+                {
+                    **item,
+                    "student": students[item["registration_number"]],
+                    "reference": item.get("reference") or item["external_reference"],
+                }
+                for item in pending
+                if item["registration_number"] in students
+            ]
+
+        for attempt in range(2):
+            if not pending:
+                break
+            try:
+                payments = PaymentProcessor.bulk_process(
+                    [
+                        {
+                            **item,
+                            "external_reference": payment_external_reference(
+                                item["payment_method"], item["external_reference"]
+                            ),
+                        }
+                        for item in pending
+                    ],
+                    semester,
+                    request.user,
+                )
+            except IntegrityError:
+                if attempt:
+                    raise
+                # A concurrent request or upload posted some of the same keys first
+                results.update(self._replays(pending))
+                pending = [
+                    item for item in pending if item["external_reference"] not in results
+                ]
+                continue
+
+            for item, payment in zip(pending, payments):
+                results[item["external_reference"]] = {
+                    "external_reference": item["external_reference"],
+                    "status": "created",
+                    "reference": payment.reference,
+                    "student": payment.student.registration_number,
+                    "amount": str(payment.amount),
+                    "method": payment.payment_method,
+                }
+            break
+
+        ordered = [results[item["external_reference"]] for item in items]
+        outcomes = {result["status"] for result in ordered}
+        if "created" in outcomes:
+            response_status = (
+                status.HTTP_207_MULTI_STATUS
+                if "error" in outcomes
+                else status.HTTP_201_CREATED
+            )
+        elif outcomes == {"error"}:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_200_OK
+        return Response({"payments": ordered}, status=response_status)
+
+
+class ReversePaymentAllocationsView(APIView):
+    """Takes a payment's allocations back off the invoices it settled"""
+
+    def post(self, request, pk):
+        payment = get_object_or_404(StudentFeePayment, pk=pk)
+        reversed_count = reverse_payment_allocations(payment)
+        return Response(
+            {
+                "message": f"{reversed_count} allocations reversed",
+                "reference": payment.reference,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 class FeeStatementReportsAPIView(APIView):
     permission_classes = []
 
@@ -319,8 +490,8 @@ class FeeStatementReportsAPIView(APIView):
             if academic_year:
                 qs = qs.filter(semester__academic_year=academic_year)
 
-            qs = qs.order_by("-created_on")
-            student.fee_statements = qs
+            qs = qs.select_related("semester").order_by("-created_on", "-sequence")
+            student.fee_statements = list(qs)
 
             serializer = StudentFeeStatementsSerializer(student)
             return Response([serializer.data], status=200)
@@ -332,29 +503,48 @@ class FeeStatementReportsAPIView(APIView):
 
     def process_bulk_statement(self, cohort_id, semester, academic_year):
         try:
-            students = Student.objects.filter(cohort_id=cohort_id)
-            if not students.exists():
+            if not Student.objects.filter(cohort_id=cohort_id).exists():
                 return Response({"error": "No students found in this cohort"}, status=404)
 
-            results = []
-            for student in students:
-                qs = StudentFeeStatement.objects.filter(student=student)
-
-                if semester:
-                    qs = qs.filter(semester=semester)
+            # One query for the whole cohort, grouped per student while streaming
+            qs = StudentFeeStatement.objects.filter(student__cohort_id=cohort_id)
 
-                if academic_year:
-                    qs = qs.filter(semester__academic_year=academic_year)
+            if semester:
+                qs = qs.filter(semester=semester)
 
-                qs = qs.order_by("-created_on")
+            if academic_year:
+                qs = qs.filter(semester__academic_year=academic_year)
 
-                if qs.exists():
-                    student.fee_statements = qs
-                    results.append(student)
+            qs = qs.select_related(
+                "semester", "student__user", "student__programme", "student__cohort"
+            ).order_by("student_id", "-created_on", "-sequence")
 
-            serializer = StudentFeeStatementsSerializer(results, many=True)
-            return Response(serializer.data, status=200)
+            # Runs after this method returns, stream_statements handles its own errors
+            return StreamingHttpResponse(
+                self.stream_statements(qs.iterator(chunk_size=2000), cohort_id),
+                content_type="application/json",
+            )
 
         except Exception as e:
             logger.error(f"Error fetching cohort statements: {e}")
             return Response({"error": "Error fetching cohort fee statements"}, status=500)
+
+    def stream_statements(self, statements, cohort_id):
+        yield "["
+        first = True
+        try:
+            for _, group in groupby(
+                statements, key=lambda statement: statement.student_id
+            ):
+                group = list(group)
+                student = group[0].student
+                student.fee_statements = group
+                data = StudentFeeStatementsSerializer(student).data
+                yield ("" if first else ", ") + json.dumps(data, cls=DjangoJSONEncoder)
+                first = False
+        except Exception:
+            # The 200 status is already sent, abort the response so the client
+            # gets a truncated body instead of a well-formed partial list
+            logger.exception(f"Error streaming fee statements for cohort {cohort_id}")
+            raise
+        yield "]"
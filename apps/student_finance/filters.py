@@ -1,4 +1,4 @@
-from .models import StudentFeeInvoice, StudentFeeLedger, StudentFeePayment, StudentFeeStatement
+from .models import StudentFeeAccount, StudentFeeInvoice, StudentFeeLedger, StudentFeePayment, StudentFeeStatement
 import django_filters
 from django.db.models import Q
 from decimal import Decimal
@@ -130,3 +130,49 @@ class StudentFeeLedgerFilter(django_filters.FilterSet):
             | Q(student__user__first_name__icontains=value)
             | Q(student__user__last_name__icontains=value)
         )
+
+
+class StudentFeeAccountFilter(django_filters.FilterSet):
+    """
+    Filter student fee balances, every filter is served by an index on
+    the fee account table
+    """
+
+    cohort = django_filters.NumberFilter(field_name="cohort_id")
+    programme = django_filters.NumberFilter(field_name="programme_id")
+    campus = django_filters.NumberFilter(field_name="campus_id")
+    min_balance = django_filters.NumberFilter(field_name="balance", lookup_expr="gte")
+    max_balance = django_filters.NumberFilter(field_name="balance", lookup_expr="lte")
+    debtors_only = django_filters.BooleanFilter(method="filter_debtors")
+    search = django_filters.CharFilter(method="filter_by_search")
+
+    class Meta:
+        model = StudentFeeAccount
+        fields = ["cohort", "programme", "campus", "min_balance", "max_balance"]
+
+    def filter_debtors(self, queryset, name, value):
+        if value:
+            return queryset.filter(balance__gt=0)
+        return queryset
+
+    def filter_by_search(self, queryset, name, value):
+        return queryset.filter(
+            Q(student__registration_number__icontains=value)
+            | Q(student__user__first_name__icontains=value)
+            | Q(student__user__last_name__icontains=value)
+        )
+
+
+class ArrearsAgingFilter(django_filters.FilterSet):
+    """
+    Narrow the open invoices of the arrears aging report
+    """
+
+    semester = django_filters.NumberFilter(field_name="semester_id")
+    cohort = django_filters.NumberFilter(field_name="student__cohort_id")
+    programme = django_filters.NumberFilter(field_name="student__programme_id")
+    campus = django_filters.NumberFilter(field_name="student__campus_id")
+
+    class Meta:
+        model = StudentFeeInvoice
+        fields = ["semester", "cohort", "programme", "campus"]
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.student_finance.utils.fee_rollups import rebuild_fee_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily fee collection rollups from fee statements"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rollup rows inserted per query",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding fee collection rollups...")
+        count = rebuild_fee_rollups(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {count} fee collection rollups.")
+        )
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.student_finance.utils.fee_accounts import rebuild_statement_balances
+from apps.students.models import Student
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute running balances on student fee statements and fee "
+        "accounts from the statement debits and credits"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--student",
+            action="append",
+            dest="students",
+            metavar="REGISTRATION_NUMBER",
+            help="Only rebuild this student, may be repeated",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of students rebuilt per transaction",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted students without fixing them",
+        )
+
+    def handle(self, *args, **options):
+        student_ids = None
+        if options["students"]:
+            found = dict(
+                Student.objects.filter(
+                    registration_number__in=options["students"]
+                ).values_list("registration_number", "id")
+            )
+            missing = set(options["students"]) - set(found)
+            if missing:
+                raise CommandError(f"Students not found: {', '.join(sorted(missing))}")
+            student_ids = list(found.values())
+
+        self.stdout.write("Rebuilding fee statement balances...")
+        summary = rebuild_statement_balances(
+            student_ids=student_ids,
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+        )
+
+        drifted = summary["drifted"]
+        if drifted:
+            registration_numbers = dict(
+                Student.objects.filter(id__in=list(drifted)[:50]).values_list(
+                    "id", "registration_number"
+                )
+            )
+            for student_id in list(drifted)[:50]:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"  {registration_numbers.get(student_id, student_id)}: "
+                        f"{drifted[student_id]} statement lines"
+                    )
+                )
+            if len(drifted) > 50:
+                self.stdout.write(f"  ... and {len(drifted) - 50} more students")
+
+        action = "Found" if options["dry_run"] else "Fixed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {summary['statements']} statement lines of "
+                f"{summary['students']} students. {action} {len(drifted)} "
+                f"drifted students, "
+                f"{sum(drifted.values())} statement lines."
+            )
+        )
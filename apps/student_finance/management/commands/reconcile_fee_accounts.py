@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from apps.student_finance.utils.fee_accounts import reconcile_fee_accounts
+
+
+class Command(BaseCommand):
+    help = "Rebuild student fee account balances from fee statements"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of students reconciled per transaction",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted accounts without fixing them",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Reconciling student fee accounts...")
+        summary = reconcile_fee_accounts(
+            batch_size=options["batch_size"], dry_run=options["dry_run"]
+        )
+
+        drifted = summary["drifted"]
+        if drifted:
+            shown = ", ".join(str(student_id) for student_id in drifted[:50])
+            more = f" and {len(drifted) - 50} more" if len(drifted) > 50 else ""
+            self.stdout.write(
+                self.style.WARNING(f"Drifted accounts (student ids): {shown}{more}")
+            )
+
+        action = "Found" if options["dry_run"] else "Fixed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {summary['checked']} students. {action} "
+                f"{len(drifted)} drifted and {summary['created']} missing accounts."
+            )
+        )
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:29
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def create_fee_accounts(apps, schema_editor):
+    StudentFeeStatement = apps.get_model("student_finance", "StudentFeeStatement")
+    StudentFeeAccount = apps.get_model("student_finance", "StudentFeeAccount")
+
+    statements = (
+        StudentFeeStatement.objects.order_by("student_id", "created_on", "id")
+        .only("id", "student_id", "balance")
+        .iterator(chunk_size=2000)
+    )
+
+    accounts = {}
+    batch = []
+    for statement in statements:
+        account = accounts.get(statement.student_id)
+        if account is None:
+            account = accounts[statement.student_id] = StudentFeeAccount(
+                student_id=statement.student_id
+            )
+        account.last_sequence += 1
+        account.balance = statement.balance
+        statement.sequence = account.last_sequence
+        batch.append(statement)
+        if len(batch) >= 2000:
+            StudentFeeStatement.objects.bulk_update(batch, ["sequence"])
+            batch = []
+    StudentFeeStatement.objects.bulk_update(batch, ["sequence"])
+    StudentFeeAccount.objects.bulk_create(accounts.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_finance', '0002_initial'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentfeestatement',
+            name='sequence',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.CreateModel(
+            name='StudentFeeAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10)),
+                ('last_sequence', models.PositiveIntegerField(default=0)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fee_account', to='students.student')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(create_fee_accounts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='studentfeestatement',
+            name='sequence',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='studentfeestatement',
+            unique_together={('student', 'sequence')},
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:32
+
+import apps.student_finance.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_finance', '0003_studentfeeaccount'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentfeepayment',
+            name='reference',
+            field=models.CharField(blank=True, default=apps.student_finance.models.fee_payment_reference, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_finance', '0004_fee_payment_reference_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentFeePaymentInvoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('amount_applied', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_reversed', models.BooleanField(default=False)),
+                ('reversed_on', models.DateTimeField(blank=True, null=True)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='student_finance.studentfeeinvoice')),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='student_finance.studentfeepayment')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
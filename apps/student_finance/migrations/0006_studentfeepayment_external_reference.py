@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_finance', '0005_studentfeepaymentinvoice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentfeepayment',
+            name='external_reference',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
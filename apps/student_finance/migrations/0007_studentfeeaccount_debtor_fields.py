@@ -0,0 +1,73 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_debtor_fields(apps, schema_editor):
+    StudentFeeAccount = apps.get_model("student_finance", "StudentFeeAccount")
+    StudentFeeStatement = apps.get_model("student_finance", "StudentFeeStatement")
+    Student = apps.get_model("students", "Student")
+
+    student = Student.objects.filter(pk=OuterRef("student_id"))
+    StudentFeeAccount.objects.update(
+        cohort_id=Subquery(student.values("cohort_id")[:1]),
+        programme_id=Subquery(student.values("programme_id")[:1]),
+        campus_id=Subquery(student.values("campus_id")[:1]),
+        last_statement_id=Subquery(
+            StudentFeeStatement.objects.filter(
+                student_id=OuterRef("student_id"), sequence=OuterRef("last_sequence")
+            ).values("pk")[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_referencesequence'),
+        ('schools', '0004_alter_course_semester'),
+        ('student_finance', '0006_studentfeepayment_external_reference'),
+        ('students', '0004_remove_semesterreporting_cohort_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentfeeaccount',
+            name='campus',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.campus'),
+        ),
+        migrations.AddField(
+            model_name='studentfeeaccount',
+            name='cohort',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='schools.programmecohort'),
+        ),
+        migrations.AddField(
+            model_name='studentfeeaccount',
+            name='last_statement',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='student_finance.studentfeestatement'),
+        ),
+        migrations.AddField(
+            model_name='studentfeeaccount',
+            name='programme',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='schools.programme'),
+        ),
+        migrations.AddIndex(
+            model_name='studentfeeaccount',
+            index=models.Index(fields=['balance'], name='student_fin_balance_255d78_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentfeeaccount',
+            index=models.Index(fields=['cohort', 'balance'], name='student_fin_cohort__8b8457_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentfeeaccount',
+            index=models.Index(fields=['programme', 'balance'], name='student_fin_program_a5f8d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentfeeaccount',
+            index=models.Index(fields=['campus', 'balance'], name='student_fin_campus__1bef95_idx'),
+        ),
+        migrations.RunPython(fill_debtor_fields, migrations.RunPython.noop),
+    ]
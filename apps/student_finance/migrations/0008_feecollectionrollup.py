@@ -0,0 +1,84 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:43
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_fee_collection_rollups(apps, schema_editor):
+    FeeCollectionRollup = apps.get_model("student_finance", "FeeCollectionRollup")
+    StudentFeeStatement = apps.get_model("student_finance", "StudentFeeStatement")
+
+    dimensions = ["day", "semester_id", "payment_method", "programme_id", "campus_id"]
+    rows = (
+        StudentFeeStatement.objects.values(
+            "semester_id",
+            "payment_method",
+            day=TruncDate("created_on"),
+            programme_id=F("student__programme_id"),
+            campus_id=F("student__campus_id"),
+        )
+        .annotate(
+            invoiced=Sum("debit", filter=Q(statement_type="Invoice")),
+            collected=Sum("credit", filter=Q(statement_type="Payment")),
+            invoice_count=Count("id", filter=Q(statement_type="Invoice")),
+            payment_count=Count("id", filter=Q(statement_type="Payment")),
+        )
+        .order_by()
+    )
+    FeeCollectionRollup.objects.bulk_create(
+        [
+            FeeCollectionRollup(
+                # Same format as fee_rollup_key
+                key="|".join(
+                    "" if row[d] is None else str(row[d]) for d in dimensions
+                ),
+                **{d: row[d] for d in dimensions},
+                invoiced=row["invoiced"] or Decimal("0.00"),
+                collected=row["collected"] or Decimal("0.00"),
+                invoice_count=row["invoice_count"],
+                payment_count=row["payment_count"],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_referencesequence'),
+        ('schools', '0004_alter_course_semester'),
+        ('student_finance', '0007_studentfeeaccount_debtor_fields'),
+        ('students', '0004_remove_semesterreporting_cohort_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeeCollectionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('day', models.DateField()),
+                ('payment_method', models.CharField(blank=True, max_length=255, null=True)),
+                ('invoiced', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('collected', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('campus', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.campus')),
+                ('programme', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='schools.programme')),
+                ('semester', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='schools.semester')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='student_fin_day_eff496_idx'), models.Index(fields=['semester', 'day'], name='student_fin_semeste_c8ee24_idx')],
+            },
+        ),
+        migrations.RunPython(
+            fill_fee_collection_rollups, migrations.RunPython.noop
+        ),
+    ]
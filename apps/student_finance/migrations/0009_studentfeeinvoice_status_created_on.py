@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_finance', '0008_feecollectionrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentfeeinvoice',
+            index=models.Index(fields=['status', 'created_on'], name='student_fin_status_c7ade6_idx'),
+        ),
+    ]
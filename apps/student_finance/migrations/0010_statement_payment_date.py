@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_finance', '0009_studentfeeinvoice_status_created_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentfeestatement',
+            name='payment_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
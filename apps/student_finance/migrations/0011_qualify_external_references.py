@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def qualify_external_references(apps, schema_editor):
+    StudentFeePayment = apps.get_model("student_finance", "StudentFeePayment")
+
+    payments = StudentFeePayment.objects.filter(external_reference__isnull=False)
+    existing = set(payments.values_list("external_reference", flat=True))
+    qualified = []
+    for payment in payments.only("id", "payment_method", "external_reference"):
+        prefix = f"{payment.payment_method}:"
+        if payment.external_reference.startswith(prefix):
+            continue
+        key = prefix + payment.external_reference
+        # Left raw if an upload already posted the same receipt
+        if key in existing:
+            continue
+        existing.add(key)
+        payment.external_reference = key
+        qualified.append(payment)
+    StudentFeePayment.objects.bulk_update(
+        qualified, ["external_reference"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_finance', '0010_statement_payment_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(qualify_external_references, migrations.RunPython.noop),
+    ]
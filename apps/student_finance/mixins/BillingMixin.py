@@ -3,13 +3,31 @@ from datetime import date
 import logging
 
 from django.db import transaction
+from apps.accounting.services.default_accounts import (
+    get_default_account,
+    get_payment_account,
+)
+from apps.accounting.services.outbox import enqueue_journal_entries_bulk
 from apps.finance.models import FeeStructure
 from apps.student_finance.models import (
     StudentFeeInvoice,
     StudentFeePayment,
-    StudentFeeStatement,
 )
-from apps.student_finance.utils.payment_reference_generator import payment_ref_generator
+from apps.student_finance.utils.allocations import (
+    allocate_payment,
+    allocate_payments_bulk,
+)
+from apps.student_finance.utils.fee_accounts import (
+    build_fee_statement,
+    lock_fee_account,
+    lock_fee_accounts,
+    post_fee_statement,
+    save_fee_statements,
+)
+from apps.student_finance.utils.payment_reference_generator import (
+    payment_ref_generator,
+    payment_refs_generator,
+)
 from apps.students.models import Student
 
 logging.basicConfig(level=logging.DEBUG)
@@ -36,17 +54,12 @@ class PaymentProcessor:
         self.description = description
         self.reference = reference
 
-    def _get_last_balance(self):
-        last_statement = (
-            StudentFeeStatement.objects.filter(student=self.student)
-            .order_by("-created_on")
-            .first()
-        )
-        return last_statement.balance if last_statement else Decimal("0.00")
-
     @transaction.atomic
     def process(self):
         try:
+            # Serializes postings for this student until the transaction commits
+            account = lock_fee_account(self.student)
+
             # 1. Record raw payment
             payment = StudentFeePayment.objects.create(
                 student=self.student,
@@ -58,58 +71,24 @@ class PaymentProcessor:
                 or payment_ref_generator(suffix="CASH"),
             )
 
-            last_balance = self._get_last_balance()
-            remaining_amount = self.amount
-            applied_amount = Decimal("0.00")
-
             # 2. Apply payment to unpaid invoices (oldest first)
-            unpaid_invoices = StudentFeeInvoice.objects.filter(
-                student=self.student, status__in=["Pending", "Partially Paid"]
-            ).order_by("created_on")
-
-            for invoice in unpaid_invoices:
-                if remaining_amount <= 0:
-                    break
-
-                balance_due = invoice.bal_due
-                allocation = min(balance_due, remaining_amount)
-
-                invoice.amount_paid += allocation
-                invoice.status = (
-                    "Paid"
-                    if invoice.amount_paid >= invoice.amount
-                    else "Partially Paid"
-                )
-                invoice.save()
-
-                # StudentFeePaymentInvoice.objects.create(
-                #     payment=payment,
-                #     invoice=invoice,
-                #     amount_applied=allocation,
-                # )
-
-                applied_amount += allocation
-                remaining_amount -= allocation
+            allocations, remaining_amount = allocate_payment(payment)
+            applied_amount = self.amount - remaining_amount
 
-            # 3. Update running balance
-            new_balance = last_balance - self.amount
-
-            # 4. Record statement
-            StudentFeeStatement.objects.create(
-                student=self.student,
-                debit=Decimal("0.00"),
-                credit=self.amount,
-                balance=new_balance,
+            # 3. Record statement and update running balance
+            post_fee_statement(
+                account,
                 statement_type="Payment",
-                # invoice_type=None,  # Payment doesn’t directly belong to an invoice_type
                 semester=self.semester,
+                credit=self.amount,
                 payment_method=self.payment_method,
-                # description=self.description if self.description else "Fees Payment",
+                payment_date=payment.payment_date,
             )
 
             logging.info(
-                f"Payment processed: student={self.student}, applied={applied_amount}, "
-                f"remaining={remaining_amount}, new_balance={new_balance}"
+                f"Payment processed: student={self.student}, applied={applied_amount} "
+                f"to {len(allocations)} invoices, "
+                f"remaining={remaining_amount}, new_balance={account.balance}"
             )
             return payment
 
@@ -117,6 +96,89 @@ class PaymentProcessor:
             logging.error(f"Error processing payment: {e}")
             raise
 
+    @classmethod
+    def bulk_process(cls, payments, semester, user, batch_size=500):
+        """
+        Posts many payments, e.g. the matched lines of a bank or M-Pesa
+        statement. Each item of ``payments`` is a dict with student, amount,
+        payment_method and optional reference, payment_date and
+        external_reference. Payments without a reference get one from the
+        "FP" series, reserved as one block per batch.
+
+        Works like process() but per batch of ``batch_size`` payments: fee
+        accounts are locked together, payments, statements and allocations
+        are bulk inserted, and the payment journal entries are queued in
+        one insert. The entire bulk operation is atomic.
+        """
+        created = []
+        with transaction.atomic():
+            for offset in range(0, len(payments), batch_size):
+                batch = payments[offset : offset + batch_size]
+                accounts = lock_fee_accounts(item["student"] for item in batch)
+                missing = sum(1 for item in batch if not item.get("reference"))
+                references = iter(
+                    payment_refs_generator(missing, suffix="FP") if missing else []
+                )
+
+                posted = StudentFeePayment.objects.bulk_create(
+                    [
+                        StudentFeePayment(
+                            student=item["student"],
+                            amount=Decimal(item["amount"]),
+                            payment_date=item.get("payment_date") or date.today(),
+                            payment_method=item["payment_method"],
+                            reference=item.get("reference") or next(references),
+                            external_reference=item.get("external_reference"),
+                            created_by=user,
+                        )
+                        for item in batch
+                    ]
+                )
+                allocate_payments_bulk(posted, batch_size=batch_size)
+
+                save_fee_statements(
+                    accounts,
+                    [
+                        build_fee_statement(
+                            accounts[payment.student_id],
+                            statement_type="Payment",
+                            semester=semester,
+                            credit=payment.amount,
+                            payment_method=payment.payment_method,
+                            payment_date=payment.payment_date,
+                        )
+                        for payment in posted
+                    ],
+                    batch_size=batch_size,
+                )
+
+                # bulk_create skips the post_save signal that queues the journal
+                tuition = get_default_account("tuition_revenue")
+                enqueue_journal_entries_bulk(
+                    [
+                        {
+                            "description": f"Fee payment by {payment.student.name()} via {payment.payment_method}",
+                            "reference": f"FEEPAY-{payment.id}",
+                            "user": user,
+                            "transactions": [
+                                {
+                                    "account": get_payment_account(
+                                        payment.payment_method, fallback="other_receipts"
+                                    ),
+                                    "amount": payment.amount,
+                                    "is_debit": True,
+                                },
+                                {"account": tuition, "amount": payment.amount, "is_debit": False},
+                            ],
+                        }
+                        for payment in posted
+                    ]
+                )
+                created.extend(posted)
+
+        logging.info("Bulk payments processed: %d payments", len(created))
+        return created
+
 
 class InvoiceProcessor:
     """Handles student invoicing (single and bulk, resolves amount from FeeStructure if not provided)"""
@@ -142,14 +204,6 @@ class InvoiceProcessor:
         )
         self.user = user
 
-    def _get_last_balance(self):
-        last_statement = (
-            StudentFeeStatement.objects.filter(student=self.student)
-            .order_by("-created_on")
-            .first()
-        )
-        return last_statement.balance if last_statement else Decimal("0.00")
-
     def _resolve_amount(self):
         """If amount is not passed, derive from FeeStructure for cohort + semester."""
         if self.amount is not None:
@@ -178,12 +232,13 @@ class InvoiceProcessor:
     @transaction.atomic
     def create_invoice(self):
         amount = self._resolve_amount()
-        ref = payment_ref_generator(suffix="INV", model=StudentFeeInvoice)
+        ref = payment_ref_generator(suffix="INV")
         if amount is None:
             logging.error(
                 "Invoice creation aborted — no fee structure or amount provided"
             )
             return None
+        account = lock_fee_account(self.student)
         invoice = StudentFeeInvoice.objects.create(
             amount=amount,
             reference=ref,
@@ -193,17 +248,11 @@ class InvoiceProcessor:
             created_by=self.user,
         )
 
-        last_balance = self._get_last_balance()
-        new_balance = last_balance + amount
-
-        StudentFeeStatement.objects.create(
-            debit=amount,
-            credit=Decimal("0.00"),
-            balance=new_balance,
-            student=self.student,
+        post_fee_statement(
+            account,
             statement_type="Invoice",
-            # invoice_type=self.invoice_type,
             semester=self.semester,
+            debit=amount,
         )
 
         logging.info(
@@ -227,83 +276,100 @@ class InvoiceProcessor:
         return processor.create_invoice()
 
     @classmethod
-    def bulk_fee_invoice(cls, cohort, semester, invoice_type, user, amount=None,batch_size=100,):
+    def bulk_fee_invoice(
+        cls, cohort, semester, invoice_type, user, amount=None, batch_size=500
+    ):
         """
         Generate invoices for all students in the given cohort.
         If amount is None, the FeeStructure for (cohort, semester) will be used to resolve amount.
         The entire bulk operation is atomic.
+
+        Works on the whole cohort at once: the amount is resolved once,
+        already invoiced students are found with one query, references are
+        reserved as one block and invoices, statements and journal entries are
+        written with bulk inserts, ``batch_size`` rows per statement.
         """
         logging.info(
-        "[START] Generating invoices | cohort=%s, semester=%s, invoice_type=%s, user=%s",
-        cohort, semester, invoice_type, user
+            "[START] Generating invoices | cohort=%s, semester=%s, invoice_type=%s, user=%s",
+            cohort, semester, invoice_type, user
         )
-        # students = Student.objects.filter(cohort=cohort)
         try:
-            students_qs = Student.objects.filter(cohort=cohort)
-            count = students_qs.count()
-            logging.info("Found %d students for cohort=%s", count, cohort)
+            amount = cls(
+                student=None,
+                semester=semester,
+                invoice_type=invoice_type,
+                amount=amount,
+                user=user,
+                cohort=cohort,
+            )._resolve_amount()
+            if amount is None:
+                logging.error(
+                    "Invoice creation aborted — no fee structure or amount provided"
+                )
+                return None
 
-            if count == 0:
-                logging.warning("No students found for cohort=%s", cohort)
-                return []
+            invoiced = StudentFeeInvoice.objects.filter(
+                student__cohort=cohort, semester=semester, invoice_type=invoice_type
+            ).values("student_id")
+            students = list(
+                Student.objects.filter(cohort=cohort)
+                .exclude(id__in=invoiced)
+                .select_related("user")
+                .order_by("id")
+            )
+            logging.info("Found %d students to invoice for cohort=%s", len(students), cohort)
 
-            invoices = []
-            batch = []
+            if not students:
+                logging.warning("No students to invoice for cohort=%s", cohort)
+                return []
 
-            # Wrap entire operation in a transaction
             with transaction.atomic():
-                for idx, student in enumerate(students_qs.iterator(chunk_size=batch_size), start=1):
-                    # Check for existing invoice for same semester + type
-                    if StudentFeeInvoice.objects.filter(
-                            student=student, semester=semester, invoice_type=invoice_type
-                        ).exists():
-                            logging.info(
-                                "Skipping student #%d (%s) — already invoiced for %s / %s",
-                                idx, student, semester, invoice_type
-                            )
-                            continue
-
-                    logging.debug("Queuing student #%d: %s", idx, student)
-
-                    processor = cls(
-                        student=student,
+                accounts = lock_fee_accounts(students)
+                references = payment_refs_generator(len(students), suffix="INV")
+
+                invoices = StudentFeeInvoice.objects.bulk_create(
+                    [
+                        StudentFeeInvoice(
+                            amount=amount,
+                            reference=reference,
+                            semester=semester,
+                            student=student,
+                            invoice_type=invoice_type,
+                            created_by=user,
+                        )
+                        for student, reference in zip(students, references)
+                    ],
+                    batch_size=batch_size,
+                )
+
+                statements = [
+                    build_fee_statement(
+                        accounts[student.id],
+                        statement_type="Invoice",
                         semester=semester,
-                        invoice_type=invoice_type,
-                        amount=amount,
-                        user=user,
-                        cohort=cohort,
+                        debit=amount,
                     )
-                    batch.append(processor)
-
-                    if len(batch) >= batch_size:
-                        logging.info("Processing batch of %d invoices...", len(batch))
-                        with transaction.atomic():
-                            for p in batch:
-                                try:
-                                    inv = p.create_invoice()
-                                    invoices.append(inv)
-                                    logging.debug("Invoice created: %s", inv.reference)
-                                except Exception as e:
-                                    logging.exception(
-                                        "Error creating invoice for student %s: %s",
-                                        student, e
-                                    )
-                        batch.clear()
-
-                # process any remaining
-                if batch:
-                    logging.info("Processing final batch of %d invoices...", len(batch))
-                    with transaction.atomic():
-                        for p in batch:
-                            try:
-                                inv = p.create_invoice()
-                                invoices.append(inv)
-                                logging.debug("Invoice created: %s", inv.reference)
-                            except Exception as e:
-                                logging.exception(
-                                    "Error creating invoice for student %s: %s",
-                                    p.student, e
-                                )
+                    for student in students
+                ]
+                save_fee_statements(accounts, statements, batch_size=batch_size)
+
+                # bulk_create skips the post_save signal that queues the journal
+                receivable = get_default_account("receivable")
+                tuition = get_default_account("tuition_revenue")
+                enqueue_journal_entries_bulk(
+                    [
+                        {
+                            "description": f"Invoicing for {invoice.student.user.first_name} {invoice.student.user.last_name}",
+                            "reference": f"INVOICE-{invoice.id}",
+                            "user": user,
+                            "transactions": [
+                                {"account": receivable, "amount": amount, "is_debit": True},
+                                {"account": tuition, "amount": amount, "is_debit": False},
+                            ],
+                        }
+                        for invoice in invoices
+                    ]
+                )
 
             logging.info("[END] Successfully created %d invoices.", len(invoices))
             return invoices
@@ -24,6 +24,15 @@ STUDENT_FEE_STATEMENT_TYPES = (
 )
 
 
+def fee_payment_reference():
+    """
+    Fallback payment reference, set without a query so bulk_create gets one
+    too. The processors reserve sequential "FP" references instead; the
+    full UUID keeps this fallback from colliding.
+    """
+    return f"FP-{uuid4().hex.upper()}"
+
+
 class InvoiceType(AbsoluteBaseModel):
     name = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
@@ -63,6 +72,9 @@ class StudentFeeInvoice(AbsoluteBaseModel):
         "users.User", on_delete=models.SET_NULL, null=True, blank=True
     )
 
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_on"])]
+
     @property
     def bal_due(self):
         return self.amount - self.amount_paid
@@ -72,7 +84,13 @@ class StudentFeeInvoice(AbsoluteBaseModel):
 
 
 class StudentFeePayment(AbsoluteBaseModel):
-    reference = models.CharField(max_length=255, null=True, blank=True)
+    reference = models.CharField(
+        max_length=255, null=True, blank=True, default=fee_payment_reference
+    )
+    # Idempotency key or transaction code from the paying channel
+    external_reference = models.CharField(
+        max_length=255, null=True, blank=True, unique=True
+    )
     student = models.ForeignKey("students.Student", on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_date = models.DateField()
@@ -91,15 +109,22 @@ class StudentFeePayment(AbsoluteBaseModel):
     def __str__(self):
         return self.student.registration_number
 
-    def save(self, *args, **kwargs):
-        last_payment = StudentFeePayment.objects.filter(student=self.student).last()
-        if last_payment and not self.reference:
-            self.reference = f"FP-{uuid4().hex[:8].upper()}-{last_payment.id + 1}"
-        elif not self.reference:
-            self.reference = f"FP-{uuid4().hex[:8].upper()}-1"
-        else:
-            self.reference = f"FP-{uuid4().hex[:8].upper()}"
-        return super().save(*args, **kwargs)
+
+class StudentFeePaymentInvoice(AbsoluteBaseModel):
+    """Portion of a payment applied to an invoice."""
+
+    payment = models.ForeignKey(
+        "StudentFeePayment", on_delete=models.CASCADE, related_name="allocations"
+    )
+    invoice = models.ForeignKey(
+        "StudentFeeInvoice", on_delete=models.CASCADE, related_name="allocations"
+    )
+    amount_applied = models.DecimalField(max_digits=10, decimal_places=2)
+    is_reversed = models.BooleanField(default=False)
+    reversed_on = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.payment.reference} -> {self.invoice.reference}"
 
 
 class StudentFeeLedger(AbsoluteBaseModel):
@@ -131,6 +156,13 @@ class StudentFeeStatement(AbsoluteBaseModel):
     semester = models.ForeignKey(
         "schools.Semester", on_delete=models.SET_NULL, null=True
     )
+    # Per-student posting order, allocated from StudentFeeAccount.last_sequence
+    sequence = models.PositiveIntegerField()
+    # Date the money was received, set on payment lines only
+    payment_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("student", "sequence")
 
     @property
     def academic_year(self):
@@ -139,10 +171,101 @@ class StudentFeeStatement(AbsoluteBaseModel):
     def __str__(self):
         return self.student.registration_number
 
-    def save(self, *args, **kwargs):
-        last_statement = StudentFeeStatement.objects.filter(student=self.student).last()
-        if last_statement and not self.reference:
-            self.reference = f"FS-{uuid4().hex[:8].upper()}-{last_statement.id + 1}"
-        else:
-            self.reference = f"FS-{uuid4().hex[:8].upper()}"
-        return super().save(*args, **kwargs)
+
+class StudentFeeAccount(AbsoluteBaseModel):
+    """
+    Current fee balance of a student. Postings lock this row, so statements
+    for one student are written one at a time and in sequence order.
+
+    The student's cohort, programme and campus are copied here so debtor
+    listings filter and sort by balance from this table alone.
+    """
+
+    student = models.OneToOneField(
+        "students.Student", on_delete=models.CASCADE, related_name="fee_account"
+    )
+    balance = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0"))
+    last_sequence = models.PositiveIntegerField(default=0)
+    last_statement = models.ForeignKey(
+        "StudentFeeStatement",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    cohort = models.ForeignKey(
+        "schools.ProgrammeCohort",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    programme = models.ForeignKey(
+        "schools.Programme",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    campus = models.ForeignKey(
+        "core.Campus", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["balance"]),
+            models.Index(fields=["cohort", "balance"]),
+            models.Index(fields=["programme", "balance"]),
+            models.Index(fields=["campus", "balance"]),
+        ]
+
+    def __str__(self):
+        return self.student.registration_number
+
+
+class FeeCollectionRollup(AbsoluteBaseModel):
+    """
+    Fees invoiced and collected per day, semester, payment method, programme
+    and campus, kept in step with fee statements.
+    """
+
+    # NULL dimensions never compare equal in a unique index, so rows are
+    # unique on a key built from all five, see fee_rollup_key
+    key = models.CharField(max_length=255, unique=True)
+    # Payment date for collections, posting date for invoices
+    day = models.DateField()
+    semester = models.ForeignKey(
+        "schools.Semester",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    payment_method = models.CharField(max_length=255, null=True, blank=True)
+    programme = models.ForeignKey(
+        "schools.Programme",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    campus = models.ForeignKey(
+        "core.Campus", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    invoiced = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0")
+    )
+    collected = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0")
+    )
+    invoice_count = models.PositiveIntegerField(default=0)
+    payment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["day"]),
+            models.Index(fields=["semester", "day"]),
+        ]
+
+    def __str__(self):
+        return self.key
@@ -1,7 +1,9 @@
+from django.utils import timezone
 from rest_framework import serializers
 from apps.schools.serializers import SemesterListSerializer
 from apps.student_finance.models import (
     InvoiceType,
+    StudentFeeAccount,
     StudentFeeLedger,
     StudentFeeInvoice,
     StudentFeePayment,
@@ -17,8 +19,9 @@ class StudentFeeLedgerSerializer(serializers.ModelSerializer):
 
 
 class StudentFeeInvoiceListSerializer(serializers.ModelSerializer):
-    student_name = serializers.SerializerMethodField()
-    student_reg_no = serializers.SerializerMethodField()
+    # Annotated by the views, see with_student_names
+    student_name = serializers.ReadOnlyField()
+    student_reg_no = serializers.ReadOnlyField()
     semester = SemesterListSerializer()
     bal_due = serializers.ReadOnlyField()
 
@@ -40,16 +43,11 @@ class StudentFeeInvoiceListSerializer(serializers.ModelSerializer):
             "status",
         ]
 
-    def get_student_name(self, obj):
-        return obj.student.name()
-
-    def get_student_reg_no(self, obj):
-        return obj.student.registration_number
-
 
 class StudentFeePaymentListSerializer(serializers.ModelSerializer):
-    student_name = serializers.SerializerMethodField()
-    student_reg_no = serializers.SerializerMethodField()
+    # Annotated by the views, see with_student_names
+    student_name = serializers.ReadOnlyField()
+    student_reg_no = serializers.ReadOnlyField()
 
     class Meta:
         model = StudentFeePayment
@@ -64,12 +62,6 @@ class StudentFeePaymentListSerializer(serializers.ModelSerializer):
             "student_reg_no",
         ]
 
-    def get_student_name(self, obj):
-        return obj.student.name()
-
-    def get_student_reg_no(self, obj):
-        return obj.student.registration_number
-
 
 class StudentFeeStatementListSerializer(serializers.ModelSerializer):
     student = MinimalStudentSerializer()
@@ -108,8 +100,9 @@ class AllFeeStatementListSerializer(serializers.ModelSerializer):
 
 
 class FeeLedgeListSerializer(serializers.ModelSerializer):
-    student_name = serializers.SerializerMethodField()
-    student_reg_no = serializers.SerializerMethodField()
+    # Annotated by the views, see with_student_names
+    student_name = serializers.ReadOnlyField()
+    student_reg_no = serializers.ReadOnlyField()
 
     class Meta:
         model = StudentFeeLedger
@@ -123,12 +116,6 @@ class FeeLedgeListSerializer(serializers.ModelSerializer):
             "transaction_type",
         ]
 
-    def get_student_name(self, obj):
-        return obj.student.name()
-
-    def get_student_reg_no(self, obj):
-        return obj.student.registration_number
-
 
 class StudentFeePaymentSerializer(serializers.Serializer):
     student = serializers.IntegerField()
@@ -147,3 +134,60 @@ class CreateAndUpdateInvoiceTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = InvoiceType
         fields = ["name", "description", "is_fee_type", "is_active"]
+
+
+class StudentFeeAccountListSerializer(serializers.ModelSerializer):
+    registration_number = serializers.ReadOnlyField(source="student.registration_number")
+    student_name = serializers.ReadOnlyField(source="student.name")
+    cohort = serializers.StringRelatedField()
+    programme = serializers.StringRelatedField()
+    campus = serializers.StringRelatedField()
+
+    class Meta:
+        model = StudentFeeAccount
+        fields = [
+            "id",
+            "student",
+            "registration_number",
+            "student_name",
+            "balance",
+            "cohort",
+            "programme",
+            "campus",
+            "last_statement",
+            "updated_on",
+        ]
+
+
+class ArrearsAgingInvoiceSerializer(serializers.ModelSerializer):
+    registration_number = serializers.ReadOnlyField(source="student.registration_number")
+    student_name = serializers.ReadOnlyField(source="student.name")
+    cohort = serializers.StringRelatedField(source="student.cohort")
+    programme = serializers.StringRelatedField(source="student.programme")
+    amount_paid = serializers.DecimalField(
+        source="paid_to_date", max_digits=10, decimal_places=2, read_only=True
+    )
+    outstanding = serializers.DecimalField(
+        max_digits=10, decimal_places=2, read_only=True
+    )
+    age_days = serializers.SerializerMethodField()
+
+    class Meta:
+        model = StudentFeeInvoice
+        fields = [
+            "id",
+            "reference",
+            "student",
+            "registration_number",
+            "student_name",
+            "cohort",
+            "programme",
+            "amount",
+            "amount_paid",
+            "outstanding",
+            "created_on",
+            "age_days",
+        ]
+
+    def get_age_days(self, obj):
+        return (self.context["as_of"] - timezone.localdate(obj.created_on)).days
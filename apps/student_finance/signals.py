@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.student_finance.models import StudentFeeAccount
+from apps.student_finance.utils.fee_accounts import student_account_fields
+from apps.students.models import Student
+
+
+@receiver(post_save, sender=Student)
+def sync_fee_account_student_fields(sender, instance, created, **kwargs):
+    """Keeps the cohort, programme and campus on the fee account current."""
+    if created:
+        return
+
+    fields = student_account_fields(instance)
+    StudentFeeAccount.objects.filter(student=instance).exclude(**fields).update(
+        **fields
+    )
@@ -1,3 +1,631 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.accounting.models import JournalOutbox
+from apps.core.models import AcademicYear, Campus, StudyYear
+from apps.finance.models import FeeStructure, FeeStructureItem
+from apps.schools.models import (
+    Department,
+    Programme,
+    ProgrammeCohort,
+    School,
+    Semester,
+)
+from apps.student_finance.billing.views import FeeStatementReportsAPIView
+from apps.student_finance.mixins.BillingMixin import InvoiceProcessor, PaymentProcessor
+from apps.student_finance.models import (
+    InvoiceType,
+    StudentFeeAccount,
+    StudentFeeInvoice,
+    StudentFeePayment,
+    StudentFeePaymentInvoice,
+    StudentFeeStatement,
+)
+from apps.student_finance.utils.allocations import reverse_payment_allocations
+from apps.student_finance.utils.arrears_aging import arrears_aging, open_invoices
+from apps.student_finance.utils.fee_accounts import (
+    lock_fee_account,
+    lock_fee_accounts,
+    post_fee_statement,
+    rebuild_statement_balances,
+    reconcile_fee_accounts,
+)
+from apps.student_finance.utils.payment_reference_generator import (
+    payment_external_reference,
+)
+from apps.students.models import Student
+from apps.users.models import User
+
+
+class StudentFinanceTestData:
+    """A cohort of three students with a 50,000 fee structure."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Default accounts are cached across test databases
+        cache.clear()
+        call_command("create_default_accounts", stdout=StringIO())
+
+        cls.user = User.objects.create(
+            username="bursar", first_name="Fee", last_name="Clerk"
+        )
+        school = School.objects.create(
+            name="Computing",
+            email="computing@example.com",
+            phone="0700000000",
+            location="Main",
+        )
+        department = Department.objects.create(name="Computer Science", school=school)
+        programme = Programme.objects.create(
+            name="Computer Science",
+            school=school,
+            department=department,
+            level="Diploma",
+        )
+        academic_year = AcademicYear.objects.create(name="2025/2026")
+        cls.semester = Semester.objects.create(
+            name="Semester One", academic_year=academic_year, status="Active"
+        )
+        study_year = StudyYear.objects.create(name="Year 1")
+        campus = Campus.objects.create(name="Main", city="Nairobi")
+        cls.cohort = ProgrammeCohort.objects.create(
+            name="CS-2025",
+            programme=programme,
+            current_year=study_year,
+            current_semester=cls.semester,
+        )
+        fee_structure = FeeStructure.objects.create(
+            programme=programme, year_of_study=study_year, semester=cls.semester
+        )
+        FeeStructureItem.objects.create(
+            fee_structure=fee_structure, description="Tuition", amount=Decimal("50000")
+        )
+        cls.invoice_type = InvoiceType.objects.create(
+            name="Fees", is_fee_type=True, is_active=True
+        )
+        cls.students = [
+            Student.objects.create(
+                user=User.objects.create(
+                    username=f"student{index}",
+                    first_name="Student",
+                    last_name=str(index),
+                ),
+                registration_number=f"REG/{index:03d}",
+                status="Active",
+                programme=programme,
+                cohort=cls.cohort,
+                campus=campus,
+            )
+            for index in range(3)
+        ]
+        cls.student = cls.students[0]
+
+    def invoice(self, student=None, amount=None):
+        return InvoiceProcessor.single_fee_invoice(
+            student or self.student,
+            self.invoice_type,
+            self.semester,
+            self.user,
+            amount=amount,
+        )
+
+    def pay(self, amount, student=None, payment_method="Cash"):
+        return PaymentProcessor(
+            student=student or self.student,
+            amount=amount,
+            payment_method=payment_method,
+            semester=self.semester,
+            user=self.user,
+        ).process()
+
+
+class FeeAccountTests(StudentFinanceTestData, TestCase):
+    def test_postings_are_numbered_in_sequence(self):
+        account = lock_fee_account(self.student)
+        for debit, credit in [("1000", "0"), ("0", "400"), ("250", "0")]:
+            post_fee_statement(
+                account,
+                "Invoice" if Decimal(debit) else "Payment",
+                self.semester,
+                debit=Decimal(debit),
+                credit=Decimal(credit),
+            )
+
+        statements = list(
+            StudentFeeStatement.objects.filter(student=self.student)
+            .order_by("sequence")
+            .values_list("sequence", "reference", "balance")
+        )
+        self.assertEqual(
+            statements,
+            [
+                (1, f"FS-{self.student.id}-1", Decimal("1000.00")),
+                (2, f"FS-{self.student.id}-2", Decimal("600.00")),
+                (3, f"FS-{self.student.id}-3", Decimal("850.00")),
+            ],
+        )
+        account.refresh_from_db()
+        self.assertEqual(account.balance, Decimal("850.00"))
+        self.assertEqual(account.last_sequence, 3)
+        self.assertEqual(account.last_statement.sequence, 3)
+
+    def test_invoices_and_payments_share_the_student_sequence(self):
+        self.invoice()
+        self.pay("20000")
+        self.invoice(amount=Decimal("1500"))
+
+        statements = StudentFeeStatement.objects.filter(student=self.student)
+        self.assertEqual(
+            list(statements.order_by("sequence").values_list("sequence", "balance")),
+            [
+                (1, Decimal("50000.00")),
+                (2, Decimal("30000.00")),
+                (3, Decimal("31500.00")),
+            ],
+        )
+        self.assertEqual(
+            StudentFeeAccount.objects.get(student=self.student).balance,
+            Decimal("31500.00"),
+        )
+
+    def test_bulk_lock_creates_each_account_once(self):
+        lock_fee_account(self.student)
+        accounts = lock_fee_accounts(self.students)
+        again = lock_fee_accounts(self.students)
+
+        self.assertEqual(set(accounts), {student.id for student in self.students})
+        self.assertEqual(
+            {account.pk for account in accounts.values()},
+            {account.pk for account in again.values()},
+        )
+        self.assertEqual(StudentFeeAccount.objects.count(), len(self.students))
+        self.assertEqual(accounts[self.student.id].cohort_id, self.cohort.id)
+
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_accounts_are_locked_for_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            lock_fee_account(self.student)
+            lock_fee_accounts(self.students)
+
+        locking = [q["sql"] for q in queries if "FOR UPDATE" in q["sql"]]
+        self.assertEqual(len(locking), 2)
+
+
+class BulkFeeInvoiceTests(StudentFinanceTestData, TestCase):
+    def bulk_invoice(self):
+        return InvoiceProcessor.bulk_fee_invoice(
+            self.cohort, self.semester, self.invoice_type, self.user
+        )
+
+    def test_invoices_every_student_in_the_cohort(self):
+        InvoiceProcessor.single_fee_invoice(
+            self.students[1],
+            InvoiceType.objects.create(name="Library Fine"),
+            self.semester,
+            self.user,
+            amount=Decimal("1000"),
+        )
+
+        invoices = self.bulk_invoice()
+
+        self.assertEqual(len(invoices), len(self.students))
+        self.assertEqual(len({invoice.reference for invoice in invoices}), 3)
+        self.assertTrue(all(invoice.amount == Decimal("50000") for invoice in invoices))
+        self.assertEqual(
+            dict(
+                StudentFeeStatement.objects.filter(semester=self.semester)
+                .order_by("student_id", "sequence")
+                .values_list("student_id", "sequence")
+            ),
+            {
+                self.students[0].id: 1,
+                self.students[1].id: 2,
+                self.students[2].id: 1,
+            },
+        )
+        self.assertEqual(
+            dict(StudentFeeAccount.objects.values_list("student_id", "balance")),
+            {
+                self.students[0].id: Decimal("50000.00"),
+                self.students[1].id: Decimal("51000.00"),
+                self.students[2].id: Decimal("50000.00"),
+            },
+        )
+        self.assertEqual(
+            JournalOutbox.objects.filter(reference__startswith="INVOICE-").count(), 4
+        )
+
+    def test_skips_students_already_invoiced(self):
+        self.bulk_invoice()
+
+        self.assertEqual(self.bulk_invoice(), [])
+        self.assertEqual(StudentFeeInvoice.objects.count(), len(self.students))
+        self.assertEqual(StudentFeeStatement.objects.count(), len(self.students))
+
+
+class PaymentAllocationTests(StudentFinanceTestData, TestCase):
+    def setUp(self):
+        # Raised last but dated first, so age decides and not insertion order
+        self.newer = self.invoice(amount=Decimal("3000"))
+        self.older = self.invoice(amount=Decimal("2000"))
+        StudentFeeInvoice.objects.filter(pk=self.older.pk).update(
+            created_on=timezone.now() - timedelta(days=30)
+        )
+
+    def assertInvoice(self, invoice, amount_paid, status):
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.amount_paid, invoice.status), (amount_paid, status))
+
+    def test_payment_settles_the_oldest_invoice_first(self):
+        payment = self.pay("2500")
+
+        self.assertInvoice(self.older, Decimal("2000.00"), "Paid")
+        self.assertInvoice(self.newer, Decimal("500.00"), "Partially Paid")
+        self.assertEqual(
+            list(
+                payment.allocations.order_by("id").values_list(
+                    "invoice_id", "amount_applied"
+                )
+            ),
+            [(self.older.id, Decimal("2000.00")), (self.newer.id, Decimal("500.00"))],
+        )
+
+    def test_bulk_payments_continue_where_the_previous_one_stopped(self):
+        PaymentProcessor.bulk_process(
+            [
+                {
+                    "student": self.student,
+                    "amount": amount,
+                    "payment_method": "Mpesa",
+                    "reference": reference,
+                }
+                for amount, reference in [("1500", "MP-1"), ("1500", "MP-2")]
+            ],
+            self.semester,
+            self.user,
+        )
+
+        self.assertInvoice(self.older, Decimal("2000.00"), "Paid")
+        self.assertInvoice(self.newer, Decimal("1000.00"), "Partially Paid")
+        self.assertEqual(
+            list(
+                StudentFeePaymentInvoice.objects.order_by("id").values_list(
+                    "payment__reference", "invoice_id", "amount_applied"
+                )
+            ),
+            [
+                ("MP-1", self.older.id, Decimal("1500.00")),
+                ("MP-2", self.older.id, Decimal("500.00")),
+                ("MP-2", self.newer.id, Decimal("1000.00")),
+            ],
+        )
+
+    def test_bulk_payments_without_a_reference_are_numbered(self):
+        payments = PaymentProcessor.bulk_process(
+            [
+                {"student": student, "amount": "100", "payment_method": "Cash"}
+                for student in self.students
+            ]
+            + [
+                {
+                    "student": self.student,
+                    "amount": "100",
+                    "payment_method": "Mpesa",
+                    "reference": "MP-9",
+                }
+            ],
+            self.semester,
+            self.user,
+        )
+
+        prefix = timezone.localdate().strftime("%y%m%d")
+        self.assertEqual(
+            [payment.reference for payment in payments],
+            [f"{prefix}0000{number}FP" for number in (1, 2, 3)] + ["MP-9"],
+        )
+
+    def test_overpayment_is_left_unapplied(self):
+        payment = self.pay("6000")
+
+        self.assertInvoice(self.older, Decimal("2000.00"), "Paid")
+        self.assertInvoice(self.newer, Decimal("3000.00"), "Paid")
+        self.assertEqual(sum(a.amount_applied for a in payment.allocations.all()), 5000)
+        self.assertEqual(
+            StudentFeeAccount.objects.get(student=self.student).balance,
+            Decimal("-1000.00"),
+        )
+
+    def test_reversal_reopens_the_invoices(self):
+        payment = self.pay("2500")
+
+        self.assertEqual(reverse_payment_allocations(payment), 2)
+        self.assertEqual(reverse_payment_allocations(payment), 0)
+        self.assertInvoice(self.older, Decimal("0.00"), "Pending")
+        self.assertInvoice(self.newer, Decimal("0.00"), "Pending")
+        self.assertFalse(payment.allocations.filter(is_reversed=False).exists())
+
+
+class ArrearsAgingTests(StudentFinanceTestData, TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        # Paid before allocation rows existed, so only amount_paid records it
+        self.legacy = self.invoice(amount=Decimal("4000"))
+        StudentFeeInvoice.objects.filter(pk=self.legacy.pk).update(
+            amount_paid=Decimal("1500.00"),
+            status="Partially Paid",
+            created_on=timezone.now() - timedelta(days=40),
+        )
+        self.allocated = self.invoice(student=self.students[1], amount=Decimal("700"))
+        self.pay("200", student=self.students[1])
+        StudentFeeInvoice.objects.filter(pk=self.allocated.pk).update(
+            created_on=timezone.now() - timedelta(days=10)
+        )
+        StudentFeePaymentInvoice.objects.update(
+            created_on=timezone.now() - timedelta(days=10)
+        )
+
+    def outstanding(self, as_of):
+        return dict(open_invoices(as_of).values_list("id", "outstanding"))
+
+    def test_backdated_report_matches_today_when_nothing_changed(self):
+        yesterday = self.today - timedelta(days=1)
+
+        self.assertEqual(
+            self.outstanding(yesterday),
+            {
+                self.legacy.id: Decimal("2500.00"),
+                self.allocated.id: Decimal("500.00"),
+            },
+        )
+        self.assertEqual(self.outstanding(yesterday), self.outstanding(self.today))
+        self.assertEqual(
+            arrears_aging(open_invoices(yesterday), yesterday),
+            arrears_aging(open_invoices(self.today), self.today),
+        )
+
+    def test_backdated_report_leaves_out_later_allocations(self):
+        self.pay("500")
+        yesterday = self.today - timedelta(days=1)
+
+        self.assertEqual(
+            self.outstanding(self.today)[self.legacy.id], Decimal("2000.00")
+        )
+        self.assertEqual(
+            self.outstanding(yesterday)[self.legacy.id], Decimal("2500.00")
+        )
+
+
+class PaymentIngestTests(StudentFinanceTestData, APITestCase):
+    url = reverse("fee-payments-ingest")
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def ingest(self, payload, **headers):
+        return self.client.post(self.url, payload, format="json", headers=headers)
+
+    def payment(self, external_reference, student=None, amount="1200.00"):
+        return {
+            "external_reference": external_reference,
+            "registration_number": (student or self.student).registration_number,
+            "amount": amount,
+            "payment_method": "Mpesa",
+        }
+
+    def test_replay_returns_the_original_payment(self):
+        first = self.ingest(self.payment("QK12AB34CD"))
+        replay = self.ingest(self.payment("QK12AB34CD", amount="999.00"))
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay.status_code, status.HTTP_200_OK)
+        original = first.data["payments"][0]
+        self.assertEqual(original["status"], "created")
+        self.assertEqual(
+            replay.data["payments"][0], {**original, "status": "replayed"}
+        )
+        self.assertEqual(StudentFeePayment.objects.count(), 1)
+        self.assertEqual(StudentFeeStatement.objects.count(), 1)
+        self.assertEqual(
+            StudentFeeAccount.objects.get(student=self.student).balance,
+            Decimal("-1200.00"),
+        )
+
+    def test_idempotency_key_header_is_the_external_reference(self):
+        payment = self.payment("ignored")
+        del payment["external_reference"]
+
+        for _ in range(2):
+            response = self.ingest(payment, **{"Idempotency-Key": "key-1"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["payments"][0]["external_reference"], "key-1")
+        self.assertEqual(
+            StudentFeePayment.objects.get().external_reference, "Mpesa:key-1"
+        )
+
+    def test_batch_posts_only_new_payments(self):
+        self.ingest(self.payment("TX-1"))
+
+        response = self.ingest(
+            {
+                "payments": [
+                    self.payment("TX-1"),
+                    self.payment("TX-2", student=self.students[1]),
+                    {**self.payment("TX-3"), "registration_number": "REG/999"},
+                ]
+            }
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [result["status"] for result in response.data["payments"]],
+            ["replayed", "created", "error"],
+        )
+        references = StudentFeePayment.objects.values_list(
+            "external_reference", flat=True
+        )
+        self.assertEqual(sorted(references), ["Mpesa:TX-1", "Mpesa:TX-2"])
+
+    def test_receipt_posted_from_an_upload_is_replayed(self):
+        uploaded = self.pay("1200.00", payment_method="Mpesa")
+        StudentFeePayment.objects.filter(pk=uploaded.pk).update(
+            external_reference=payment_external_reference("Mpesa", "QK55XY")
+        )
+
+        response = self.ingest(self.payment("QK55XY"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.data["payments"][0]
+        self.assertEqual(result["external_reference"], "QK55XY")
+        self.assertEqual(result["status"], "replayed")
+        self.assertEqual(result["reference"], uploaded.reference)
+        self.assertEqual(StudentFeePayment.objects.count(), 1)
+
+
+class FeeStatementStreamTests(StudentFinanceTestData, APITestCase):
+    url = reverse("fee-statameents-report")
+
+    def setUp(self):
+        self.invoice(amount=Decimal("4000"))
+        self.pay("1500")
+        self.invoice(student=self.students[1], amount=Decimal("700"))
+
+    def test_cohort_statements_are_streamed_per_student(self):
+        response = self.client.get(self.url, {"cohort": self.cohort.id})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        students = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(
+            [len(student["statements"]) for student in students], [2, 1]
+        )
+
+    def test_errors_while_streaming_are_logged(self):
+        def statements():
+            yield from StudentFeeStatement.objects.filter(student=self.student)
+            raise DatabaseError("connection lost")
+
+        chunks = FeeStatementReportsAPIView().stream_statements(
+            statements(), self.cohort.id
+        )
+
+        with self.assertLogs("apps.student_finance.billing.views", "ERROR"):
+            with self.assertRaises(DatabaseError):
+                list(chunks)
+
+
+class ReconcileFeeAccountsTests(StudentFinanceTestData, TestCase):
+    def setUp(self):
+        self.invoice(amount=Decimal("4000"))
+        self.pay("1500")
+        self.invoice(student=self.students[1], amount=Decimal("700"))
+
+    def test_consistent_accounts_are_left_alone(self):
+        self.assertEqual(
+            reconcile_fee_accounts(), {"checked": 2, "created": 0, "drifted": []}
+        )
+
+    def test_drifted_accounts_are_rebuilt_from_statements(self):
+        StudentFeeAccount.objects.filter(student=self.student).update(
+            balance=Decimal("99.00")
+        )
+        StudentFeeAccount.objects.filter(student=self.students[1]).delete()
+        # An account without any statements must be back at zero
+        StudentFeeAccount.objects.create(
+            student=self.students[2], balance=Decimal("10.00"), last_sequence=1
+        )
+
+        dry_run = reconcile_fee_accounts(dry_run=True)
+        self.assertEqual(dry_run["created"], 1)
+        self.assertEqual(
+            sorted(dry_run["drifted"]), [self.students[0].id, self.students[2].id]
+        )
+        self.assertEqual(StudentFeeAccount.objects.count(), 2)
+
+        reconcile_fee_accounts()
+
+        self.assertEqual(
+            {
+                account.student_id: (account.balance, account.last_sequence)
+                for account in StudentFeeAccount.objects.all()
+            },
+            {
+                self.students[0].id: (Decimal("2500.00"), 2),
+                self.students[1].id: (Decimal("700.00"), 1),
+                self.students[2].id: (Decimal("0.00"), 0),
+            },
+        )
+        self.assertEqual(reconcile_fee_accounts()["drifted"], [])
+
+    def test_moved_students_are_reattributed(self):
+        other = ProgrammeCohort.objects.create(
+            name="CS-2026", programme=self.cohort.programme
+        )
+        Student.objects.filter(pk=self.student.pk).update(cohort=other)
+
+        self.assertEqual(reconcile_fee_accounts()["drifted"], [self.student.id])
+        self.assertEqual(
+            StudentFeeAccount.objects.get(student=self.student).cohort_id, other.id
+        )
+
+
+class RebuildStatementBalancesTests(StudentFinanceTestData, TestCase):
+    def setUp(self):
+        self.invoice(amount=Decimal("4000"))
+        self.pay("1500")
+        self.invoice(amount=Decimal("300"))
+        self.invoice(student=self.students[1], amount=Decimal("700"))
+
+    def balances(self, student=None):
+        return list(
+            StudentFeeStatement.objects.filter(student=student or self.student)
+            .order_by("sequence")
+            .values_list("balance", flat=True)
+        )
+
+    def test_injected_bad_balance_is_corrected(self):
+        StudentFeeStatement.objects.filter(student=self.student, sequence=2).update(
+            balance=Decimal("1.00")
+        )
+        StudentFeeAccount.objects.filter(student=self.student).update(
+            balance=Decimal("5.00")
+        )
+
+        dry_run = rebuild_statement_balances(dry_run=True)
+        self.assertEqual(dry_run["drifted"], {self.student.id: 1})
+        self.assertEqual(self.balances()[1], Decimal("1.00"))
+
+        summary = rebuild_statement_balances()
+
+        self.assertEqual(summary["students"], 2)
+        self.assertEqual(summary["statements"], 4)
+        self.assertEqual(summary["drifted"], {self.student.id: 1})
+        self.assertEqual(
+            self.balances(),
+            [Decimal("4000.00"), Decimal("2500.00"), Decimal("2800.00")],
+        )
+        self.assertEqual(
+            StudentFeeAccount.objects.get(student=self.student).balance,
+            Decimal("2800.00"),
+        )
+        self.assertEqual(rebuild_statement_balances()["drifted"], {})
+
+    def test_only_the_given_students_are_rebuilt(self):
+        StudentFeeStatement.objects.update(balance=Decimal("0.00"))
+
+        summary = rebuild_statement_balances(student_ids=[self.students[1].id])
+
+        self.assertEqual(summary["drifted"], {self.students[1].id: 1})
+        self.assertEqual(self.balances(self.students[1]), [Decimal("700.00")])
+        self.assertEqual(self.balances(), [Decimal("0.00")] * 3)
@@ -0,0 +1,243 @@
+from decimal import Decimal, InvalidOperation
+
+import pandas as pd
+from django.db import IntegrityError
+
+from apps.student_finance.mixins.BillingMixin import PaymentProcessor
+from apps.student_finance.models import StudentFeeInvoice, StudentFeePayment
+from apps.student_finance.utils.payment_reference_generator import (
+    payment_external_reference,
+)
+from apps.students.models import Student
+
+
+class PaymentsUploadMixin:
+    """
+    Imports a bank or M-Pesa statement (csv, xls or xlsx) as fee payments.
+
+    Lines are matched to students by registration number, or by invoice
+    reference when the account column holds one, using one lookup query
+    each. Lines that match no student, repeat a reference within the file
+    or were already posted, through an upload or the ingestion API, are
+    reported and not posted. Posted lines carry payment_external_reference
+    as external_reference, so the unique index also rejects a concurrent
+    upload of the same statement.
+    Everything else is posted through PaymentProcessor.bulk_process.
+    """
+
+    # Canonical column -> accepted headers, after lower-casing and replacing
+    # spaces with underscores
+    COLUMN_ALIASES = {
+        "registration_number": [
+            "registration_number",
+            "reg_no",
+            "admission_number",
+            "account",
+            "account_no",
+            "account_number",
+            "account_reference",
+            "bill_ref_number",
+        ],
+        "reference": [
+            "reference",
+            "receipt_no",
+            "receipt",
+            "transaction_id",
+            "transaction_code",
+            "trans_id",
+        ],
+        "amount": ["amount", "paid_in", "credit", "trans_amount"],
+        "payment_date": [
+            "payment_date",
+            "date",
+            "transaction_date",
+            "completion_time",
+            "value_date",
+        ],
+    }
+    REQUIRED_COLUMNS = ["registration_number", "reference", "amount"]
+
+    def __init__(
+        self, payments_file, payment_method, semester, user, dry_run=False
+    ):
+        self.payments_file = payments_file
+        self.payment_method = payment_method
+        self.semester = semester
+        self.user = user
+        self.dry_run = dry_run
+        self.errors = []
+        self.unmatched = []
+        self.duplicates = []
+
+    def run(self):
+        return self._upload_payments()
+
+    def _read_file(self):
+        file_extension = self.payments_file.name.split(".")[-1].lower()
+        if file_extension == "csv":
+            df = pd.read_csv(self.payments_file, dtype=str)
+        else:
+            df = pd.read_excel(self.payments_file, dtype=str)
+
+        df.columns = [
+            str(column).strip().lower().replace(" ", "_") for column in df.columns
+        ]
+        renames = {}
+        for column, aliases in self.COLUMN_ALIASES.items():
+            found = next((alias for alias in aliases if alias in df.columns), None)
+            if found:
+                renames[found] = column
+        df = df.rename(columns=renames)
+
+        missing_columns = [col for col in self.REQUIRED_COLUMNS if col not in df.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+        return df
+
+    def _parse_lines(self, df):
+        lines = []
+        for index, row in enumerate(df.to_dict("records")):
+            row_num = index + 2  # header is row 1
+            account = row["registration_number"]
+            reference = row["reference"]
+            try:
+                if pd.isna(account) or not str(account).strip():
+                    raise ValueError("Registration number or account is required")
+                if pd.isna(reference) or not str(reference).strip():
+                    raise ValueError("Reference is required")
+                try:
+                    amount = Decimal(str(row["amount"]).replace(",", "").strip())
+                except InvalidOperation:
+                    raise ValueError(f"Invalid amount: {row['amount']}")
+                if not amount.is_finite() or amount <= 0:
+                    raise ValueError(f"Invalid amount: {row['amount']}")
+
+                payment_date = None
+                if not pd.isna(row.get("payment_date")):
+                    parsed = pd.to_datetime(row["payment_date"], errors="coerce")
+                    payment_date = None if pd.isna(parsed) else parsed.date()
+
+                lines.append(
+                    {
+                        "row": row_num,
+                        "account": str(account).strip(),
+                        "reference": str(reference).strip(),
+                        "amount": amount,
+                        "payment_date": payment_date,
+                    }
+                )
+            except ValueError as e:
+                self.errors.append({"row": row_num, "error": str(e)})
+        return lines
+
+    def _match_students(self, lines):
+        """Returns {account (upper-cased): student} for the lines' accounts."""
+        accounts = {line["account"] for line in lines}
+        lookup = accounts | {account.upper() for account in accounts}
+
+        students = {
+            student.registration_number.upper(): student
+            for student in Student.objects.select_related("user").filter(
+                registration_number__in=lookup
+            )
+        }
+
+        # Accounts that are not registration numbers may be invoice references
+        remaining = {account for account in lookup if account.upper() not in students}
+        if remaining:
+            invoices = StudentFeeInvoice.objects.select_related("student__user").filter(
+                reference__in=remaining
+            )
+            for invoice in invoices:
+                students.setdefault(invoice.reference.upper(), invoice.student)
+        return students
+
+    def _external_reference(self, reference):
+        return payment_external_reference(self.payment_method, reference)
+
+    def _posted_references(self, lines):
+        return set(
+            StudentFeePayment.objects.filter(
+                external_reference__in={
+                    self._external_reference(line["reference"]) for line in lines
+                }
+            ).values_list("external_reference", flat=True)
+        )
+
+    def _match_payments(self, lines, students, posted):
+        """Returns [(line, payment)] for the lines that should be posted."""
+        self.unmatched = []
+        self.duplicates = []
+        seen = set()
+        matched = []
+        for line in lines:
+            flagged = {key: str(value) for key, value in line.items()}
+            external_reference = self._external_reference(line["reference"])
+            if external_reference in posted:
+                self.duplicates.append(
+                    {**flagged, "reason": "Reference already posted"}
+                )
+                continue
+            if line["reference"] in seen:
+                self.duplicates.append(
+                    {**flagged, "reason": "Reference repeated in file"}
+                )
+                continue
+            seen.add(line["reference"])
+
+            student = students.get(line["account"].upper())
+            if not student:
+                self.unmatched.append(flagged)
+                continue
+
+            matched.append(
+                {
+                    "student": student,
+                    "amount": line["amount"],
+                    "payment_method": self.payment_method,
+                    "reference": line["reference"],
+                    "external_reference": external_reference,
+                    "payment_date": line["payment_date"],
+                }
+            )
+        return matched
+
+    def _upload_payments(self):
+        try:
+            lines = self._parse_lines(self._read_file())
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Upload failed: {str(e)}",
+                "posted_count": 0,
+                "errors": [str(e)],
+            }
+
+        students = self._match_students(lines)
+        payments = self._match_payments(lines, students, self._posted_references(lines))
+
+        if payments and not self.dry_run:
+            try:
+                PaymentProcessor.bulk_process(payments, self.semester, self.user)
+            except IntegrityError:
+                # A concurrent upload of the same statement posted some lines
+                # first, skip them and post the rest
+                payments = self._match_payments(
+                    lines, students, self._posted_references(lines)
+                )
+                if payments:
+                    PaymentProcessor.bulk_process(payments, self.semester, self.user)
+
+        total = sum((payment["amount"] for payment in payments), Decimal("0.00"))
+        action = "Matched" if self.dry_run else "Posted"
+        return {
+            "success": True,
+            "message": f"{action} {len(payments)} payments totalling {total}",
+            "dry_run": self.dry_run,
+            "posted_count": 0 if self.dry_run else len(payments),
+            "matched_count": len(payments),
+            "total_amount": str(total),
+            "unmatched": self.unmatched,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+        }
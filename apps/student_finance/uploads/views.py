@@ -0,0 +1,68 @@
+from rest_framework import status
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.schools.models import Semester
+from apps.student_finance.models import StudentFeePayment
+from apps.student_finance.uploads.mixins import PaymentsUploadMixin
+
+
+class PaymentsUploadView(APIView):
+    """
+    Posts the receipts in an uploaded bank or M-Pesa statement as fee
+    payments. Send dry_run=true to only get the matching report.
+    """
+
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        payments_file = request.FILES.get("file")
+        if not payments_file:
+            return Response(
+                {"error": 'No file provided. Please upload a statement with key "file".'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        file_extension = payments_file.name.split(".")[-1].lower()
+        if file_extension not in ["csv", "xls", "xlsx"]:
+            return Response(
+                {"error": "Invalid file type. Please upload a csv, xls or xlsx file."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        payment_method = request.data.get("payment_method")
+        payment_methods = dict(
+            StudentFeePayment._meta.get_field("payment_method").choices
+        )
+        if payment_method not in payment_methods:
+            return Response(
+                {"error": f"payment_method must be one of {', '.join(payment_methods)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        semester_id = request.data.get("semester")
+        if semester_id:
+            semester = Semester.objects.filter(id=semester_id).first()
+            if not semester:
+                return Response(
+                    {"error": "Semester not found."}, status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            semester = Semester.objects.filter(status="Active").first()
+
+        dry_run = str(request.data.get("dry_run", "")).lower() in ["1", "true", "yes"]
+
+        result = PaymentsUploadMixin(
+            payments_file, payment_method, semester, request.user, dry_run=dry_run
+        ).run()
+
+        if not result["success"]:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif dry_run:
+            response_status = status.HTTP_200_OK
+        elif result["unmatched"] or result["duplicates"] or result["errors"]:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(result, status=response_status)
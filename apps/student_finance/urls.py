@@ -1,14 +1,20 @@
 from django.urls import path
 
-from apps.student_finance.billing.views import BulkFeeInvoiceView, BulkInvoiceView, FeePaymentView, FeeStatementReportsAPIView, SingleInvoiceView, SingleStudentFeeInvoiceView
+from apps.student_finance.billing.views import BulkFeeInvoiceView, BulkInvoiceView, FeePaymentView, FeeStatementReportsAPIView, PaymentIngestView, ReversePaymentAllocationsView, SingleInvoiceView, SingleStudentFeeInvoiceView
+from apps.student_finance.uploads.views import PaymentsUploadView
 from apps.student_finance.views import (
+    ArrearsAgingInvoicesView,
+    ArrearsAgingReportView,
     CreateInvoiceTypeView,
+    FeeCollectionTrendView,
     FeeStatementsView,
     InvoiceTypeDetailView,
     InvoiceTypesListView,
     StudentFeeInvoiceListView,
     StudentFeePaymentListView,
+    StudentFeeBalanceListView,
     StudentFeeStatementListView,
+    TopArrearsView,
     TotalCollectedFeesView,
 )
 
@@ -35,11 +41,26 @@ urlpatterns = [
     path(
         "all-fee-statements/", FeeStatementsView.as_view(), name="fee-statements"
     ),
+    path("fee-balances/", StudentFeeBalanceListView.as_view(), name="fee-balances"),
+    path(
+        "fee-balances/top-arrears/", TopArrearsView.as_view(), name="fee-top-arrears"
+    ),
     path(
         "total-fees-collected/",
         TotalCollectedFeesView.as_view(),
         name="total-collected-fees",
     ),
+    path(
+        "fee-collection-trends/",
+        FeeCollectionTrendView.as_view(),
+        name="fee-collection-trends",
+    ),
+    path("arrears-aging/", ArrearsAgingReportView.as_view(), name="arrears-aging"),
+    path(
+        "arrears-aging/invoices/",
+        ArrearsAgingInvoicesView.as_view(),
+        name="arrears-aging-invoices",
+    ),
     
      # Generate invoices from FeeStructure for all students in a class
     path("bulk-fee-invoices/", BulkFeeInvoiceView.as_view(), name="bulk-fee-invoices"),
@@ -53,5 +74,16 @@ urlpatterns = [
     # Create ad-hoc invoices for all students in a class (amount provided)
     path("bulk-invoice/", BulkInvoiceView.as_view(), name="bulk-invoice"),
     path("fee-payments/", FeePaymentView.as_view(), name="fee-payment"),
+    path(
+        "fee-payments/ingest/", PaymentIngestView.as_view(), name="fee-payments-ingest"
+    ),
+    path(
+        "fee-payments/upload/", PaymentsUploadView.as_view(), name="fee-payments-upload"
+    ),
+    path(
+        "fee-payments/<int:pk>/reverse-allocations/",
+        ReversePaymentAllocationsView.as_view(),
+        name="reverse-payment-allocations",
+    ),
     path("fee-statements-reports/", FeeStatementReportsAPIView.as_view(), name="fee-statameents-report"),
 ]
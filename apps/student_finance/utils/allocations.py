@@ -0,0 +1,148 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.student_finance.models import StudentFeeInvoice, StudentFeePaymentInvoice
+
+OPEN_INVOICE_STATUSES = ["Pending", "Partially Paid"]
+
+
+def invoice_status(invoice):
+    """Status matching the invoice's amount_paid."""
+    if invoice.amount_paid >= invoice.amount:
+        return "Paid"
+    if invoice.amount_paid > 0:
+        return "Partially Paid"
+    return "Pending"
+
+
+def _apply_payment(payment, invoices, now):
+    """
+    Splits ``payment`` over ``invoices`` (oldest first) in memory. Returns
+    (allocations, invoices changed, unapplied amount).
+    """
+    remaining = Decimal(payment.amount)
+    allocations = []
+    updated = []
+    for invoice in invoices:
+        if remaining <= 0:
+            break
+
+        applied = min(invoice.bal_due, remaining)
+        if applied <= 0:
+            continue
+
+        invoice.amount_paid += applied
+        invoice.status = invoice_status(invoice)
+        # bulk_update does not apply auto_now
+        invoice.updated_on = now
+        updated.append(invoice)
+        allocations.append(
+            StudentFeePaymentInvoice(
+                payment=payment, invoice=invoice, amount_applied=applied
+            )
+        )
+        remaining -= applied
+    return allocations, updated, remaining
+
+
+def _open_invoices(student_ids):
+    return (
+        StudentFeeInvoice.objects.select_for_update()
+        .filter(student_id__in=student_ids, status__in=OPEN_INVOICE_STATUSES)
+        .order_by("created_on", "id")
+    )
+
+
+@transaction.atomic
+def allocate_payment(payment):
+    """
+    Applies ``payment`` to the student's open invoices, oldest first.
+
+    The open invoices are locked and read in one query, the split is worked
+    out in memory, then the invoices are saved with one bulk_update and the
+    allocation rows with one bulk_create. Returns (allocations, unapplied
+    amount).
+    """
+    allocations, updated, remaining = _apply_payment(
+        payment, _open_invoices([payment.student_id]), timezone.now()
+    )
+    StudentFeeInvoice.objects.bulk_update(
+        updated, ["amount_paid", "status", "updated_on"]
+    )
+    StudentFeePaymentInvoice.objects.bulk_create(allocations)
+    return allocations, remaining
+
+
+@transaction.atomic
+def allocate_payments_bulk(payments, batch_size=500):
+    """
+    Bulk version of allocate_payment for saved payments of many students.
+
+    Open invoices of all the students are locked in one query, payments are
+    applied in the order given, and the results are written with one
+    bulk_update and one bulk_create. Returns the allocations.
+    """
+    invoices_by_student = defaultdict(list)
+    for invoice in _open_invoices({payment.student_id for payment in payments}):
+        invoices_by_student[invoice.student_id].append(invoice)
+
+    now = timezone.now()
+    allocations = []
+    updated = {}
+    for payment in payments:
+        invoices = invoices_by_student[payment.student_id]
+        applied, changed, _ = _apply_payment(payment, invoices, now)
+        allocations.extend(applied)
+        updated.update((invoice.id, invoice) for invoice in changed)
+        # Settled invoices are skipped by the student's next payment
+        invoices_by_student[payment.student_id] = [
+            invoice for invoice in invoices if invoice.bal_due > 0
+        ]
+
+    StudentFeeInvoice.objects.bulk_update(
+        updated.values(), ["amount_paid", "status", "updated_on"], batch_size=batch_size
+    )
+    return StudentFeePaymentInvoice.objects.bulk_create(
+        allocations, batch_size=batch_size
+    )
+
+
+@transaction.atomic
+def reverse_payment_allocations(payment):
+    """
+    Takes a payment's active allocations back off their invoices and marks
+    them reversed, leaving the payment unapplied. Returns the number of
+    allocations reversed.
+    """
+    allocations = list(
+        StudentFeePaymentInvoice.objects.select_for_update()
+        .select_related("invoice")
+        .filter(payment=payment, is_reversed=False)
+    )
+    if not allocations:
+        return 0
+
+    # Lock the invoices as well, concurrent payments may be settling them
+    invoices = StudentFeeInvoice.objects.select_for_update().in_bulk(
+        [allocation.invoice_id for allocation in allocations]
+    )
+
+    now = timezone.now()
+    for allocation in allocations:
+        invoice = invoices[allocation.invoice_id]
+        invoice.amount_paid -= allocation.amount_applied
+        invoice.status = invoice_status(invoice)
+        invoice.updated_on = allocation.updated_on = now
+        allocation.is_reversed = True
+        allocation.reversed_on = now
+
+    StudentFeeInvoice.objects.bulk_update(
+        invoices.values(), ["amount_paid", "status", "updated_on"]
+    )
+    StudentFeePaymentInvoice.objects.bulk_update(
+        allocations, ["is_reversed", "reversed_on", "updated_on"]
+    )
+    return len(allocations)
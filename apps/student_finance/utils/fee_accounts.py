@@ -0,0 +1,332 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Window
+from django.utils import timezone
+
+from apps.student_finance.models import StudentFeeAccount, StudentFeeStatement
+from apps.student_finance.utils.fee_rollups import record_fee_rollups
+from apps.students.models import Student
+
+
+def student_account_fields(student):
+    """Student attributes copied onto the fee account for debtor listings."""
+    return {
+        "cohort_id": student.cohort_id,
+        "programme_id": student.programme_id,
+        "campus_id": student.campus_id,
+    }
+
+
+def lock_fee_account(student):
+    """
+    Returns the student's fee account locked with SELECT ... FOR UPDATE,
+    creating it on first use. Must be called inside a transaction, the lock
+    is held until it commits.
+    """
+    StudentFeeAccount.objects.get_or_create(
+        student=student, defaults=student_account_fields(student)
+    )
+    return StudentFeeAccount.objects.select_for_update().get(student=student)
+
+
+def lock_fee_accounts(students):
+    """
+    Bulk version of lock_fee_account, returns {student_id: account}.
+    Missing accounts are created with one insert and all rows are locked in
+    id order, so concurrent bulk postings cannot deadlock each other.
+    """
+    students = {student.id: student for student in students}
+    StudentFeeAccount.objects.bulk_create(
+        [
+            StudentFeeAccount(student=student, **student_account_fields(student))
+            for student in students.values()
+        ],
+        ignore_conflicts=True,
+    )
+    accounts = StudentFeeAccount.objects.select_for_update().filter(
+        student_id__in=students
+    )
+    return {account.student_id: account for account in accounts.order_by("id")}
+
+
+def build_fee_statement(
+    account,
+    statement_type,
+    semester,
+    debit=Decimal("0.00"),
+    credit=Decimal("0.00"),
+    payment_method=None,
+    payment_date=None,
+):
+    """
+    Moves a locked account's balance by ``debit - credit`` and returns the
+    matching unsaved statement line with the next sequence number. The
+    statement reference is derived from the student and sequence, which
+    are unique together. The caller saves both, see post_fee_statement and
+    save_fee_statements.
+    """
+    account.balance += Decimal(debit) - Decimal(credit)
+    account.last_sequence += 1
+    # Set here as bulk_update does not apply auto_now
+    account.updated_on = timezone.now()
+
+    return StudentFeeStatement(
+        reference=f"FS-{account.student_id}-{account.last_sequence}",
+        student_id=account.student_id,
+        statement_type=statement_type,
+        semester=semester,
+        debit=debit,
+        credit=credit,
+        balance=account.balance,
+        payment_method=payment_method,
+        payment_date=payment_date,
+        sequence=account.last_sequence,
+    )
+
+
+@transaction.atomic
+def post_fee_statement(
+    account,
+    statement_type,
+    semester,
+    debit=Decimal("0.00"),
+    credit=Decimal("0.00"),
+    payment_method=None,
+    payment_date=None,
+):
+    """
+    Records a statement line against a locked fee account, moving the
+    account balance by ``debit - credit`` and giving the line the next
+    sequence number. Returns the statement.
+
+    Params:
+        account: StudentFeeAccount returned by lock_fee_account
+        statement_type: "Invoice" or "Payment"
+    """
+    statement = build_fee_statement(
+        account,
+        statement_type,
+        semester,
+        debit,
+        credit,
+        payment_method,
+        payment_date,
+    )
+    statement.save()
+    account.last_statement = statement
+    account.save(
+        update_fields=["balance", "last_sequence", "last_statement", "updated_on"]
+    )
+    record_fee_rollups([statement], {account.student_id: account})
+    return statement
+
+
+def save_fee_statements(accounts, statements, batch_size=500):
+    """
+    Bulk version of the saves in post_fee_statement, for statements built
+    with build_fee_statement against ``accounts``. Must run inside the
+    transaction holding the account locks.
+    """
+    statements = StudentFeeStatement.objects.bulk_create(
+        statements, batch_size=batch_size
+    )
+    for statement in statements:
+        # Built in sequence order, the last one per student wins
+        accounts[statement.student_id].last_statement = statement
+    StudentFeeAccount.objects.bulk_update(
+        accounts.values(),
+        ["balance", "last_sequence", "last_statement", "updated_on"],
+        batch_size=batch_size,
+    )
+    record_fee_rollups(statements, accounts)
+    return statements
+
+
+ACCOUNT_FIELDS = [
+    "balance",
+    "last_sequence",
+    "last_statement_id",
+    "cohort_id",
+    "programme_id",
+    "campus_id",
+]
+
+
+def reconcile_fee_accounts(batch_size=500, dry_run=False):
+    """
+    Rebuilds every student's fee account from their latest statement and
+    current cohort, programme and campus, creating missing accounts and
+    zeroing accounts of students without statements.
+
+    Returns {"checked": n, "created": n, "drifted": [student ids]}. With
+    ``dry_run`` nothing is written.
+    """
+    billed = list(
+        StudentFeeStatement.objects.values_list("student_id", flat=True)
+        .distinct()
+        .order_by("student_id")
+    )
+    # Each student's newest sequence, an index lookup on (student, sequence)
+    last_sequence = (
+        StudentFeeStatement.objects.filter(student_id=OuterRef("student_id"))
+        .order_by("-sequence")
+        .values("sequence")[:1]
+    )
+    summary = {"checked": 0, "created": 0, "drifted": []}
+
+    for offset in range(0, len(billed), batch_size):
+        student_ids = billed[offset : offset + batch_size]
+
+        with transaction.atomic():
+            accounts = {
+                account.student_id: account
+                for account in StudentFeeAccount.objects.select_for_update()
+                .filter(student_id__in=student_ids)
+                .order_by("id")
+            }
+            statements = StudentFeeStatement.objects.filter(
+                student_id__in=student_ids, sequence=Subquery(last_sequence)
+            ).only("id", "student_id", "sequence", "balance")
+            students = Student.objects.only(
+                "id", "cohort_id", "programme_id", "campus_id"
+            ).in_bulk(student_ids)
+
+            created = []
+            drifted = []
+            for statement in statements:
+                expected = {
+                    "balance": statement.balance,
+                    "last_sequence": statement.sequence,
+                    "last_statement_id": statement.id,
+                    **student_account_fields(students[statement.student_id]),
+                }
+                account = accounts.get(statement.student_id)
+                if account is None:
+                    created.append(
+                        StudentFeeAccount(student_id=statement.student_id, **expected)
+                    )
+                elif any(getattr(account, f) != v for f, v in expected.items()):
+                    for field, value in expected.items():
+                        setattr(account, field, value)
+                    account.updated_on = timezone.now()
+                    drifted.append(account)
+
+            summary["checked"] += len(student_ids)
+            summary["created"] += len(created)
+            summary["drifted"].extend(account.student_id for account in drifted)
+            if not dry_run:
+                StudentFeeAccount.objects.bulk_create(created)
+                StudentFeeAccount.objects.bulk_update(
+                    drifted,
+                    [field.removesuffix("_id") for field in ACCOUNT_FIELDS]
+                    + ["updated_on"],
+                )
+
+    orphaned = StudentFeeAccount.objects.exclude(
+        student_id__in=StudentFeeStatement.objects.values("student_id")
+    ).exclude(balance=0, last_sequence=0, last_statement=None)
+    summary["drifted"].extend(orphaned.values_list("student_id", flat=True))
+    if not dry_run:
+        orphaned.update(
+            balance=Decimal("0"),
+            last_sequence=0,
+            last_statement=None,
+            updated_on=timezone.now(),
+        )
+    return summary
+
+
+def rebuild_statement_balances(student_ids=None, batch_size=500, dry_run=False):
+    """
+    Recomputes the running balance of every statement line, or only those
+    of ``student_ids``, as the cumulative sum of debit - credit in sequence
+    order using a window function, then brings each fee account's balance,
+    last_sequence and last_statement in line with the student's last line.
+
+    Students are rebuilt ``batch_size`` at a time, each batch in one
+    transaction holding the students' account locks, so no posting can
+    interleave with the rewrite. Corrections are written with bulk_update.
+
+    Returns {"students": n, "statements": n, "drifted": {student_id: number
+    of lines corrected}}. With ``dry_run`` nothing is written.
+    """
+    students = (
+        StudentFeeStatement.objects.values_list("student_id", flat=True)
+        .distinct()
+        .order_by("student_id")
+    )
+    if student_ids is not None:
+        students = students.filter(student_id__in=student_ids)
+    students = list(students)
+    summary = {"students": len(students), "statements": 0, "drifted": {}}
+
+    for offset in range(0, len(students), batch_size):
+        chunk = students[offset : offset + batch_size]
+
+        with transaction.atomic():
+            accounts = lock_fee_accounts(
+                Student.objects.only(
+                    "id", "cohort_id", "programme_id", "campus_id"
+                ).filter(id__in=chunk)
+            )
+            lines = (
+                StudentFeeStatement.objects.filter(student_id__in=chunk)
+                .annotate(
+                    running_balance=Window(
+                        Sum(F("debit") - F("credit")),
+                        partition_by=[F("student_id")],
+                        order_by=F("sequence").asc(),
+                    )
+                )
+                .order_by("student_id", "sequence")
+                .values_list("id", "student_id", "sequence", "balance", "running_balance")
+            )
+
+            now = timezone.now()
+            corrections = []
+            last_lines = {}
+            for statement_id, student_id, sequence, balance, running in lines.iterator(
+                chunk_size=2000
+            ):
+                summary["statements"] += 1
+                running = Decimal(running).quantize(Decimal("0.01"))
+                last_lines[student_id] = (statement_id, sequence, running)
+                if balance != running:
+                    corrections.append(
+                        StudentFeeStatement(
+                            id=statement_id, balance=running, updated_on=now
+                        )
+                    )
+                    drifted = summary["drifted"]
+                    drifted[student_id] = drifted.get(student_id, 0) + 1
+
+            drifted_accounts = []
+            for student_id, (statement_id, sequence, balance) in last_lines.items():
+                account = accounts[student_id]
+                if (
+                    account.balance != balance
+                    or account.last_sequence != sequence
+                    or account.last_statement_id != statement_id
+                ):
+                    account.balance = balance
+                    account.last_sequence = sequence
+                    account.last_statement_id = statement_id
+                    account.updated_on = now
+                    drifted_accounts.append(account)
+                    summary["drifted"].setdefault(student_id, 0)
+
+            if dry_run:
+                # lock_fee_accounts may have created missing accounts
+                transaction.set_rollback(True)
+                continue
+
+            StudentFeeStatement.objects.bulk_update(
+                corrections, ["balance", "updated_on"], batch_size=batch_size
+            )
+            StudentFeeAccount.objects.bulk_update(
+                drifted_accounts,
+                ["balance", "last_sequence", "last_statement", "updated_on"],
+                batch_size=batch_size,
+            )
+    return summary
@@ -0,0 +1,115 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from apps.student_finance.models import FeeCollectionRollup, StudentFeeStatement
+
+DIMENSIONS = ["day", "semester_id", "payment_method", "programme_id", "campus_id"]
+
+
+def fee_rollup_key(day, semester_id, payment_method, programme_id, campus_id):
+    values = [day, semester_id, payment_method, programme_id, campus_id]
+    return "|".join("" if value is None else str(value) for value in values)
+
+
+def record_fee_rollups(statements, accounts):
+    """
+    Adds newly written statements to the daily FeeCollectionRollup rows.
+
+    Params:
+        - statements: StudentFeeStatement objects just saved
+        - accounts: {student_id: StudentFeeAccount}, for programme and campus
+
+    Payments count on their payment date and invoices on the day they are
+    posted. Must run inside the transaction that writes the statements.
+    Missing rows are inserted first so the F() updates below always have a
+    row to lock.
+    """
+    today = timezone.localdate()
+    # dimensions -> [invoiced, collected, invoice count, payment count]
+    movements = defaultdict(lambda: [Decimal("0.00"), Decimal("0.00"), 0, 0])
+    for statement in statements:
+        account = accounts[statement.student_id]
+        dimensions = (
+            statement.payment_date or today,
+            statement.semester_id,
+            statement.payment_method,
+            account.programme_id,
+            account.campus_id,
+        )
+        totals = movements[dimensions]
+        if statement.statement_type == "Invoice":
+            totals[0] += Decimal(statement.debit)
+            totals[2] += 1
+        else:
+            totals[1] += Decimal(statement.credit)
+            totals[3] += 1
+
+    if not movements:
+        return
+
+    FeeCollectionRollup.objects.bulk_create(
+        [
+            FeeCollectionRollup(
+                key=fee_rollup_key(*dimensions),
+                **dict(zip(DIMENSIONS, dimensions)),
+            )
+            for dimensions in movements
+        ],
+        ignore_conflicts=True,
+    )
+
+    now = timezone.now()
+    for dimensions, (invoiced, collected, invoices, payments) in movements.items():
+        FeeCollectionRollup.objects.filter(key=fee_rollup_key(*dimensions)).update(
+            invoiced=F("invoiced") + invoiced,
+            collected=F("collected") + collected,
+            invoice_count=F("invoice_count") + invoices,
+            payment_count=F("payment_count") + payments,
+            updated_on=now,
+        )
+
+
+@transaction.atomic
+def rebuild_fee_rollups(batch_size=1000):
+    """
+    Recomputes every rollup from the StudentFeeStatement table, attributing
+    statements to the students' current programme and campus. Lines posted
+    without a payment date count on the day they were posted. Returns the
+    row count.
+    """
+    rows = (
+        StudentFeeStatement.objects.values(
+            "semester_id",
+            "payment_method",
+            day=Coalesce("payment_date", TruncDate("created_on")),
+            programme_id=F("student__programme_id"),
+            campus_id=F("student__campus_id"),
+        )
+        .annotate(
+            invoiced=Sum("debit", filter=Q(statement_type="Invoice")),
+            collected=Sum("credit", filter=Q(statement_type="Payment")),
+            invoice_count=Count("id", filter=Q(statement_type="Invoice")),
+            payment_count=Count("id", filter=Q(statement_type="Payment")),
+        )
+        .order_by()
+    )
+
+    FeeCollectionRollup.objects.all().delete()
+    rollups = [
+        FeeCollectionRollup(
+            key=fee_rollup_key(*(row[dimension] for dimension in DIMENSIONS)),
+            **{dimension: row[dimension] for dimension in DIMENSIONS},
+            invoiced=row["invoiced"] or Decimal("0.00"),
+            collected=row["collected"] or Decimal("0.00"),
+            invoice_count=row["invoice_count"],
+            payment_count=row["payment_count"],
+        )
+        for row in rows
+    ]
+    FeeCollectionRollup.objects.bulk_create(rollups, batch_size=batch_size)
+    return len(rollups)
@@ -1,33 +1,42 @@
-import random
-from datetime import datetime
+from apps.core.utils import reserve_references
 
 
-def payment_ref_generator(
-    suffix: str = "FPT", length: int = 3, model=None, field: str = "reference"
-) -> str:
+def payment_ref_generator(suffix: str = "FPT") -> str:
     """
     Generate a unique reference for invoices or receipts.
 
-    Format: YYMMDD + random digits + optional suffix
-    Example: 250824482INV
+    Format: YYMMDD + daily sequence number + optional suffix
+    Example: 25082400482INV
 
     Args:
+        suffix (str): Optional suffix (e.g. "INV", "RCP"), each suffix
+            numbers its references independently
+    """
+    return reserve_references(suffix)[0]
+
+
+def payment_refs_generator(count: int, suffix: str = "FPT") -> list:
+    """
+    Generate ``count`` unique references in the payment_ref_generator
+    format, reserved as one block with a single counter update.
+
+    Args:
+        count (int): Number of references to generate
         suffix (str): Optional suffix (e.g. "INV", "RCP")
-        length (int): Number of random digits
-        model (Model): Django model to check uniqueness against
-        field (str): Field name on the model that must be unique
     """
-    date_str = datetime.now().strftime("%y%m%d")
-
-    while True:
-        rand = str(
-            random.randint(10 ** (length - 1), (10**length) - 1)
-        )  # e.g. 3 digits → 100–999
-        ref = f"{date_str}{rand}{suffix}" if suffix else f"{date_str}{rand}"
-
-        if model:
-            # check if already exists in DB
-            if not model.objects.filter(**{field: ref}).exists():
-                return ref
-        else:
-            return ref
+    return reserve_references(suffix, count=count)
+
+
+def payment_external_reference(payment_method: str, reference: str) -> str:
+    """
+    external_reference stored for a payment the paying channel identifies
+    by ``reference`` (M-Pesa receipt, bank reference or idempotency key).
+    Every import path uses this format, so one receipt arriving through a
+    statement upload and the ingestion API is only posted once, while equal
+    references from different channels do not collide.
+
+    Args:
+        payment_method (str): StudentFeePayment.payment_method
+        reference (str): Reference given by the channel
+    """
+    return f"{payment_method}:{reference}"
@@ -1,20 +1,27 @@
+import csv
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import generics, status
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from apps.core.base_api_error_exceptions.base_exceptions import CustomAPIException
+from apps.core.utils import Echo
 from apps.schools.models import Semester
 from apps.student_finance.filters import (
+    ArrearsAgingFilter,
     StudentFeeInvoiceFilter,
     StudentFeeLedgerFilter,
     StudentFeePaymentFilter,
     StudentFeeStatementFilter,
+    StudentFeeAccountFilter,
 )
-from django.db.models import OuterRef, Subquery
 
 from apps.student_finance.models import (
+    FeeCollectionRollup,
     InvoiceType,
+    StudentFeeAccount,
     StudentFeeInvoice,
     StudentFeePayment,
     StudentFeeLedger,
@@ -23,6 +30,7 @@ from apps.student_finance.models import (
 from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from apps.student_finance.serializers import (
+    ArrearsAgingInvoiceSerializer,
     AllFeeStatementListSerializer,
     CreateAndUpdateInvoiceTypeSerializer,
     FeeLedgeListSerializer,
@@ -32,20 +40,92 @@ from apps.student_finance.serializers import (
     StudentFeeLedgerSerializer,
     StudentFeePaymentSerializer,
     StudentFeeStatementListSerializer,
+    StudentFeeAccountListSerializer,
+)
+from apps.student_finance.utils.arrears_aging import (
+    AGING_BUCKETS,
+    AGING_DIMENSIONS,
+    aging_bucket_filter,
+    arrears_aging,
+    open_invoices,
 )
 from apps.students.models import Student
 from decimal import Decimal
-from django.db.models import Sum, Count, Q
+from datetime import datetime, timedelta
+from django.db.models import Sum, F, Value
+from django.db.models.functions import Concat, TruncMonth, TruncWeek
+from django.utils import timezone
 
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 
+# Relations rendered by the nested student and semester serializers of the
+# statement list serializers, joined so a page costs a fixed number of queries
+STATEMENT_LIST_RELATED = [
+    "semester__academic_year",
+    "student__user__role",
+    "student__programme__school",
+    "student__programme__department__school",
+    "student__cohort__programme__school",
+    "student__cohort__programme__department__school",
+    "student__cohort__current_semester__academic_year",
+    "student__cohort__current_year",
+    "student__cohort__intake__academic_year",
+    "student__hostel_room",
+]
+
+
+def with_student_names(queryset):
+    """Annotates the student_name and student_reg_no the list serializers read."""
+    return queryset.annotate(
+        student_name=Concat(
+            "student__user__first_name", Value(" "), "student__user__last_name"
+        ),
+        student_reg_no=F("student__registration_number"),
+    )
+
+
+class CsvExportMixin:
+    """
+    export=csv streams the filtered queryset as CSV, read with one
+    values_list query. Views list (header, field) pairs in csv_fields.
+    """
+
+    csv_fields = []
+    csv_filename = "export.csv"
 
-class StudentFeeInvoiceListView(generics.ListAPIView):
-    queryset = StudentFeeInvoice.objects.all().order_by("-created_on")
+    def export_csv(self, queryset):
+        writer = csv.writer(Echo())
+        rows = queryset.values_list(*[field for _, field in self.csv_fields])
+
+        def stream():
+            yield writer.writerow([header for header, _ in self.csv_fields])
+            for row in rows.iterator(chunk_size=2000):
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(stream(), content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{self.csv_filename}"'
+        return response
+
+
+class StudentFeeInvoiceListView(CsvExportMixin, generics.ListAPIView):
+    queryset = with_student_names(
+        StudentFeeInvoice.objects.select_related("semester__academic_year")
+    ).order_by("-created_on")
     serializer_class = StudentFeeInvoiceListSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = StudentFeeInvoiceFilter
     permission_classes = [IsAuthenticated]
+    csv_fields = [
+        ("Reference", "reference"),
+        ("Registration Number", "student_reg_no"),
+        ("Student", "student_name"),
+        ("Semester", "semester__name"),
+        ("Amount", "amount"),
+        ("Paid", "amount_paid"),
+        ("Status", "status"),
+        ("Created On", "created_on"),
+    ]
+    csv_filename = "fee-invoices.csv"
 
     def get_paginated_response(self, data):
         assert self.paginator is not None
@@ -55,6 +135,8 @@ class StudentFeeInvoiceListView(generics.ListAPIView):
         try:
             invoices = self.get_queryset()
             invoices = self.filter_queryset(invoices)
+            if request.query_params.get("export") == "csv":
+                return self.export_csv(invoices)
             page = self.request.query_params.get("page", None)
             if page:
                 self.pagination_class = PageNumberPagination
@@ -88,10 +170,14 @@ class StudentFeeStatementListView(generics.ListAPIView):
                 }
             )
 
-        return StudentFeeStatement.objects.filter(
-            semester_id=semester_id, student_id=student_id
+        return (
+            StudentFeeStatement.objects.select_related(*STATEMENT_LIST_RELATED)
+            .filter(semester_id=semester_id, student_id=student_id)
+            .order_by("sequence")
         )
-class FeeStatementsView(generics.ListAPIView):
+
+
+class FeeStatementsView(CsvExportMixin, generics.ListAPIView):
     serializer_class = AllFeeStatementListSerializer
     queryset = StudentFeeStatement.objects.all().order_by("-created_on")
     filter_backends = [DjangoFilterBackend]
@@ -103,21 +189,118 @@ class FeeStatementsView(generics.ListAPIView):
     #     ).distinct("student_id")
 
     
-    def get_queryset(self):
-        # Subquery to get latest statement per student
-        latest_statement_subquery = StudentFeeStatement.objects.filter(
-            student_id=OuterRef('student_id')
-        ).order_by('-created_on').values('pk')[:1]
+    csv_fields = [
+        ("Reference", "reference"),
+        ("Registration Number", "student_reg_no"),
+        ("Student", "student_name"),
+        ("Semester", "semester__name"),
+        ("Type", "statement_type"),
+        ("Debit", "debit"),
+        ("Credit", "credit"),
+        ("Balance", "balance"),
+        ("Payment Method", "payment_method"),
+        ("Created On", "created_on"),
+    ]
+    csv_filename = "fee-statements.csv"
 
-        return StudentFeeStatement.objects.filter(
-            pk__in=Subquery(latest_statement_subquery)
+    def get_queryset(self):
+        # Latest statement per student, maintained on the fee account
+        return with_student_names(
+            StudentFeeStatement.objects.select_related(*STATEMENT_LIST_RELATED)
+        ).filter(
+            pk__in=StudentFeeAccount.objects.values("last_statement_id")
         ).order_by('-created_on')
 
-class StudentFeeLedgerListView(generics.ListAPIView):
-    queryset = StudentFeeLedger.objects.all().order_by("-created_on")
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get("export") == "csv":
+            return self.export_csv(self.filter_queryset(self.get_queryset()))
+        return super().list(request, *args, **kwargs)
+
+
+class StudentFeeBalanceListView(generics.ListAPIView):
+    """
+    Current fee balance per student, read from the fee account table.
+    Sorted by balance, highest first, unless ordering=balance.
+    """
+
+    serializer_class = StudentFeeAccountListSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = StudentFeeAccountFilter
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        ordering = self.request.query_params.get("ordering", "-balance")
+        if ordering not in ["balance", "-balance"]:
+            raise ValidationError({"ordering": "Must be 'balance' or '-balance'."})
+        return StudentFeeAccount.objects.select_related(
+            "student__user", "cohort", "programme", "campus"
+        ).order_by(ordering, "id")
+
+    def list(self, request, *args, **kwargs):
+        try:
+            balances = self.filter_queryset(self.get_queryset())
+            page = self.request.query_params.get("page", None)
+            if page:
+                self.pagination_class = PageNumberPagination
+                paginator = self.pagination_class()
+                paginated_balances = paginator.paginate_queryset(balances, request)
+                serializer = self.get_serializer(paginated_balances, many=True)
+                return paginator.get_paginated_response(serializer.data)
+
+            serializer = self.get_serializer(balances, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        except ValidationError:
+            raise
+        except Exception as exc:
+            raise CustomAPIException(
+                message=str(exc), status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class TopArrearsView(generics.ListAPIView):
+    """
+    Students owing the most, ``limit`` (default 20, at most 500) rows.
+    Accepts the same filters as the balance list.
+    """
+
+    serializer_class = StudentFeeAccountListSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = StudentFeeAccountFilter
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        return (
+            StudentFeeAccount.objects.filter(balance__gt=0)
+            .select_related("student__user", "cohort", "programme", "campus")
+            .order_by("-balance", "id")
+        )
+
+    def filter_queryset(self, queryset):
+        try:
+            limit = int(self.request.query_params.get("limit", 20))
+        except ValueError:
+            raise ValidationError({"limit": "Must be a number."})
+        return super().filter_queryset(queryset)[: max(1, min(limit, 500))]
+
+
+class StudentFeeLedgerListView(CsvExportMixin, generics.ListAPIView):
+    queryset = with_student_names(StudentFeeLedger.objects.all()).order_by(
+        "-created_on"
+    )
     serializer_class = FeeLedgeListSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = StudentFeeLedgerFilter
+    csv_fields = [
+        ("Registration Number", "student_reg_no"),
+        ("Student", "student_name"),
+        ("Transaction Type", "transaction_type"),
+        ("Debit", "debit"),
+        ("Credit", "credit"),
+        ("Created On", "created_on"),
+    ]
+    csv_filename = "fee-ledger.csv"
 
     def get_paginated_response(self, data):
         assert self.paginator is not None
@@ -127,6 +310,8 @@ class StudentFeeLedgerListView(generics.ListAPIView):
         try:
             fee_ledger_qs = self.get_queryset()
             fee_ledger_qs = self.filter_queryset(fee_ledger_qs)
+            if request.query_params.get("export") == "csv":
+                return self.export_csv(fee_ledger_qs)
             page = self.request.query_params.get("page", None)
             if page:
                 self.pagination_class = PageNumberPagination
@@ -147,17 +332,31 @@ class StudentFeeLedgerListView(generics.ListAPIView):
 
 
 class StudentFeeInvoiceDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = StudentFeeInvoice.objects.all()
+    queryset = with_student_names(
+        StudentFeeInvoice.objects.select_related("semester__academic_year")
+    )
     serializer_class = StudentFeeInvoiceListSerializer
     lookup_field = "pk"
 
 
-class StudentFeePaymentListView(generics.ListAPIView):
-    queryset = StudentFeePayment.objects.all()
+class StudentFeePaymentListView(CsvExportMixin, generics.ListAPIView):
+    queryset = with_student_names(StudentFeePayment.objects.all()).order_by(
+        "-created_on"
+    )
     serializer_class = StudentFeePaymentListSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = StudentFeePaymentFilter
     permission_classes = [IsAuthenticated]
+    csv_fields = [
+        ("Reference", "reference"),
+        ("Registration Number", "student_reg_no"),
+        ("Student", "student_name"),
+        ("Amount", "amount"),
+        ("Payment Method", "payment_method"),
+        ("Payment Date", "payment_date"),
+        ("Created On", "created_on"),
+    ]
+    csv_filename = "fee-payments.csv"
 
     def get_paginated_response(self, data):
         assert self.paginator is not None
@@ -167,6 +366,8 @@ class StudentFeePaymentListView(generics.ListAPIView):
         try:
             payments_qs = self.get_queryset()
             payments_qs = self.filter_queryset(payments_qs)
+            if request.query_params.get("export") == "csv":
+                return self.export_csv(payments_qs)
             page = self.request.query_params.get("page", None)
             if page:
                 self.pagination_class = PageNumberPagination
@@ -189,7 +390,7 @@ class StudentFeePaymentListView(generics.ListAPIView):
 class TotalCollectedFeesView(APIView):
     """
     Get total fees collected, optionally filtered by semester.
-    Uses StudentFeeStatement as the primary source for financial data.
+    Reads the daily FeeCollectionRollup rows kept in step with statements.
     """
 
     permission_classes = [IsAuthenticated]
@@ -199,41 +400,42 @@ class TotalCollectedFeesView(APIView):
         semester = None
 
         if not semester_id:
-            semester = Semester.objects.filter(status="Active").first()
+            semester = (
+                Semester.objects.select_related("academic_year")
+                .filter(status="Active")
+                .first()
+            )
             if semester:
                 semester_id = semester.id
         else:
             try:
-                semester = Semester.objects.get(id=semester_id)
+                semester = Semester.objects.select_related("academic_year").get(
+                    id=semester_id
+                )
             except Semester.DoesNotExist:
                 return Response(
                     {"error": "Semester not found"}, status=status.HTTP_404_NOT_FOUND
                 )
 
-        statement_queryset = StudentFeeStatement.objects.filter(
-            statement_type="Payment"
-        )
+        rollups = FeeCollectionRollup.objects.all()
         if semester_id:
-            statement_queryset = statement_queryset.filter(semester_id=semester_id)
+            rollups = rollups.filter(semester_id=semester_id)
 
-        total_collected = statement_queryset.aggregate(total_collected=Sum("credit"))[
-            "total_collected"
-        ] or Decimal("0.00")
+        totals = rollups.aggregate(
+            total_collected=Sum("collected"), total_invoiced=Sum("invoiced")
+        )
+        total_collected = totals["total_collected"] or Decimal("0.00")
 
         payment_method_totals = (
-            statement_queryset.values("payment_method")
-            .annotate(total=Sum("credit"), count=Count("id"))
+            rollups.filter(payment_count__gt=0)
+            .values("payment_method")
+            .annotate(total=Sum("collected"), count=Sum("payment_count"))
             .order_by("payment_method")
         )
 
         total_invoiced = Decimal("0.00")
         if semester_id:
-            invoiced_queryset = StudentFeeStatement.objects.filter(
-                statement_type="Invoice", semester_id=semester_id
-            )
-            total_invoiced = invoiced_queryset.aggregate(total_invoiced=Sum("debit"))[
-                "total_invoiced"
-            ] or Decimal("0.00")
+            total_invoiced = totals["total_invoiced"] or Decimal("0.00")
 
         collection_rate = Decimal("0.00")
         if total_invoiced > 0:
@@ -271,6 +473,276 @@ class TotalCollectedFeesView(APIView):
         )
 
 
+class FeeCollectionTrendView(APIView):
+    """
+    Fees invoiced and collected per day, week or month (period=daily, weekly
+    or monthly), read from the FeeCollectionRollup rows. Optional filters:
+    semester, programme, campus, payment_method, start_date and end_date
+    (YYYY-MM-DD). Defaults to the last 30 days, 12 weeks or 12 months.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    PERIODS = {
+        "daily": (F("day"), 30),
+        "weekly": (TruncWeek("day"), 7 * 12),
+        "monthly": (TruncMonth("day"), 365),
+    }
+
+    def get(self, request, *args, **kwargs):
+        period = request.query_params.get("period", "daily")
+        if period not in self.PERIODS:
+            return Response(
+                {"error": f"period must be one of {', '.join(self.PERIODS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        period_start, default_days = self.PERIODS[period]
+
+        try:
+            end_date_str = request.query_params.get("end_date")
+            end_date = (
+                datetime.strptime(end_date_str, "%Y-%m-%d").date()
+                if end_date_str
+                else timezone.localdate()
+            )
+            start_date_str = request.query_params.get("start_date")
+            start_date = (
+                datetime.strptime(start_date_str, "%Y-%m-%d").date()
+                if start_date_str
+                else end_date - timedelta(days=default_days - 1)
+            )
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rollups = FeeCollectionRollup.objects.filter(
+            day__gte=start_date, day__lte=end_date
+        )
+        for param in ["semester", "programme", "campus", "payment_method"]:
+            value = request.query_params.get(param)
+            if value:
+                rollups = rollups.filter(**{param: value})
+
+        trend = (
+            rollups.annotate(period=period_start)
+            .values("period")
+            .annotate(
+                invoiced=Sum("invoiced"),
+                collected=Sum("collected"),
+                invoice_count=Sum("invoice_count"),
+                payment_count=Sum("payment_count"),
+            )
+            .order_by("period")
+        )
+
+        return Response(
+            {
+                "period": period,
+                "start_date": start_date,
+                "end_date": end_date,
+                "results": list(trend),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+def aging_as_of(request):
+    as_of = request.query_params.get("as_of")
+    if not as_of:
+        return timezone.localdate()
+    try:
+        return datetime.strptime(as_of, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValidationError({"as_of": "Invalid date format. Use YYYY-MM-DD."})
+
+
+class ArrearsAgingReportView(APIView):
+    """
+    Outstanding invoice balances by age since invoicing (0-30, 31-60, 61-90
+    and over 90 days) on ``as_of`` (YYYY-MM-DD, default today), computed in
+    one aggregate query.
+
+    group_by=cohort, programme or campus splits the report, the semester,
+    cohort, programme and campus filters narrow it and export=csv streams
+    it as CSV.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        as_of = aging_as_of(request)
+        group_by = request.query_params.get("group_by") or None
+        if group_by and group_by not in AGING_DIMENSIONS:
+            return Response(
+                {"error": f"group_by must be one of {', '.join(AGING_DIMENSIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        invoices = ArrearsAgingFilter(
+            request.query_params, queryset=open_invoices(as_of)
+        ).qs
+        rows = arrears_aging(invoices, as_of, group_by)
+
+        if request.query_params.get("export") == "csv":
+            response = StreamingHttpResponse(
+                self.stream_csv(rows, group_by), content_type="text/csv"
+            )
+            response["Content-Disposition"] = (
+                f'attachment; filename="arrears-aging-{as_of}.csv"'
+            )
+            return response
+
+        totals = None
+        if group_by:
+            totals = {
+                field: sum((row[field] for row in rows), Decimal("0.00"))
+                for field in [*AGING_BUCKETS, "total"]
+            }
+            totals["invoice_count"] = sum(row["invoice_count"] for row in rows)
+
+        return Response(
+            {
+                "as_of": as_of,
+                "group_by": group_by,
+                "buckets": {
+                    bucket: label for bucket, (label, _, _) in AGING_BUCKETS.items()
+                },
+                "results": rows,
+                "totals": totals,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    def stream_csv(self, rows, group_by):
+        writer = csv.writer(Echo())
+        header = [label for label, _, _ in AGING_BUCKETS.values()]
+        header += ["Total", "Invoices", "Students"]
+        yield writer.writerow([group_by.title()] + header if group_by else header)
+        for row in rows:
+            values = [row[bucket] for bucket in AGING_BUCKETS]
+            values += [row["total"], row["invoice_count"], row["student_count"]]
+            yield writer.writerow(
+                [row[f"{group_by}_name"]] + values if group_by else values
+            )
+
+
+class ArrearsAgingInvoicesView(generics.ListAPIView):
+    """
+    Drill-down of the arrears aging report: the open invoices, oldest first,
+    with their outstanding balance and age on ``as_of``. Accepts the report
+    filters plus bucket (days_0_30, days_31_60, days_61_90 or days_over_90).
+    Paginated with ``page``, export=csv streams every matching invoice.
+    """
+
+    serializer_class = ArrearsAgingInvoiceSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ArrearsAgingFilter
+    permission_classes = [IsAuthenticated]
+
+    csv_header = [
+        "Reference",
+        "Registration Number",
+        "Student",
+        "Cohort",
+        "Programme",
+        "Invoiced On",
+        "Age (days)",
+        "Amount",
+        "Paid",
+        "Outstanding",
+    ]
+
+    def get_queryset(self):
+        as_of = aging_as_of(self.request)
+        invoices = open_invoices(as_of)
+
+        bucket = self.request.query_params.get("bucket")
+        if bucket:
+            if bucket not in AGING_BUCKETS:
+                raise ValidationError(
+                    {"bucket": f"Must be one of {', '.join(AGING_BUCKETS)}."}
+                )
+            invoices = invoices.filter(aging_bucket_filter(bucket, as_of))
+
+        return invoices.order_by("created_on", "id")
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["as_of"] = aging_as_of(self.request)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        try:
+            invoices = self.filter_queryset(self.get_queryset())
+
+            if request.query_params.get("export") == "csv":
+                response = StreamingHttpResponse(
+                    self.stream_csv(invoices, aging_as_of(request)),
+                    content_type="text/csv",
+                )
+                response["Content-Disposition"] = (
+                    'attachment; filename="arrears-aging-invoices.csv"'
+                )
+                return response
+
+            invoices = invoices.select_related(
+                "student__user", "student__cohort", "student__programme"
+            )
+            page = self.request.query_params.get("page", None)
+            if page:
+                self.pagination_class = PageNumberPagination
+                paginator = self.pagination_class()
+                paginated_invoices = paginator.paginate_queryset(invoices, request)
+                serializer = self.get_serializer(paginated_invoices, many=True)
+                return paginator.get_paginated_response(serializer.data)
+
+            serializer = self.get_serializer(invoices, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        except ValidationError:
+            raise
+        except Exception as exc:
+            raise CustomAPIException(
+                message=str(exc), status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def stream_csv(self, invoices, as_of):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.csv_header)
+        lines = invoices.values_list(
+            "reference",
+            "student__registration_number",
+            "student__user__first_name",
+            "student__user__last_name",
+            "student__cohort__name",
+            "student__programme__name",
+            "created_on",
+            "amount",
+            "paid_to_date",
+            "outstanding",
+        )
+        for line in lines.iterator(chunk_size=2000):
+            (reference, reg_no, first_name, last_name, cohort, programme) = line[:6]
+            created_on, amount, amount_paid, outstanding = line[6:]
+            invoiced_on = timezone.localdate(created_on)
+            yield writer.writerow(
+                [
+                    reference,
+                    reg_no,
+                    f"{first_name} {last_name}",
+                    cohort,
+                    programme,
+                    invoiced_on,
+                    (as_of - invoiced_on).days,
+                    amount,
+                    amount_paid,
+                    outstanding,
+                ]
+            )
+
+
 class CreateInvoiceTypeView(generics.CreateAPIView):
     queryset = InvoiceType.objects.all()
     serializer_class = CreateAndUpdateInvoiceTypeSerializer